@@ -0,0 +1,1730 @@
+# app_core.py
+# Beauty Agent Local - engine functions for the Streamlit app (no Streamlit import)
+# Batch jobs / tests can import this module without pulling in streamlit.
+
+import heapq
+import json
+import os
+from contextvars import ContextVar
+from bisect import bisect_left
+import re
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from catalog import Product, file_version, load_catalog
+from catalog_reload import reload_error, watch_catalog
+from ingredient_dict import MAX_DISTANCE, FuzzyMatch, load_dictionary, split_ingredients
+from ingredient_rules import IngredientProfile, add_profile, conflict_penalty, load_conflict_graph, profile_for_ids, rules_error
+from journal import JournalEntry, entry_from_app_row, entry_sort_key, entry_to_app_row
+from journal_analytics import DiaryAnalytics, JournalColumns, analyze
+from journal_search import JournalSearchIndex
+from metrics import cache_hit, register_gauge, timed
+from slow_profile import profiler_from_env
+from tenants import DEFAULT_USER, TenantCaches, budget_from_env, user_dir, valid_user_id
+from usage_impact import UsageIndex, category_names
+
+
+# =========================
+# Paths / Local Storage
+# =========================
+BASE_DIR = Path(__file__).resolve().parent
+DATA_DIR = BASE_DIR / "beauty_agent_data"
+DIARY_FILE = DATA_DIR / "skin_diary.json"
+PRODUCTS_FILE = DATA_DIR / "products_local.json"
+PROFILES_DIR = DATA_DIR / "profiles"
+
+# Slow-rerun capture (slow_profile.py), off unless $BEAUTY_AGENT_PROFILE_SLOW_MS is set.
+# Lives here rather than in app.py so the sampling counter survives Streamlit reruns.
+SLOW_REQUESTS = profiler_from_env(PROFILES_DIR)
+
+# Per-user data (tenants.py). The default user keeps the files above; named users get
+# DATA_DIR/users/<id>/. The current user is a context variable, so each Streamlit
+# session's script thread sets its own with set_current_user() at the top of a rerun.
+# Diary caches live in per-user slots under one global budget; the catalog stays shared.
+TENANTS = TenantCaches(budget_from_env())
+_current_user: ContextVar[str] = ContextVar("beauty_agent_user", default=DEFAULT_USER)
+
+
+# =========================
+# i18n (Japanese / English / Korean / Chinese)
+# =========================
+I18N: Dict[str, Dict[str, str]] = {
+    "ja": {
+        "app_title": "Beauty Agent Local",
+        "app_subtitle": "女性向けセルフケアWeb版",
+        "app_desc": "API不要 / ローカル保存 / 成分チェック・日記・傾向・ルーティン・症状別テンプレ・ローカル商品提案",
+        "badge": "streamlitApp • ローカル保存対応",
+        "lang": "言語",
+        "profile": "プロフィール",
+        "profile_desc": "あなた向けに提案をやさしく最適化します",
+        "skin_type": "肌タイプ",
+        "concerns": "悩み",
+        "fragrance_pref": "香りの好み",
+        "monthly_budget": "月予算（円）",
+        "am_minutes": "朝ケア時間（分）",
+        "pm_minutes": "夜ケア時間（分）",
+        "logo_frame": "ロゴ（任意）",
+        "logo_help": "PNG/JPGをアップロードするとヘッダーに表示します",
+        "tabs_ingredient": "成分チェック",
+        "tabs_diary": "肌日記（保存/一覧）",
+        "tabs_trend": "傾向メモ",
+        "tabs_routine": "朝/夜ルーティン",
+        "tabs_template": "症状別テンプレ",
+        "tabs_products": "ローカル商品提案",
+        "stat_records": "記録件数",
+        "stat_avg_sleep": "平均睡眠",
+        "stat_avg_stress": "平均ストレス",
+        "not_recorded": "未記録",
+        "daily_ok": "毎日1行でもOK",
+        "ingredient_title": "成分チェック（ルールベース簡易）",
+        "ingredient_desc": "成分を貼るだけで、香料・香料アレルゲン・乾燥しやすいアルコールなどをざっくり確認できます。",
+        "ingredient_input_label": "成分を貼り付け（カンマ区切り / 改行OK）",
+        "ingredient_placeholder": "Water, Glycerin, Niacinamide, Fragrance, Limonene",
+        "check_button": "チェックする",
+        "detected_categories": "検出カテゴリ",
+        "warnings": "注意点",
+        "notes": "メモ",
+        "no_ingredient": "成分を入力してください。",
+        "diary_title": "肌日記（ローカル保存）",
+        "diary_desc": "その日の肌状態を記録して、あとで傾向を見返せます。",
+        "record_date": "日付",
+        "symptoms": "症状",
+        "sleep_hours": "睡眠時間",
+        "stress_level": "ストレス",
+        "used_items": "使用アイテム",
+        "memo": "メモ",
+        "save_diary": "日記を保存",
+        "saved_ok": "保存しました",
+        "diary_list": "日記一覧",
+        "diary_search": "日記を検索（例: ヒリつき / サウナ）",
+        "diary_search_results": "「{q}」の検索結果: {n}件",
+        "no_diary": "日記はまだありません。",
+        "diary_page_size": "表示件数",
+        "load_more": "さらに表示",
+        "diary_shown": "{shown} / {total} 件を表示中",
+        "trend_title": "簡易傾向メモ（ローカル集計）",
+        "trend_desc": "保存した日記から、睡眠・ストレス・症状の出やすさを確認します。",
+        "trend_summary": "簡易傾向メモ",
+        "analytics_title": "日記分析（全期間）",
+        "usage_title": "使用アイテムと症状（使った日 vs 使わなかった日）",
+        "usage_rates": "症状 {w}% vs {wo}%（{days}日使用）",
+        "usage_none": "3日以上使ったアイテムが増えると表示されます",
+        "usage_caution": "同時に起きやすいだけで、原因とは限りません。",
+        "rolling_rate": "直近{w}日の症状出現率",
+        "cooccur_title": "一緒に出やすい症状",
+        "lagged_title": "睡眠・ストレスと数日後の症状",
+        "lag_days": "{lag}日後",
+        "any_symptom": "何らかの症状",
+        "no_signal": "目立った関連はまだ見えません",
+        "routine_title": "朝/夜ルーティン自動作成（ローカル）",
+        "routine_desc": "プロフィール条件と悩みから、時間内に収まるシンプルなケア手順を作成します。",
+        "make_routine": "ルーティンを作成",
+        "routine_note": "「ルーティンを作成」を押すと、プロフィール条件からローカル生成します。",
+        "am_routine": "朝ルーティン",
+        "pm_routine": "夜ルーティン",
+        "template_title": "症状別テンプレ提案（乾燥 / 赤み / ベタつき）",
+        "template_desc": "症状に合わせたケアの考え方テンプレを表示します（一般的なセルフケア向け）。",
+        "choose_symptom": "症状を選択",
+        "template_am": "朝のポイント",
+        "template_pm": "夜のポイント",
+        "template_avoid": "避けたいこと",
+        "template_when_to_hospital": "受診目安",
+        "products_title": "ローカル商品DBからの提案（EC風カード）",
+        "products_desc": "ローカルDBを条件で絞って提案します（実在ブランド縛りなし / オフライン用）。",
+        "recommend_button": "おすすめを表示",
+        "price": "価格",
+        "tags": "タグ",
+        "steps": "手順",
+        "minutes": "分",
+        "yen": "円",
+        "empty_result": "条件に合う候補が見つかりませんでした。条件を少し緩めてください。",
+        "footer_note": "※ これはローカル簡易版です。最終判断は製品ラベル・メーカー情報・専門家確認を優先してください。",
+        "invalid_user": "ユーザーIDが不正です（英数字と _ . - のみ、64文字まで）。",
+        "missing_user": "ユーザーを確認できません。認証プロキシ経由でアクセスしてください。",
+        "skin_normal": "普通肌",
+        "skin_dry": "乾燥肌",
+        "skin_oily": "脂性肌",
+        "skin_combo": "混合肌",
+        "skin_sensitive": "敏感肌",
+        "skin_unknown": "未設定",
+        "fragrance_any": "未設定",
+        "fragrance_none": "無香料希望",
+        "fragrance_light": "ほのかな香りOK",
+        "fragrance_like": "香り重視",
+        "concern_dryness": "乾燥",
+        "concern_redness": "赤み",
+        "concern_oiliness": "ベタつき",
+        "concern_pores": "毛穴",
+        "concern_dullness": "くすみ",
+        "concern_acne": "ニキビ",
+        "concern_sensitivity": "刺激感",
+        "symptom_none": "なし",
+        "save_hint": "例: 赤み, 乾燥 / ヒリつき など",
+        "used_items_placeholder": "例: 化粧水 / 美容液 / 乳液",
+        "memo_placeholder": "例: マスク時間が長かった / 睡眠不足 / 生理前など",
+        "analysis_result": "結果",
+        "category_fragrance": "香料",
+        "category_allergen": "香料アレルゲン（精油由来を含む）",
+        "category_drying_alcohol": "乾燥しやすいアルコール",
+        "category_humectant": "保湿成分",
+        "category_soothing": "整肌・鎮静寄り",
+        "category_brightening": "透明感ケア系",
+        "category_exfoliant": "角質ケア系",
+        "category_active": "攻め成分",
+        "warn_patchtest": "香料/香料アレルゲンの可能性。敏感な方はパッチテスト推奨。",
+        "warn_alcohol": "アルコールでしみや乾燥を感じる人は様子見を。",
+        "note_rulebased": "これはルールベースの簡易チェックです。最終判断は製品ラベル・メーカー情報・専門家確認を優先。",
+        "note_fuzzy": "表記ゆれとして推定: {src} → {dst}（信頼度 {conf:.0%}）",
+        "note_rules_error": "併用ルールの最新の編集を読み込めなかったため、前回のルールで判定しています（{error}）",
+        "product_type_cleanser": "洗顔",
+        "product_type_lotion": "化粧水",
+        "product_type_serum": "美容液",
+        "product_type_moisturizer": "乳液/クリーム",
+        "product_type_sunscreen": "日焼け止め",
+        "product_type_spot": "部分用ケア",
+        "cta_try": "この条件で試す",
+        "product_card_note": "ローカルDB提案（テスト用）",
+        "lang_ja": "日本語",
+        "lang_en": "English",
+        "lang_ko": "한국어",
+        "lang_zh": "中文",
+    },
+    "en": {
+        "app_title": "Beauty Agent Local",
+        "app_subtitle": "Women-Focused Self-Care Web App",
+        "app_desc": "No API / Local save / Ingredient check, diary, trends, routine, symptom templates, local product suggestions",
+        "badge": "streamlitApp • Local Storage",
+        "lang": "Language",
+        "profile": "Profile",
+        "profile_desc": "Gently tailors suggestions to your preferences",
+        "skin_type": "Skin type",
+        "concerns": "Concerns",
+        "fragrance_pref": "Fragrance preference",
+        "monthly_budget": "Monthly budget (JPY)",
+        "am_minutes": "AM care time (min)",
+        "pm_minutes": "PM care time (min)",
+        "logo_frame": "Logo (optional)",
+        "logo_help": "Upload PNG/JPG to show in the header",
+        "tabs_ingredient": "Ingredient Check",
+        "tabs_diary": "Skin Diary",
+        "tabs_trend": "Trend Memo",
+        "tabs_routine": "AM/PM Routine",
+        "tabs_template": "Symptom Templates",
+        "tabs_products": "Local Product Picks",
+        "stat_records": "Records",
+        "stat_avg_sleep": "Avg Sleep",
+        "stat_avg_stress": "Avg Stress",
+        "not_recorded": "No data",
+        "daily_ok": "Even one line per day is enough",
+        "ingredient_title": "Ingredient Check (Rule-based quick scan)",
+        "ingredient_desc": "Paste an ingredient list to quickly check fragrance, fragrance allergens, drying alcohols, and more.",
+        "ingredient_input_label": "Paste ingredients (comma-separated / new lines OK)",
+        "ingredient_placeholder": "Water, Glycerin, Niacinamide, Fragrance, Limonene",
+        "check_button": "Check",
+        "detected_categories": "Detected categories",
+        "warnings": "Warnings",
+        "notes": "Notes",
+        "no_ingredient": "Please enter ingredients.",
+        "diary_title": "Skin Diary (Local Save)",
+        "diary_desc": "Log your daily skin condition and review later.",
+        "record_date": "Date",
+        "symptoms": "Symptoms",
+        "sleep_hours": "Sleep hours",
+        "stress_level": "Stress",
+        "used_items": "Used items",
+        "memo": "Memo",
+        "save_diary": "Save diary",
+        "saved_ok": "Saved",
+        "diary_list": "Diary list",
+        "diary_search": "Search diary (e.g. stinging / sauna)",
+        "diary_search_results": "Results for “{q}”: {n}",
+        "no_diary": "No diary entries yet.",
+        "diary_page_size": "Entries per page",
+        "load_more": "Load more",
+        "diary_shown": "Showing {shown} of {total}",
+        "trend_title": "Quick Trend Memo (Local aggregation)",
+        "trend_desc": "Review sleep, stress, and symptom frequency from your saved diary.",
+        "trend_summary": "Quick Trend Memo",
+        "analytics_title": "Diary Analytics (all time)",
+        "usage_title": "Items and symptoms (days used vs. not used)",
+        "usage_rates": "symptoms {w}% vs {wo}% ({days} days used)",
+        "usage_none": "Shown once items have been used on 3+ days",
+        "usage_caution": "Association only — not necessarily the cause.",
+        "rolling_rate": "Symptom rate, last {w} days",
+        "cooccur_title": "Symptoms that appear together",
+        "lagged_title": "Sleep / stress vs. symptoms days later",
+        "lag_days": "{lag} day(s) later",
+        "any_symptom": "any symptom",
+        "no_signal": "No clear association yet",
+        "routine_title": "AM/PM Routine Generator (Local)",
+        "routine_desc": "Creates a simple routine within your time budget based on profile + concerns.",
+        "make_routine": "Generate routine",
+        "routine_note": "Press “Generate routine” to create a local routine from your profile settings.",
+        "am_routine": "AM Routine",
+        "pm_routine": "PM Routine",
+        "template_title": "Symptom Templates (Dryness / Redness / Oiliness)",
+        "template_desc": "Shows general self-care template ideas for each symptom.",
+        "choose_symptom": "Choose symptom",
+        "template_am": "AM tips",
+        "template_pm": "PM tips",
+        "template_avoid": "Avoid",
+        "template_when_to_hospital": "When to see a doctor",
+        "products_title": "Local Product Suggestions (EC-style cards)",
+        "products_desc": "Filters a local product DB and shows suggestions (offline testing use).",
+        "recommend_button": "Show recommendations",
+        "price": "Price",
+        "tags": "Tags",
+        "steps": "Steps",
+        "minutes": "min",
+        "yen": "JPY",
+        "empty_result": "No matches found. Try loosening your filters.",
+        "footer_note": "This is a local simplified version. Final decisions should prioritize product labels, official manufacturer information, and professional advice.",
+        "invalid_user": "Invalid user id (letters, digits, _ . - only, up to 64 characters).",
+        "missing_user": "Could not identify the user. Please sign in through the authentication proxy.",
+        "skin_normal": "Normal",
+        "skin_dry": "Dry",
+        "skin_oily": "Oily",
+        "skin_combo": "Combination",
+        "skin_sensitive": "Sensitive",
+        "skin_unknown": "Not set",
+        "fragrance_any": "Not set",
+        "fragrance_none": "Fragrance-free preferred",
+        "fragrance_light": "Light fragrance OK",
+        "fragrance_like": "Fragrance-focused",
+        "concern_dryness": "Dryness",
+        "concern_redness": "Redness",
+        "concern_oiliness": "Oiliness",
+        "concern_pores": "Pores",
+        "concern_dullness": "Dullness",
+        "concern_acne": "Acne",
+        "concern_sensitivity": "Sensitivity",
+        "symptom_none": "None",
+        "save_hint": "e.g. redness, dryness, stinging",
+        "used_items_placeholder": "e.g. toner / serum / lotion",
+        "memo_placeholder": "e.g. long mask wear / poor sleep / pre-period",
+        "analysis_result": "Result",
+        "category_fragrance": "Fragrance",
+        "category_allergen": "Fragrance allergen / essential oil-related",
+        "category_drying_alcohol": "Potentially drying alcohol",
+        "category_humectant": "Humectants",
+        "category_soothing": "Soothing / skin-conditioning",
+        "category_brightening": "Tone-care ingredients",
+        "category_exfoliant": "Exfoliant-related",
+        "category_active": "Actives",
+        "warn_patchtest": "Possible fragrance/fragrance allergens. Patch test is recommended if sensitive.",
+        "warn_alcohol": "If alcohol tends to sting/dry your skin, monitor carefully.",
+        "note_rulebased": "This is a rule-based quick check. Final decisions should prioritize product labels, manufacturer information, and expert advice.",
+        "note_fuzzy": "Read as a likely misspelling: {src} → {dst} (confidence {conf:.0%})",
+        "note_rules_error": "The latest edit of the conflict rules could not be loaded; checking with the previous rules ({error})",
+        "product_type_cleanser": "Cleanser",
+        "product_type_lotion": "Toner",
+        "product_type_serum": "Serum",
+        "product_type_moisturizer": "Moisturizer",
+        "product_type_sunscreen": "Sunscreen",
+        "product_type_spot": "Spot Care",
+        "cta_try": "Try with these settings",
+        "product_card_note": "Local DB suggestion (test)",
+        "lang_ja": "日本語",
+        "lang_en": "English",
+        "lang_ko": "한국어",
+        "lang_zh": "中文",
+    },
+    "ko": {
+        "app_title": "Beauty Agent Local",
+        "app_subtitle": "여성 맞춤 셀프케어 웹앱",
+        "app_desc": "API 불필요 / 로컬 저장 / 성분 체크·일기·경향·루틴·증상별 템플릿·로컬 상품 추천",
+        "badge": "streamlitApp • 로컬 저장 지원",
+        "lang": "언어",
+        "profile": "프로필",
+        "profile_desc": "취향에 맞게 제안을 부드럽게 맞춰줍니다",
+        "skin_type": "피부 타입",
+        "concerns": "고민",
+        "fragrance_pref": "향 선호",
+        "monthly_budget": "월 예산 (엔)",
+        "am_minutes": "아침 케어 시간 (분)",
+        "pm_minutes": "저녁 케어 시간 (분)",
+        "logo_frame": "로고 (선택)",
+        "logo_help": "PNG/JPG 업로드 시 헤더에 표시됩니다",
+        "tabs_ingredient": "성분 체크",
+        "tabs_diary": "피부 일기",
+        "tabs_trend": "경향 메모",
+        "tabs_routine": "아침/저녁 루틴",
+        "tabs_template": "증상별 템플릿",
+        "tabs_products": "로컬 상품 추천",
+        "stat_records": "기록 수",
+        "stat_avg_sleep": "평균 수면",
+        "stat_avg_stress": "평균 스트레스",
+        "not_recorded": "미기록",
+        "daily_ok": "하루 한 줄만 기록해도 좋아요",
+        "ingredient_title": "성분 체크 (룰베이스 간이)",
+        "ingredient_desc": "성분표를 붙여 넣으면 향료, 향 알레르겐, 건조 유발 가능 알코올 등을 빠르게 확인합니다.",
+        "ingredient_input_label": "성분 붙여넣기 (쉼표 / 줄바꿈 가능)",
+        "ingredient_placeholder": "Water, Glycerin, Niacinamide, Fragrance, Limonene",
+        "check_button": "체크하기",
+        "detected_categories": "검출 카테고리",
+        "warnings": "주의점",
+        "notes": "메모",
+        "no_ingredient": "성분을 입력해 주세요.",
+        "diary_title": "피부 일기 (로컬 저장)",
+        "diary_desc": "하루 피부 상태를 기록하고 나중에 경향을 확인할 수 있어요.",
+        "record_date": "날짜",
+        "symptoms": "증상",
+        "sleep_hours": "수면 시간",
+        "stress_level": "스트레스",
+        "used_items": "사용 제품",
+        "memo": "메모",
+        "save_diary": "일기 저장",
+        "saved_ok": "저장되었습니다",
+        "diary_list": "일기 목록",
+        "diary_search": "일기 검색 (예: 따가움 / 사우나)",
+        "diary_search_results": "“{q}” 검색 결과: {n}건",
+        "no_diary": "아직 일기 기록이 없습니다.",
+        "diary_page_size": "표시 개수",
+        "load_more": "더 보기",
+        "diary_shown": "{total}개 중 {shown}개 표시",
+        "trend_title": "간단 경향 메모 (로컬 집계)",
+        "trend_desc": "저장된 일기에서 수면·스트레스·증상 빈도를 확인합니다.",
+        "trend_summary": "간단 경향 메모",
+        "analytics_title": "일기 분석 (전체 기간)",
+        "usage_title": "사용 아이템과 증상 (사용한 날 vs 사용하지 않은 날)",
+        "usage_rates": "증상 {w}% vs {wo}% ({days}일 사용)",
+        "usage_none": "3일 이상 사용한 아이템이 생기면 표시됩니다",
+        "usage_caution": "함께 나타나기 쉬울 뿐, 원인이라고 단정할 수 없습니다.",
+        "rolling_rate": "최근 {w}일 증상 출현율",
+        "cooccur_title": "함께 나타나기 쉬운 증상",
+        "lagged_title": "수면·스트레스와 며칠 후 증상",
+        "lag_days": "{lag}일 후",
+        "any_symptom": "어떤 증상",
+        "no_signal": "아직 뚜렷한 관련이 보이지 않습니다",
+        "routine_title": "아침/저녁 루틴 자동 생성 (로컬)",
+        "routine_desc": "프로필과 고민을 바탕으로 시간 안에 가능한 간단한 루틴을 만듭니다.",
+        "make_routine": "루틴 생성",
+        "routine_note": "‘루틴 생성’ 버튼을 누르면 프로필 조건으로 로컬 루틴을 생성합니다.",
+        "am_routine": "아침 루틴",
+        "pm_routine": "저녁 루틴",
+        "template_title": "증상별 템플릿 제안 (건조 / 홍조 / 번들거림)",
+        "template_desc": "증상에 맞는 일반적인 셀프케어 템플릿을 보여줍니다.",
+        "choose_symptom": "증상 선택",
+        "template_am": "아침 포인트",
+        "template_pm": "저녁 포인트",
+        "template_avoid": "피하면 좋은 것",
+        "template_when_to_hospital": "진료 권장 기준",
+        "products_title": "로컬 상품 DB 추천 (EC 스타일 카드)",
+        "products_desc": "로컬 DB를 조건으로 필터링해 제안합니다 (오프라인 테스트용).",
+        "recommend_button": "추천 보기",
+        "price": "가격",
+        "tags": "태그",
+        "steps": "단계",
+        "minutes": "분",
+        "yen": "엔",
+        "empty_result": "조건에 맞는 후보가 없습니다. 조건을 조금 완화해 주세요.",
+        "footer_note": "※ 로컬 간이 버전입니다. 최종 판단은 제품 라벨·제조사 정보·전문가 상담을 우선하세요.",
+        "invalid_user": "사용자 ID가 올바르지 않습니다(영숫자와 _ . - 만, 64자 이내).",
+        "missing_user": "사용자를 확인할 수 없습니다. 인증 프록시를 통해 접속해 주세요.",
+        "skin_normal": "중성",
+        "skin_dry": "건성",
+        "skin_oily": "지성",
+        "skin_combo": "복합성",
+        "skin_sensitive": "민감성",
+        "skin_unknown": "미설정",
+        "fragrance_any": "미설정",
+        "fragrance_none": "무향 선호",
+        "fragrance_light": "은은한 향 OK",
+        "fragrance_like": "향 중시",
+        "concern_dryness": "건조",
+        "concern_redness": "홍조",
+        "concern_oiliness": "번들거림",
+        "concern_pores": "모공",
+        "concern_dullness": "칙칙함",
+        "concern_acne": "트러블",
+        "concern_sensitivity": "자극감",
+        "symptom_none": "없음",
+        "save_hint": "예: 홍조, 건조, 따가움",
+        "used_items_placeholder": "예: 토너 / 세럼 / 로션",
+        "memo_placeholder": "예: 마스크 오래 착용 / 수면 부족 / 생리 전",
+        "analysis_result": "결과",
+        "category_fragrance": "향료",
+        "category_allergen": "향료 알레르겐 / 에센셜오일 관련",
+        "category_drying_alcohol": "건조 유발 가능 알코올",
+        "category_humectant": "보습 성분",
+        "category_soothing": "진정 / 피부컨디셔닝",
+        "category_brightening": "톤 케어 성분",
+        "category_exfoliant": "각질 케어 관련",
+        "category_active": "활성 성분",
+        "warn_patchtest": "향료/향 알레르겐 가능성. 민감한 경우 패치 테스트 권장.",
+        "warn_alcohol": "알코올에 따가움/건조를 느끼는 편이면 주의 깊게 사용하세요.",
+        "note_rulebased": "룰베이스 간이 체크입니다. 최종 판단은 라벨/제조사 정보/전문가 상담을 우선하세요.",
+        "note_fuzzy": "오타로 추정: {src} → {dst} (신뢰도 {conf:.0%})",
+        "note_rules_error": "병용 규칙의 최신 수정을 불러오지 못해 이전 규칙으로 판정합니다 ({error})",
+        "product_type_cleanser": "클렌저",
+        "product_type_lotion": "토너",
+        "product_type_serum": "세럼",
+        "product_type_moisturizer": "보습크림",
+        "product_type_sunscreen": "선크림",
+        "product_type_spot": "부분 케어",
+        "cta_try": "이 조건으로 사용해보기",
+        "product_card_note": "로컬 DB 추천 (테스트)",
+        "lang_ja": "日本語",
+        "lang_en": "English",
+        "lang_ko": "한국어",
+        "lang_zh": "中文",
+    },
+    "zh": {
+        "app_title": "Beauty Agent Local",
+        "app_subtitle": "女性向自我护理网页版",
+        "app_desc": "无需API / 本地保存 / 成分检查、日记、趋势、护理流程、症状模板、本地商品推荐",
+        "badge": "streamlitApp • 支持本地保存",
+        "lang": "语言",
+        "profile": "个人资料",
+        "profile_desc": "根据你的偏好温和优化建议",
+        "skin_type": "肤质",
+        "concerns": "困扰",
+        "fragrance_pref": "香味偏好",
+        "monthly_budget": "月预算（日元）",
+        "am_minutes": "早间护理时间（分钟）",
+        "pm_minutes": "晚间护理时间（分钟）",
+        "logo_frame": "Logo（可选）",
+        "logo_help": "上传 PNG/JPG 后会显示在页眉",
+        "tabs_ingredient": "成分检查",
+        "tabs_diary": "肌肤日记",
+        "tabs_trend": "趋势备忘",
+        "tabs_routine": "早/晚护理流程",
+        "tabs_template": "症状模板",
+        "tabs_products": "本地商品推荐",
+        "stat_records": "记录数",
+        "stat_avg_sleep": "平均睡眠",
+        "stat_avg_stress": "平均压力",
+        "not_recorded": "未记录",
+        "daily_ok": "每天写一行也可以",
+        "ingredient_title": "成分检查（规则简版）",
+        "ingredient_desc": "粘贴成分表即可快速查看香精、香料过敏原、可能偏干的酒精等。",
+        "ingredient_input_label": "粘贴成分（逗号分隔 / 换行也可）",
+        "ingredient_placeholder": "Water, Glycerin, Niacinamide, Fragrance, Limonene",
+        "check_button": "开始检查",
+        "detected_categories": "检测到的类别",
+        "warnings": "注意事项",
+        "notes": "备注",
+        "no_ingredient": "请输入成分。",
+        "diary_title": "肌肤日记（本地保存）",
+        "diary_desc": "记录每日肌肤状态，后续查看趋势更方便。",
+        "record_date": "日期",
+        "symptoms": "症状",
+        "sleep_hours": "睡眠时长",
+        "stress_level": "压力",
+        "used_items": "使用产品",
+        "memo": "备注",
+        "save_diary": "保存日记",
+        "saved_ok": "已保存",
+        "diary_list": "日记列表",
+        "diary_search": "搜索日记（例：刺痛 / 桑拿）",
+        "diary_search_results": "“{q}” 的搜索结果：{n}条",
+        "no_diary": "还没有日记记录。",
+        "diary_page_size": "每页条数",
+        "load_more": "加载更多",
+        "diary_shown": "已显示 {shown} / {total} 条",
+        "trend_title": "简易趋势备忘（本地汇总）",
+        "trend_desc": "从已保存日记中查看睡眠、压力和症状频率。",
+        "trend_summary": "简易趋势备忘",
+        "analytics_title": "日记分析（全部期间）",
+        "usage_title": "使用物品与症状（使用日 vs 未使用日）",
+        "usage_rates": "症状 {w}% vs {wo}%（使用{days}天）",
+        "usage_none": "使用3天以上的物品出现后将显示",
+        "usage_caution": "仅表示关联，不一定是原因。",
+        "rolling_rate": "最近{w}天症状出现率",
+        "cooccur_title": "容易同时出现的症状",
+        "lagged_title": "睡眠·压力与数日后的症状",
+        "lag_days": "{lag}天后",
+        "any_symptom": "任一症状",
+        "no_signal": "暂未发现明显关联",
+        "routine_title": "早/晚护理流程自动生成（本地）",
+        "routine_desc": "根据个人资料与困扰，在限定时间内生成简洁护理步骤。",
+        "make_routine": "生成护理流程",
+        "routine_note": "点击“生成护理流程”后，将根据个人资料条件在本地生成方案。",
+        "am_routine": "早间流程",
+        "pm_routine": "晚间流程",
+        "template_title": "症状模板建议（干燥 / 泛红 / 出油）",
+        "template_desc": "按症状显示常见自我护理思路模板。",
+        "choose_symptom": "选择症状",
+        "template_am": "早间重点",
+        "template_pm": "晚间重点",
+        "template_avoid": "尽量避免",
+        "template_when_to_hospital": "就医参考",
+        "products_title": "本地商品库推荐（电商风卡片）",
+        "products_desc": "按条件筛选本地商品库并推荐（离线测试用）。",
+        "recommend_button": "显示推荐",
+        "price": "价格",
+        "tags": "标签",
+        "steps": "步骤",
+        "minutes": "分钟",
+        "yen": "日元",
+        "empty_result": "没有找到符合条件的候选，请适当放宽筛选条件。",
+        "footer_note": "※ 这是本地简化版。最终判断请优先参考产品标签、官方厂商信息和专业建议。",
+        "invalid_user": "用户 ID 无效（仅限字母数字和 _ . -，最多 64 个字符）。",
+        "missing_user": "无法确认用户。请通过认证代理访问。",
+        "skin_normal": "中性",
+        "skin_dry": "干性",
+        "skin_oily": "油性",
+        "skin_combo": "混合性",
+        "skin_sensitive": "敏感性",
+        "skin_unknown": "未设置",
+        "fragrance_any": "未设置",
+        "fragrance_none": "偏好无香",
+        "fragrance_light": "淡香可接受",
+        "fragrance_like": "重视香味",
+        "concern_dryness": "干燥",
+        "concern_redness": "泛红",
+        "concern_oiliness": "出油",
+        "concern_pores": "毛孔",
+        "concern_dullness": "暗沉",
+        "concern_acne": "痘痘",
+        "concern_sensitivity": "刺激感",
+        "symptom_none": "无",
+        "save_hint": "例：泛红、干燥、刺痛",
+        "used_items_placeholder": "例：化妆水 / 精华 / 乳液",
+        "memo_placeholder": "例：长时间戴口罩 / 睡眠不足 / 生理期前",
+        "analysis_result": "结果",
+        "category_fragrance": "香精/香料",
+        "category_allergen": "香料过敏原 / 精油相关",
+        "category_drying_alcohol": "可能偏干的酒精",
+        "category_humectant": "保湿成分",
+        "category_soothing": "舒缓/调理成分",
+        "category_brightening": "提亮护理成分",
+        "category_exfoliant": "去角质相关",
+        "category_active": "功效成分",
+        "warn_patchtest": "可能含香精/香料过敏原。敏感肌建议先做局部测试。",
+        "warn_alcohol": "如果你对酒精容易刺痛/干燥，请谨慎观察使用感受。",
+        "note_rulebased": "这是规则简版检查。最终判断请优先参考产品标签、厂商信息和专业建议。",
+        "note_fuzzy": "疑似拼写差异: {src} → {dst}（置信度 {conf:.0%}）",
+        "note_rules_error": "无法读取并用规则的最新修改，正在按之前的规则判定（{error}）",
+        "product_type_cleanser": "洁面",
+        "product_type_lotion": "化妆水",
+        "product_type_serum": "精华",
+        "product_type_moisturizer": "乳液/面霜",
+        "product_type_sunscreen": "防晒",
+        "product_type_spot": "局部护理",
+        "cta_try": "按此条件试用",
+        "product_card_note": "本地数据库推荐（测试）",
+        "lang_ja": "日本語",
+        "lang_en": "English",
+        "lang_ko": "한국어",
+        "lang_zh": "中文",
+    },
+}
+
+
+def t(key: str, lang: str) -> str:
+    """Translate text by key with fallback to JA then key."""
+    if lang in I18N and key in I18N[lang]:
+        return I18N[lang][key]
+    if key in I18N["ja"]:
+        return I18N["ja"][key]
+    return key
+
+
+# =========================
+# Local Data Initialization
+# =========================
+DEFAULT_PRODUCTS: List[Dict[str, Any]] = [
+    {
+        "id": "p001",
+        "name": {
+            "ja": "モイストバランス クレンジングフォーム",
+            "en": "Moist Balance Cleansing Foam",
+            "ko": "모이스트 밸런스 클렌징 폼",
+            "zh": "水润平衡洁面泡沫",
+        },
+        "type": "cleanser",
+        "price_jpy": 1380,
+        "fragrance": "none",
+        "skin_types": ["dry", "combo", "sensitive"],
+        "concerns": ["dryness", "sensitivity", "redness"],
+        "tags": ["低刺激", "アミノ酸系", "しっとり"],
+        "emoji": "🫧",
+        "steps": ["cleanse"],
+        "texture": "foam",
+        "ingredients": "水、グリセリン、ココイルグルタミン酸Na、BG、ベタイン、フェノキシエタノール",
+        "description": {
+            "ja": "やさしい洗浄でつっぱりにくい朝夜兼用の洗顔フォーム。",
+            "en": "Gentle cleanser that minimizes tightness after washing.",
+            "ko": "세안 후 당김을 줄이는 순한 클렌징 폼.",
+            "zh": "温和清洁，降低洗后紧绷感的洁面泡沫。",
+        },
+    },
+    {
+        "id": "p002",
+        "name": {
+            "ja": "セラミドモイスチャー ローション",
+            "en": "Ceramide Moisture Lotion",
+            "ko": "세라마이드 모이스처 토너",
+            "zh": "神经酰胺保湿化妆水",
+        },
+        "type": "lotion",
+        "price_jpy": 1780,
+        "fragrance": "none",
+        "skin_types": ["dry", "sensitive", "combo"],
+        "concerns": ["dryness", "redness", "sensitivity"],
+        "tags": ["セラミド", "保湿", "無香料"],
+        "emoji": "💧",
+        "steps": ["tone"],
+        "texture": "watery",
+        "ingredients": "水、グリセリン、BG、セラミドNP、ヒアルロン酸Na、パンテノール、フェノキシエタノール",
+        "description": {
+            "ja": "保湿重視のシンプル処方。乾燥・赤みが気になる日に。",
+            "en": "Hydration-focused simple formula for dryness and redness-prone days.",
+            "ko": "보습 중심의 심플 포뮬러로 건조/붉음 고민에 적합.",
+            "zh": "以保湿为主的简洁配方，适合干燥或泛红状态。",
+        },
+    },
+    {
+        "id": "p003",
+        "name": {
+            "ja": "ナイアシンブライト セラム",
+            "en": "Niacin Bright Serum",
+            "ko": "나이아신 브라이트 세럼",
+            "zh": "烟酰胺提亮精华",
+        },
+        "type": "serum",
+        "price_jpy": 2480,
+        "fragrance": "light",
+        "skin_types": ["combo", "oily", "normal"],
+        "concerns": ["dullness", "pores", "oiliness"],
+        "tags": ["ナイアシンアミド", "くすみ", "毛穴"],
+        "emoji": "✨",
+        "steps": ["serum"],
+        "texture": "serum",
+        "ingredients": "水、BG、ナイアシンアミド、グリセリン、テトラヘキシルデカン酸アスコルビル、キサンタンガム、フェノキシエタノール",
+        "description": {
+            "ja": "なめらかさと透明感ケアを両立した軽めの美容液。",
+            "en": "Light serum for smoother texture and tone care.",
+            "ko": "결 정돈과 톤 케어를 함께 노리는 가벼운 세럼.",
+            "zh": "轻盈质地，兼顾肤感平滑与提亮护理。",
+        },
+    },
+    {
+        "id": "p004",
+        "name": {
+            "ja": "カームリペア ジェルクリーム",
+            "en": "Calm Repair Gel Cream",
+            "ko": "카밍 리페어 젤 크림",
+            "zh": "舒缓修护凝霜",
+        },
+        "type": "moisturizer",
+        "price_jpy": 2280,
+        "fragrance": "none",
+        "skin_types": ["sensitive", "combo", "dry"],
+        "concerns": ["redness", "sensitivity", "dryness"],
+        "tags": ["整肌", "ジェル", "バリア感"],
+        "emoji": "🩷",
+        "steps": ["moisturize"],
+        "texture": "gel-cream",
+        "ingredients": "水、グリセリン、ツボクサエキス、アラントイン、スクワラン、カルボマー、フェノキシエタノール",
+        "description": {
+            "ja": "ベタつきにくく、赤みや刺激感が出やすい時の保湿に。",
+            "en": "Non-greasy moisturizer for redness-prone or sensitive days.",
+            "ko": "번들거림 적고 민감/붉음이 있을 때 쓰기 좋은 보습 젤크림.",
+            "zh": "清爽不黏腻，适合泛红或敏感时段的保湿修护。",
+        },
+    },
+    {
+        "id": "p005",
+        "name": {
+            "ja": "エアリーフィット UVミルク SPF50+",
+            "en": "Airy Fit UV Milk SPF50+",
+            "ko": "에어리 핏 UV 밀크 SPF50+",
+            "zh": "轻盈贴肤防晒乳 SPF50+",
+        },
+        "type": "sunscreen",
+        "price_jpy": 1980,
+        "fragrance": "none",
+        "skin_types": ["normal", "combo", "oily", "sensitive"],
+        "concerns": ["dullness", "pores", "sensitivity"],
+        "tags": ["UV", "日常使い", "無香料"],
+        "emoji": "☀️",
+        "steps": ["sunscreen"],
+        "texture": "milk",
+        "ingredients": "水、酸化亜鉛、メトキシケイヒ酸エチルヘキシル、シクロペンタシロキサン、グリセリン、BG",
+        "description": {
+            "ja": "軽い塗り心地で朝の時短に向いた日焼け止め。",
+            "en": "Lightweight daily sunscreen ideal for quick AM routines.",
+            "ko": "가볍게 발리는 데일리 선케어로 아침 시간 단축에 좋아요.",
+            "zh": "轻薄防晒乳，适合早晨快节奏护理流程。",
+        },
+    },
+    {
+        "id": "p006",
+        "name": {
+            "ja": "ポアスムース バランストナー",
+            "en": "Pore Smooth Balance Toner",
+            "ko": "포어 스무스 밸런스 토너",
+            "zh": "毛孔平衡爽肤水",
+        },
+        "type": "lotion",
+        "price_jpy": 1580,
+        "fragrance": "light",
+        "skin_types": ["oily", "combo"],
+        "concerns": ["oiliness", "pores"],
+        "tags": ["さっぱり", "毛穴", "皮脂バランス"],
+        "emoji": "🧴",
+        "steps": ["tone"],
+        "texture": "watery",
+        "ingredients": "水、BG、エタノール、グリコール酸、ハマメリス葉エキス、フェノキシエタノール",
+        "description": {
+            "ja": "ベタつきや毛穴目立ちが気になる方向けのさっぱり系。",
+            "en": "Fresh-feel toner for oiliness and visible pores.",
+            "ko": "번들거림/모공 고민에 맞춘 산뜻한 토너.",
+            "zh": "偏清爽型，适合出油和毛孔困扰。",
+        },
+    },
+    {
+        "id": "p007",
+        "name": {
+            "ja": "スポットクリア ジェル",
+            "en": "Spot Clear Gel",
+            "ko": "스팟 클리어 젤",
+            "zh": "局部净肤凝胶",
+        },
+        "type": "spot",
+        "price_jpy": 1280,
+        "fragrance": "none",
+        "skin_types": ["oily", "combo", "normal"],
+        "concerns": ["acne", "oiliness"],
+        "tags": ["部分用", "ジェル", "夜向け"],
+        "emoji": "🎯",
+        "steps": ["spot"],
+        "texture": "gel",
+        "ingredients": "水、BG、サリチル酸、グリチルリチン酸2K、イソプロピルメチルフェノール、カルボマー",
+        "description": {
+            "ja": "気になる部分にピンポイントで使いやすいジェル。",
+            "en": "Targeted gel for spot-use on concern areas.",
+            "ko": "고민 부위에 국소적으로 사용하기 쉬운 젤.",
+            "zh": "用于局部护理的凝胶型产品。",
+        },
+    },
+    {
+        "id": "p008",
+        "name": {
+            "ja": "リッチバリア ナイトクリーム",
+            "en": "Rich Barrier Night Cream",
+            "ko": "리치 배리어 나이트 크림",
+            "zh": "丰润屏障晚霜",
+        },
+        "type": "moisturizer",
+        "price_jpy": 2980,
+        "fragrance": "none",
+        "skin_types": ["dry", "sensitive", "normal"],
+        "concerns": ["dryness", "redness", "dullness"],
+        "tags": ["夜用", "バリア", "しっとり"],
+        "emoji": "🌙",
+        "steps": ["moisturize"],
+        "texture": "cream",
+        "ingredients": "水、グリセリン、シア脂、スクワラン、パルミチン酸レチノール、セラミドNP、ワセリン、フェノキシエタノール",
+        "description": {
+            "ja": "夜の保湿重視ケアに。乾燥しやすい季節にも。",
+            "en": "Rich nighttime moisturizer for dry seasons and barrier support.",
+            "ko": "밤 보습 강화용 크림으로 건조한 계절에 적합.",
+            "zh": "适合夜间加强保湿与屏障感护理。",
+        },
+    },
+]
+
+
+# =========================
+# Helpers / Data IO
+# =========================
+def set_current_user(user_id: Optional[str]) -> str:
+    user_id = (user_id or DEFAULT_USER).strip()
+    if not valid_user_id(user_id):
+        raise ValueError(f"invalid user id: {user_id!r}")
+    _current_user.set(user_id)
+    return user_id
+
+
+def current_user() -> str:
+    return _current_user.get()
+
+
+def diary_file() -> Path:
+    user = current_user()
+    return DIARY_FILE if user == DEFAULT_USER else user_dir(DATA_DIR, user) / DIARY_FILE.name
+
+
+def _tenant_state(name: str, factory) -> Dict[str, Any]:
+    return TENANTS.slot(current_user(), name, factory)
+
+
+def _account(name: str, version: Optional[Tuple[int, int]]) -> None:
+    # weight = diary file size; each index built from it is about that size in memory
+    TENANTS.account(current_user(), name, version[1] if version else 0)
+
+
+def _new_index_state() -> Dict[str, Any]:
+    return {"version": None, "index": None}
+
+
+@timed()
+def ensure_data_files() -> None:
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    path = diary_file()
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("[]", encoding="utf-8")
+    if not PRODUCTS_FILE.exists():
+        PRODUCTS_FILE.write_text(
+            json.dumps(DEFAULT_PRODUCTS, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+
+
+@timed()
+def read_json(path: Path, default: Any) -> Any:
+    try:
+        if not path.exists():
+            return default
+        raw = path.read_text(encoding="utf-8")
+        if not raw.strip():
+            return default
+        return json.loads(raw)
+    except Exception:
+        return default
+
+
+@timed()
+def write_json(path: Path, data: Any) -> bool:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        return True
+    except Exception:
+        return False
+
+
+# Parsed diary list (per user), reused across Streamlit reruns until the file changes.
+# "asc" / "keys" hold the same entries in ascending sort-key order for paging.
+# The slot holds it under "current"; a refresh builds a new dict and swaps it in with one
+# assignment, so concurrent sessions of the same user never see a half-updated cache.
+def _new_diary_cache() -> Dict[str, Any]:
+    return {"current": {"version": None, "entries": [], "asc": [], "keys": [], "pages": {}}}
+
+# (date, created_at, remaining): resume below this sort key; `remaining` entries
+# that share the key have not been shown yet.
+DiaryCursor = Tuple[str, str, int]
+
+
+def diary_version() -> Optional[Tuple[int, int]]:
+    return file_version(diary_file())
+
+
+def _refresh_diaries() -> Dict[str, Any]:
+    """The current user's diary cache, re-read first if the file changed (no copy of the list)."""
+    slot = _tenant_state("diaries", _new_diary_cache)
+    cache = slot["current"]
+    version = diary_version()
+    hit = version is not None and version == cache["version"]
+    cache_hit("diaries", hit)
+    if hit:
+        return cache
+    data = read_json(diary_file(), [])
+    entries: List[JournalEntry] = []
+    if isinstance(data, list):
+        # newest first (date descending, fallback by created_at)
+        entries = sorted(
+            (entry_from_app_row(x) for x in data if isinstance(x, dict)),
+            key=entry_sort_key,
+            reverse=True,
+        )
+    asc = entries[::-1]
+    cache = {"version": version, "entries": entries, "asc": asc, "keys": [entry_sort_key(e) for e in asc], "pages": {}}
+    slot["current"] = cache
+    _account("diaries", version)
+    return cache
+
+
+@timed()
+def load_diaries() -> List[JournalEntry]:
+    return list(_refresh_diaries()["entries"])
+
+
+def diary_count() -> int:
+    return len(_refresh_diaries()["entries"])
+
+
+_gauge_diaries: Tuple[Optional[Tuple[int, int]], int] = (None, 0)  # (version, rows) of the default user's diary file
+
+
+def _default_diary_rows() -> int:
+    # for the metrics gauge: runs on the exporter thread, so it reads the file directly
+    # instead of loading (and touching the LRU position of) the default user's cache
+    global _gauge_diaries
+    version = file_version(DIARY_FILE)
+    if version != _gauge_diaries[0]:
+        data = read_json(DIARY_FILE, [])
+        _gauge_diaries = (version, len(data) if isinstance(data, list) else 0)
+    return _gauge_diaries[1]
+
+
+@timed()
+def diary_page(
+    cursor: Optional[DiaryCursor], page_size: int
+) -> Tuple[List[JournalEntry], Optional[DiaryCursor]]:
+    """One page of diaries, newest first, starting below `cursor` (None = newest).
+
+    Returns (entries, next_cursor); next_cursor is None on the last page.
+    Pages are cached per diary file version.
+    """
+    cache = _refresh_diaries()
+    pages = cache["pages"]
+    cache_key = (cursor, page_size)
+    hit = pages.get(cache_key)
+    if hit is not None:
+        return list(hit[0]), hit[1]
+
+    asc: List[JournalEntry] = cache["asc"]
+    keys: List[Tuple[str, str]] = cache["keys"]
+    if cursor is None:
+        end = len(asc)
+    else:
+        end = min(bisect_left(keys, (cursor[0], cursor[1])) + cursor[2], len(asc))
+    start = max(0, end - max(1, page_size))
+    page = asc[start:end][::-1]
+
+    next_cursor: Optional[DiaryCursor] = None
+    if start > 0:
+        last_key = keys[start]
+        next_cursor = (last_key[0], last_key[1], start - bisect_left(keys, last_key))
+
+    pages[cache_key] = (tuple(page), next_cursor)
+    return page, next_cursor
+
+
+def _row_sort_key(row: Any) -> Tuple[str, str]:
+    if not isinstance(row, dict):
+        return ("", "")
+    return (str(row.get("date", "")), str(row.get("created_at", "")))
+
+
+@timed()
+def save_diary_entry(entry: JournalEntry) -> bool:
+    version = diary_version()
+    current = []
+    for name in ("usage_index", "search_index"):
+        state = _tenant_state(name, _new_index_state)
+        if state["index"] is not None and state["version"] == version:
+            current.append((name, state))
+    # keep stored rows as they are (unknown keys, original spelling); only the new row is normalized
+    data = read_json(diary_file(), [])
+    rows = data if isinstance(data, list) else []
+    rows.append(entry_to_app_row(entry))
+    # resort after append
+    rows.sort(key=_row_sort_key, reverse=True)
+    ok = write_json(diary_file(), rows)
+    if ok and current:
+        # keep the usage / search indexes in step with the file instead of rebuilding them
+        version = diary_version()
+        for name, state in current:
+            index = state["index"]
+            index.add(entry)
+            if name == "search_index" and not index.ordered:
+                # a backdated entry; rebuild in date order on the next search so it can stop at `limit` again
+                state["index"] = None
+                continue
+            state["version"] = version
+            _account(name, version)
+    return ok
+
+
+def start_metrics_exporter(port: Optional[int] = None) -> Optional[int]:
+    """Serve Prometheus metrics on `port` (default: $BEAUTY_AGENT_METRICS_PORT). Safe to call on every rerun."""
+    if port is None:
+        value = os.environ.get("BEAUTY_AGENT_METRICS_PORT", "").strip()
+        if not value.isdigit():
+            return None
+        port = int(value)
+    from metrics_exporter import start_exporter  # http.server only when exporting
+
+    register_gauge("diary_entries", "Entries in the default user's skin_diary.json.", _default_diary_rows)
+    register_gauge("tenant_cache_bytes", "Estimated bytes held in per-user diary caches.", lambda: TENANTS.total_bytes)
+    register_gauge("tenant_cache_users", "Users with cached diary data.", TENANTS.users)
+    register_gauge("catalog_products", "Products in the local catalog.", lambda: len(load_catalog(PRODUCTS_FILE, DEFAULT_PRODUCTS)))
+    start_exporter(port)
+    return port
+
+
+def start_catalog_watcher() -> None:
+    """Reload products_local.json in the background when it changes. Safe to call on every rerun."""
+    watch_catalog(PRODUCTS_FILE, DEFAULT_PRODUCTS)
+
+
+def catalog_reload_error() -> Optional[str]:
+    # why the latest edit of products_local.json was rejected (the previous catalog keeps serving)
+    return reload_error(PRODUCTS_FILE)
+
+
+# Item -> days-used index (usage_impact.py), per user, maintained incrementally by save_diary_entry.
+# Product names map to categories, so the index is also rebuilt when the catalog is reloaded.
+@timed()
+def usage_index() -> UsageIndex:
+    state = _tenant_state("usage_index", _new_index_state)
+    version = diary_version()
+    catalog = load_catalog(PRODUCTS_FILE, DEFAULT_PRODUCTS)
+    stale = state["index"] is None or state["version"] != version or state.get("catalog") != catalog.version
+    cache_hit("usage_index", not stale)
+    if stale:
+        index = UsageIndex(category_names(catalog))
+        index.extend(_refresh_diaries()["entries"])
+        state["index"] = index
+        state["version"] = version
+        state["catalog"] = catalog.version
+        _account("usage_index", version)
+    return state["index"]
+
+
+# Full-text n-gram index over the diaries (journal_search.py), per user, also updated on save.
+@timed()
+def search_diaries(query: str, limit: int = 50) -> List[JournalEntry]:
+    state = _tenant_state("search_index", _new_index_state)
+    version = diary_version()
+    index = state["index"]
+    stale = index is None or state["version"] != version
+    cache_hit("search_index", not stale)
+    if stale:
+        index = JournalSearchIndex()
+        index.extend(_refresh_diaries()["asc"])  # oldest first, so results can stop at `limit`
+        state["index"] = index
+        state["version"] = version
+        _account("search_index", version)
+    return index.search(query, limit=limit)
+
+
+@timed()
+def load_products() -> List[Product]:
+    # Parsed once by the shared catalog store; re-read only when the file changes.
+    return list(load_catalog(PRODUCTS_FILE, DEFAULT_PRODUCTS).products)
+
+
+def load_product_profiles() -> Dict[str, IngredientProfile]:
+    # Ingredient class bits per product id, analyzed once when the catalog is (re)loaded.
+    return load_catalog(PRODUCTS_FILE, DEFAULT_PRODUCTS).profiles
+
+
+def get_product_name(prod: Product, lang: str) -> str:
+    return prod.display_name(lang)
+
+
+def get_product_desc(prod: Product, lang: str) -> str:
+    return prod.display_desc(lang)
+
+
+# =========================
+# Ingredient Analysis (Rule-based)
+# =========================
+# ingredient dictionary class (ingredient_dict.py) -> displayed category
+CATEGORY_CLASSES = {
+    "fragrance": "fragrance",
+    "allergen": "fragrance_allergen",
+    "drying_alcohol": "drying_alcohol",
+    "humectant": "humectant",
+    "soothing": "soothing",
+    "brightening": "brightening",
+    "exfoliant": "exfoliant",
+    "active": "active",
+}
+
+
+def normalize_token(s: str) -> str:
+    s = s.strip().lower()
+    s = re.sub(r"\s+", " ", s)
+    return s
+
+
+def parse_ingredients(text: str) -> List[str]:
+    out = []
+    for p in split_ingredients(text):
+        p2 = normalize_token(p)
+        if p2:
+            out.append(p2)
+    return out
+
+
+@timed()
+def analyze_ingredients(ingredient_text: str, lang: str, max_distance: int = MAX_DISTANCE) -> Dict[str, Any]:
+    tokens = parse_ingredients(ingredient_text)
+
+    categories: Dict[str, List[str]] = {key: [] for key in CATEGORY_CLASSES}
+    d = load_dictionary()
+
+    fuzzy: List[FuzzyMatch] = []
+
+    found: List[str] = []
+
+    for tok in tokens:
+        ids, guess = d.resolve(tok, max_distance)
+        if guess is not None:
+            fuzzy.append(guess)
+        found.extend(ids)
+        classes = set()
+        for cid in ids:
+            classes |= d.classes_of(cid)
+        for key, cls in CATEGORY_CLASSES.items():
+            if cls in classes:
+                categories[key].append(tok)
+
+    warnings = []
+    if categories["fragrance"] or categories["allergen"]:
+        warnings.append(t("warn_patchtest", lang))
+    if categories["drying_alcohol"]:
+        warnings.append(t("warn_alcohol", lang))
+    for hit in load_conflict_graph().check_profile(profile_for_ids(d, found)):
+        warnings.append(hit.rule.message(lang))
+
+    notes = [t("note_rulebased", lang)]
+    for m in fuzzy:
+        notes.append(t("note_fuzzy", lang).format(src=m.text, dst=d.display_name(m.id, lang), conf=m.confidence))
+    rules_problem = rules_error()
+    if rules_problem:
+        notes.append(t("note_rules_error", lang).format(error=rules_problem))
+
+    # de-dup and sort display
+    for key in categories:
+        categories[key] = sorted(list(dict.fromkeys(categories[key])))
+
+    return {
+        "tokens": tokens,
+        "categories": categories,
+        "fuzzy": [{"token": m.text, "id": m.id, "distance": m.distance, "confidence": m.confidence} for m in fuzzy],
+        "warnings": warnings,
+        "notes": notes,
+    }
+
+
+# =========================
+# Trend / Routine / Templates
+# =========================
+@timed()
+def summarize_trends(diaries: List[JournalEntry]) -> Dict[str, Any]:
+    if not diaries:
+        return {
+            "count": 0,
+            "avg_sleep": None,
+            "avg_stress": None,
+            "symptom_counts": {},
+            "recent": [],
+        }
+
+    sleeps = []
+    stresses = []
+    symptom_counts: Dict[str, int] = {}
+    chart_rows = []
+
+    for d in diaries:
+        sleep = d.sleep_hours
+        stress = float(d.stress) if d.stress is not None else None
+        if sleep is not None:
+            sleeps.append(sleep)
+        if stress is not None:
+            stresses.append(stress)
+
+        for s in d.symptoms:
+            symptom_counts[s] = symptom_counts.get(s, 0) + 1
+
+        chart_rows.append(
+            {
+                "date": d.date,
+                "sleep": sleep,
+                "stress": stress,
+            }
+        )
+
+    avg_sleep = round(sum(sleeps) / len(sleeps), 2) if sleeps else None
+    avg_stress = round(sum(stresses) / len(stresses), 2) if stresses else None
+
+    chart_rows = [r for r in chart_rows if r["date"]]
+    chart_rows = sorted(chart_rows, key=lambda x: x["date"])
+
+    top_symptoms = sorted(symptom_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+
+    return {
+        "count": len(diaries),
+        "avg_sleep": avg_sleep,
+        "avg_stress": avg_stress,
+        "symptom_counts": symptom_counts,
+        "top_symptoms": top_symptoms,
+        "chart_rows": chart_rows,
+        "recent": diaries[:5],
+    }
+
+
+@timed()
+def diary_analytics() -> DiaryAnalytics:
+    # co-occurrence / rolling rates / lagged correlations, recomputed only when the diary file changes
+    state = _tenant_state("analytics", _new_index_state)
+    version = diary_version()
+    if state["index"] is None or state["version"] != version:
+        cols = JournalColumns()
+        cols.extend(_refresh_diaries()["entries"])
+        state["index"] = analyze(cols)
+        state["version"] = version
+        _account("analytics", version)
+    return state["index"]
+
+
+@timed()
+def generate_routine(profile: Dict[str, Any], lang: str) -> Dict[str, List[Dict[str, Any]]]:
+    skin_type = profile.get("skin_type", "unknown")
+    concerns = set(profile.get("concerns", []))
+    fragrance_pref = profile.get("fragrance_pref", "any")
+    am_min = int(profile.get("am_minutes", 3))
+    pm_min = int(profile.get("pm_minutes", 10))
+
+    def step(name_key: str, desc_map: Dict[str, str], minute: int, optional: bool = False) -> Dict[str, Any]:
+        return {
+            "title": name_key,
+            "desc": desc_map.get(lang) or desc_map.get("ja") or "",
+            "minutes": minute,
+            "optional": optional,
+        }
+
+    # Base AM
+    am_steps = [
+        step("cleanse", {
+            "ja": "ぬるま湯洗顔 or やさしい洗顔で皮脂を整える",
+            "en": "Rinse or use a gentle cleanser to reset oil/sweat",
+            "ko": "미온수 세안 또는 순한 클렌저로 유분 정리",
+            "zh": "温水清洁或温和洁面，整理皮脂与汗水",
+        }, 1),
+        step("tone", {
+            "ja": "化粧水で水分補給（手でやさしく）",
+            "en": "Hydrating toner application (gently with hands)",
+            "ko": "토너로 수분 보충 (손으로 가볍게)",
+            "zh": "使用化妆水补水（轻柔按压）",
+        }, 1),
+        step("serum", {
+            "ja": "悩みに合わせて美容液を1種だけ",
+            "en": "Use one serum matching your main concern",
+            "ko": "주요 고민에 맞는 세럼 1가지만 사용",
+            "zh": "按主要困扰选择一种精华即可",
+        }, 1, optional=True),
+        step("moisturize", {
+            "ja": "乳液/クリームで保湿バランス調整",
+            "en": "Seal hydration with lotion/cream",
+            "ko": "로션/크림으로 수분막 마무리",
+            "zh": "用乳液/面霜锁水收尾",
+        }, 1),
+        step("sunscreen", {
+            "ja": "日焼け止めを十分量",
+            "en": "Apply sufficient sunscreen",
+            "ko": "충분량의 선크림 사용",
+            "zh": "足量使用防晒",
+        }, 1),
+    ]
+
+    # Base PM
+    pm_steps = [
+        step("cleanse", {
+            "ja": "メイク/日焼け止めを落とし、やさしく洗顔",
+            "en": "Remove makeup/sunscreen, then cleanse gently",
+            "ko": "메이크업/선케어 제거 후 순하게 세안",
+            "zh": "先卸除防晒/彩妆，再温和洁面",
+        }, 2),
+        step("tone", {
+            "ja": "化粧水で水分補給",
+            "en": "Hydrating toner",
+            "ko": "토너로 수분 보충",
+            "zh": "化妆水补水",
+        }, 1),
+        step("serum", {
+            "ja": "美容液（攻め成分は1つまで）",
+            "en": "Serum (limit strong actives to one at a time)",
+            "ko": "세럼 (강한 활성 성분은 한 번에 1개)",
+            "zh": "精华（功效型成分一次尽量只用一种）",
+        }, 2),
+        step("moisturize", {
+            "ja": "乳液/クリームで保湿",
+            "en": "Moisturizer/cream",
+            "ko": "로션/크림 보습",
+            "zh": "乳液/面霜保湿",
+        }, 2),
+        step("spot", {
+            "ja": "必要なら部分用ケアを気になる箇所へ",
+            "en": "Optional spot care for local concerns",
+            "ko": "필요 시 고민 부위에 국소 케어",
+            "zh": "如有需要可进行局部护理",
+        }, 1, optional=True),
+    ]
+
+    # Concern-based tuning
+    if "redness" in concerns or "sensitivity" in concerns or skin_type == "sensitive":
+        for s in am_steps + pm_steps:
+            if s["title"] == "serum":
+                s["desc"] = {
+                    "ja": "刺激が少ない整肌系を優先（新規導入は少量から）",
+                    "en": "Prefer gentle soothing serums (introduce new products slowly)",
+                    "ko": "자극 적은 진정 세럼 우선 (새 제품은 소량부터)",
+                    "zh": "优先选择温和舒缓型精华（新品从少量开始）",
+                }.get(lang, s["desc"])
+        if fragrance_pref != "like":
+            for s in am_steps + pm_steps:
+                if s["title"] in ("tone", "moisturize"):
+                    s["desc"] += {
+                        "ja": "（無香料寄り推奨）",
+                        "en": " (fragrance-free preferred)",
+                        "ko": " (무향 추천)",
+                        "zh": "（建议偏无香）",
+                    }.get(lang, "")
+
+    if "dryness" in concerns or skin_type == "dry":
+        for s in am_steps + pm_steps:
+            if s["title"] == "tone":
+                s["desc"] = {
+                    "ja": "化粧水は重ね付け1〜2回で水分補給",
+                    "en": "Layer toner 1–2 times for extra hydration",
+                    "ko": "토너를 1~2회 레이어링해 수분 보충",
+                    "zh": "化妆水可叠涂1～2次加强补水",
+                }.get(lang, s["desc"])
+            if s["title"] == "moisturize":
+                s["desc"] = {
+                    "ja": "乳液/クリームをややしっかりめに",
+                    "en": "Use a slightly richer moisturizer/cream",
+                    "ko": "보습제를 조금 더 리치하게 사용",
+                    "zh": "保湿步骤可用稍微更滋润的乳霜",
+                }.get(lang, s["desc"])
+
+    if "oiliness" in concerns or skin_type == "oily":
+        for s in am_steps + pm_steps:
+            if s["title"] == "moisturize":
+                s["desc"] = {
+                    "ja": "ジェル/軽い乳液でベタつきを抑えて保湿",
+                    "en": "Use a gel/light lotion to hydrate without heaviness",
+                    "ko": "젤/라이트 로션으로 번들거림 줄이며 보습",
+                    "zh": "使用凝胶或轻乳液，减少厚重感同时保湿",
+                }.get(lang, s["desc"])
+
+    if "acne" in concerns:
+        for s in pm_steps:
+            if s["title"] == "spot":
+                s["optional"] = False
+                s["desc"] = {
+                    "ja": "部分用ケアを気になる箇所に薄く",
+                    "en": "Apply spot care thinly on concern areas",
+                    "ko": "고민 부위에 스팟 케어를 얇게 도포",
+                    "zh": "在问题区域薄涂局部护理产品",
+                }.get(lang, s["desc"])
+
+    # Fit to time budget
+    def fit_steps(steps: List[Dict[str, Any]], max_minutes: int) -> List[Dict[str, Any]]:
+        total = 0
+        fitted: List[Dict[str, Any]] = []
+        # Always keep sunscreen in AM and cleanse/moisturize in PM if possible
+        for s in steps:
+            m = int(s.get("minutes", 1))
+            optional = bool(s.get("optional", False))
+            must_keep = s["title"] in {"cleanse", "moisturize", "sunscreen"}  # sunscreen ignored if PM list has none
+            if total + m <= max_minutes:
+                fitted.append(s)
+                total += m
+            else:
+                if not optional and must_keep:
+                    # squeeze in as 1 min summary step if no room
+                    short_s = dict(s)
+                    short_s["minutes"] = 1
+                    suffix = {
+                        "ja": "（時短版）",
+                        "en": " (quick)",
+                        "ko": " (간단)",
+                        "zh": "（精简）",
+                    }.get(lang, "")
+                    short_s["desc"] = str(short_s["desc"]) + suffix
+                    if total + 1 <= max_minutes:
+                        fitted.append(short_s)
+                        total += 1
+        return fitted
+
+    return {
+        "am": fit_steps(am_steps, max(2, am_min)),
+        "pm": fit_steps(pm_steps, max(3, pm_min)),
+    }
+
+
+def get_symptom_templates(lang: str) -> Dict[str, Dict[str, List[str]]]:
+    return {
+        "dryness": {
+            "label": {
+                "ja": "乾燥", "en": "Dryness", "ko": "건조", "zh": "干燥"
+            }.get(lang, "Dryness"),
+            "am": {
+                "ja": ["洗いすぎを避ける", "保湿化粧水を重ねすぎず丁寧に", "日中は乾燥を感じたら保湿ミストより乳液少量を検討"],
+                "en": ["Avoid over-cleansing", "Use a hydrating toner gently", "For daytime dryness, a small amount of lotion may help more than mist"],
+                "ko": ["과세안 피하기", "보습 토너를 부드럽게 사용", "낮 건조감에는 미스트보다 소량 로션이 도움이 될 수 있음"],
+                "zh": ["避免过度清洁", "温和使用保湿化妆水", "白天干燥时可考虑少量乳液而不只是喷雾"],
+            }.get(lang, []),
+            "pm": {
+                "ja": ["洗顔後は早めに保湿", "美容液は1種に絞る", "最後にクリームで水分蒸発を防ぐ"],
+                "en": ["Moisturize soon after cleansing", "Limit serums to one", "Finish with cream to reduce moisture loss"],
+                "ko": ["세안 후 빠르게 보습", "세럼은 1종 위주", "마지막에 크림으로 수분 증발 방지"],
+                "zh": ["洁面后尽快保湿", "精华尽量只选一种", "最后用面霜减少水分流失"],
+            }.get(lang, []),
+            "avoid": {
+                "ja": ["熱いお湯", "強い角質ケアの連用", "香りの強い新製品を一気に増やす"],
+                "en": ["Hot water", "Frequent strong exfoliation", "Adding multiple strongly fragranced new products at once"],
+                "ko": ["뜨거운 물", "강한 각질 케어의 연속 사용", "향 강한 신제품을 한꺼번에 추가"],
+                "zh": ["过热的水", "频繁使用强去角质", "一次性加入多种浓香新品"],
+            }.get(lang, []),
+            "hospital": {
+                "ja": ["強いヒリつき・腫れ・痛み・ジュクジュクが続く場合は皮膚科へ"],
+                "en": ["See a dermatologist if severe stinging, swelling, pain, or oozing continues"],
+                "ko": ["심한 따가움·붓기·통증·진물이 지속되면 피부과 진료 권장"],
+                "zh": ["若明显刺痛、肿胀、疼痛或渗出持续，请及时就医"],
+            }.get(lang, []),
+        },
+        "redness": {
+            "label": {
+                "ja": "赤み", "en": "Redness", "ko": "홍조", "zh": "泛红"
+            }.get(lang, "Redness"),
+            "am": {
+                "ja": ["摩擦を減らす（こすらない）", "無香料寄りを優先", "紫外線対策を丁寧に"],
+                "en": ["Reduce friction", "Prioritize fragrance-free options", "Be consistent with UV protection"],
+                "ko": ["마찰 줄이기", "무향 제품 우선", "자외선 차단 꼼꼼히"],
+                "zh": ["减少摩擦", "优先无香产品", "认真做好防晒"],
+            }.get(lang, []),
+            "pm": {
+                "ja": ["新しい攻め成分の同時併用を避ける", "シンプルな保湿中心にする", "赤みが強い日は手順を減らす"],
+                "en": ["Avoid combining new strong actives", "Keep routine simple and moisturizing", "On red days, reduce total steps"],
+                "ko": ["새로운 강한 활성 성분 동시 사용 피하기", "단순 보습 위주 루틴", "홍조 심한 날은 단계 줄이기"],
+                "zh": ["避免叠加新功效型成分", "以简洁保湿为主", "泛红明显时减少步骤数量"],
+            }.get(lang, []),
+            "avoid": {
+                "ja": ["スクラブ", "強いピーリング", "熱刺激（熱い風呂・サウナ直後）"],
+                "en": ["Scrubs", "Strong peels", "Heat triggers (hot bath/sauna immediately)"],
+                "ko": ["스크럽", "강한 필링", "열 자극 (뜨거운 목욕/사우나 직후)"],
+                "zh": ["磨砂", "强效焕肤/酸类过度使用", "高热刺激（热水澡/桑拿后）"],
+            }.get(lang, []),
+            "hospital": {
+                "ja": ["赤みが広がる・痛む・腫れる・長引く場合は皮膚科へ"],
+                "en": ["See a dermatologist if redness spreads, hurts, swells, or persists"],
+                "ko": ["붉음이 퍼지거나 아프고 붓거나 오래 지속되면 진료 권장"],
+                "zh": ["若泛红扩散、疼痛、肿胀或持续不退，请就医"],
+            }.get(lang, []),
+        },
+        "oiliness": {
+            "label": {
+                "ja": "ベタつき", "en": "Oiliness", "ko": "번들거림", "zh": "出油"
+            }.get(lang, "Oiliness"),
+            "am": {
+                "ja": ["洗いすぎず軽く整える", "さっぱり系保湿を省かない", "日焼け止めは軽い質感を選ぶ"],
+                "en": ["Cleanse lightly, not aggressively", "Do not skip light hydration", "Choose lightweight sunscreen textures"],
+                "ko": ["과하게 씻지 말고 가볍게 정리", "가벼운 보습은 생략하지 않기", "가벼운 제형 선케어 선택"],
+                "zh": ["轻度清洁不要过度", "不要省略清爽保湿", "选择轻薄型防晒"],
+            }.get(lang, []),
+            "pm": {
+                "ja": ["落とすケアを丁寧に", "毛穴/皮脂向け成分は頻度調整", "乾燥させすぎない保湿を入れる"],
+                "en": ["Cleanse thoroughly but gently", "Adjust frequency of pore/oil-care actives", "Add non-heavy hydration to avoid over-drying"],
+                "ko": ["세정은 꼼꼼하지만 순하게", "모공/피지 성분은 빈도 조절", "과건조 방지를 위한 가벼운 보습"],
+                "zh": ["清洁到位但保持温和", "控油/毛孔成分注意频率", "加入不过度厚重的保湿避免越控越油"],
+            }.get(lang, []),
+            "avoid": {
+                "ja": ["強い脱脂を毎日", "保湿を完全に抜く", "気になるから何度も洗顔"],
+                "en": ["Daily harsh stripping", "Skipping moisturizer entirely", "Washing repeatedly because of shine"],
+                "ko": ["매일 강한 탈지 세안", "보습 완전 생략", "번들거림 때문에 잦은 세안"],
+                "zh": ["每天强力去脂", "完全不保湿", "因为油光频繁洗脸"],
+            }.get(lang, []),
+            "hospital": {
+                "ja": ["炎症ニキビが増える・痛み/化膿がある場合は皮膚科へ"],
+                "en": ["See a dermatologist if inflammatory acne increases or becomes painful/pus-filled"],
+                "ko": ["염증성 트러블 증가, 통증/고름이 있으면 피부과 진료 권장"],
+                "zh": ["若炎症痘增多，出现疼痛或化脓，请及时就医"],
+            }.get(lang, []),
+        },
+    }
+
+
+# =========================
+# Product Recommendation
+# =========================
+# score for each matched concern; also the unit of the conflict penalty (ingredient_rules.CONFLICT_PENALTY)
+CONCERN_MATCH = 2.5
+
+
+@timed()
+def recommend_products(
+    products: List[Product],
+    profile: Dict[str, Any],
+    limit: int = 8,
+    profiles: Optional[Dict[str, IngredientProfile]] = None,
+) -> List[Product]:
+    skin_type = profile.get("skin_type", "unknown")
+    concerns = set(profile.get("concerns", []))
+    fragrance_pref = profile.get("fragrance_pref", "any")
+    budget = int(profile.get("monthly_budget", 5000))
+    am_min = int(profile.get("am_minutes", 3))
+    pm_min = int(profile.get("pm_minutes", 10))
+    time_budget_factor = am_min + pm_min
+
+    # scores live in a parallel array indexed like `products` (no per-row tuples/copies)
+    scores = array("d")
+
+    for p in products:
+        score = 0.0
+        price = p.price_jpy
+        p_skin = p.skin_types
+        p_concerns = set(p.concerns)
+        frag = p.fragrance
+
+        # skin type matching
+        if skin_type == "unknown":
+            score += 1.0
+        elif skin_type in p_skin:
+            score += 3.0
+        else:
+            score -= 0.5
+
+        # concern matching
+        overlap = len(concerns & p_concerns)
+        score += overlap * CONCERN_MATCH
+
+        # fragrance preference
+        if fragrance_pref == "none":
+            if frag == "none":
+                score += 2.5
+            elif frag == "light":
+                score -= 0.5
+            else:
+                score -= 2.0
+        elif fragrance_pref == "light":
+            if frag in ("none", "light"):
+                score += 1.5
+        elif fragrance_pref == "like":
+            if frag in ("light", "like"):
+                score += 1.2
+
+        # price fit
+        # rough bundle assumption (3-5 items per month)
+        ideal_single = max(800, budget / 4)
+        if price <= budget:
+            score += 1.0
+        score -= abs(price - ideal_single) / 3000.0
+
+        # time budget preference: if short, prioritize simple steps / multi-use textures
+        p_type = p.type
+        if time_budget_factor <= 10:
+            if p_type in {"lotion", "moisturizer", "sunscreen"}:
+                score += 0.8
+            if p_type == "serum":
+                score += 0.2
+        else:
+            if p_type in {"serum", "spot"}:
+                score += 0.5
+
+        scores.append(score)
+
+    # Pick best-first from a heap, checking each candidate's ingredient class bits against the
+    # OR of the picks so far. A candidate whose penalty differs from the one already applied to
+    # its heap score is re-queued with the corrected score and checked again when it comes back
+    # to the top. The penalty can grow or shrink as picks are added (graph.added skips pairs the
+    # picks already contribute), so it is accepted only at the exact current penalty.
+    if profiles is None:
+        # analyzed once per catalog load; products outside the loaded catalog get no conflict check
+        profiles = load_product_profiles()
+    graph = load_conflict_graph()
+    mask = multi = 0
+    heap = [(-score, i, 0.0) for i, score in enumerate(scores)]
+    heapq.heapify(heap)
+    picked: List[Product] = []
+    while heap and len(picked) < limit:
+        neg_score, i, applied = heapq.heappop(heap)
+        prof = profiles.get(products[i].id)
+        if prof is not None:
+            hits = graph.added(mask, multi, prof)
+            if hits and hits[0].severity == "high":
+                continue
+            penalty = conflict_penalty(hits, CONCERN_MATCH)
+            if penalty != applied:
+                heapq.heappush(heap, (neg_score + penalty - applied, i, penalty))
+                continue
+            mask, multi = add_profile(mask, multi, prof)
+        picked.append(products[i])
+
+    # Keep a sensible mix (EC-like variety)
+    type_quota = {"cleanser": 1, "lotion": 2, "serum": 2, "moisturizer": 2, "sunscreen": 1, "spot": 1}
+    final: List[Product] = []
+    used_type_count: Dict[str, int] = {}
+
+    for p in picked:
+        p_type = p.type
+        current = used_type_count.get(p_type, 0)
+        if current < type_quota.get(p_type, 2):
+            final.append(p)
+            used_type_count[p_type] = current + 1
+
+    # backfill if too few
+    if len(final) < min(limit, len(picked)):
+        for p in picked:
+            if p not in final:
+                final.append(p)
+            if len(final) >= min(limit, len(picked)):
+                break
+
+    return final
+
+
+# =========================
+# Labels
+# =========================
+def concern_label(code: str, lang: str) -> str:
+    key_map = {
+        "dryness": "concern_dryness",
+        "redness": "concern_redness",
+        "oiliness": "concern_oiliness",
+        "pores": "concern_pores",
+        "dullness": "concern_dullness",
+        "acne": "concern_acne",
+        "sensitivity": "concern_sensitivity",
+    }
+    return t(key_map.get(code, "symptom_none"), lang)
+
+
+def skin_type_label(code: str, lang: str) -> str:
+    key_map = {
+        "normal": "skin_normal",
+        "dry": "skin_dry",
+        "oily": "skin_oily",
+        "combo": "skin_combo",
+        "sensitive": "skin_sensitive",
+        "unknown": "skin_unknown",
+    }
+    return t(key_map.get(code, "skin_unknown"), lang)
+
+
+def fragrance_label(code: str, lang: str) -> str:
+    key_map = {
+        "any": "fragrance_any",
+        "none": "fragrance_none",
+        "light": "fragrance_light",
+        "like": "fragrance_like",
+    }
+    return t(key_map.get(code, "fragrance_any"), lang)
+
+
+def product_type_label(code: str, lang: str) -> str:
+    key_map = {
+        "cleanser": "product_type_cleanser",
+        "lotion": "product_type_lotion",
+        "serum": "product_type_serum",
+        "moisturizer": "product_type_moisturizer",
+        "sunscreen": "product_type_sunscreen",
+        "spot": "product_type_spot",
+    }
+    return t(key_map.get(code, "product_type_serum"), lang)
+
+
+def category_label(code: str, lang: str) -> str:
+    key_map = {
+        "fragrance": "category_fragrance",
+        "allergen": "category_allergen",
+        "drying_alcohol": "category_drying_alcohol",
+        "humectant": "category_humectant",
+        "soothing": "category_soothing",
+        "brightening": "category_brightening",
+        "exfoliant": "category_exfoliant",
+        "active": "category_active",
+    }
+    return t(key_map.get(code, code), lang)
@@ -1,8 +1,30 @@
+import argparse
+import dataclasses
+import functools
+import io
 import json
+import os
 import re
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import Future
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from catalog import CONCERN_CODES, SKIN_TYPE_CODES, Catalog, Product, ScoredProduct, file_version, load_catalog, product_to_cli_row
+from catalog_reload import reload_error, watch_catalog
+from ingredient_dict import MAX_DISTANCE, load_dictionary, split_ingredients
+from ingredient_rules import ConflictHit, IngredientProfile, add_profile, conflict_penalty, load_conflict_graph, profile_for_ids, rules_error
+from journal import JournalEntry, entry_from_cli_row, entry_to_cli_row
+from journal_analytics import analytics_for_jsonl, format_analytics
+from journal_search import search_index_for_jsonl
+from metrics import format_snapshot, incr, register_gauge, reset as reset_metrics, snapshot as metrics_snapshot, timed, timer
+from slow_profile import format_profile_summary, profiler_from_env, summarize_profiles
+from tenants import user_dir
+from usage_impact import format_impacts, usage_for_jsonl
 
 # =========================================================
 # ローカル完全版 美容AI（API不要）
@@ -19,8 +41,20 @@ DATA_DIR = Path("beauty_agent_data")
 JOURNAL_PATH = DATA_DIR / "journal.jsonl"
 PROFILE_PATH = DATA_DIR / "profile.json"        # 任意: allergies, preferences など
 PRODUCTS_PATH = DATA_DIR / "products_local.json"
+PROFILES_DIR = DATA_DIR / "profiles"           # 遅いリクエストの cProfile / tracemalloc（slow_profile.py）
 
 DATA_DIR.mkdir(parents=True, exist_ok=True)
+SLOW_REQUESTS = profiler_from_env(PROFILES_DIR)
+
+
+def use_user(user_id: str) -> Path:
+    """日記とプロフィールを beauty_agent_data/users/<id>/ に切り替える（"" は従来の場所。商品DBは共通）。"""
+    global JOURNAL_PATH, PROFILE_PATH
+    base = user_dir(DATA_DIR, user_id)
+    base.mkdir(parents=True, exist_ok=True)
+    JOURNAL_PATH = base / "journal.jsonl"
+    PROFILE_PATH = base / "profile.json"
+    return base
 
 # ---------------------------------------------------------
 # 共通ユーティリティ
@@ -28,6 +62,7 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 def now_iso() -> str:
     return datetime.utcnow().isoformat() + "Z"
 
+@timed()
 def read_json(path: Path, default: Any):
     if not path.exists():
         return default
@@ -36,13 +71,16 @@ def read_json(path: Path, default: Any):
     except Exception:
         return default
 
+@timed()
 def write_json(path: Path, data: Any):
     path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
 
+@timed()
 def append_jsonl(path: Path, row: Dict[str, Any]):
     with path.open("a", encoding="utf-8") as f:
         f.write(json.dumps(row, ensure_ascii=False) + "\n")
 
+@timed()
 def read_jsonl(path: Path) -> List[Dict[str, Any]]:
     if not path.exists():
         return []
@@ -58,9 +96,21 @@ def read_jsonl(path: Path) -> List[Dict[str, Any]]:
                 continue
     return rows
 
-def print_ai(text: str):
-    for line in text.splitlines():
-        print("美容AI > " + line)
+_jsonl_rows: Dict[str, Tuple[Optional[Tuple[int, int]], int]] = {}
+
+def count_jsonl_rows(path: Path) -> int:
+    # 行数だけ数える（パースしない）。ファイルが変わっていなければ前回の値
+    version = file_version(path)
+    cached = _jsonl_rows.get(str(path))
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    n = 0
+    if version is not None:
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                n += chunk.count(b"\n")
+    _jsonl_rows[str(path)] = (version, n)
+    return n
 
 # ---------------------------------------------------------
 # ローカル商品DB（初期データ）
@@ -85,7 +135,8 @@ def ensure_local_products():
             "good_for": ["乾燥", "赤み"],
             "avoid_if": [],
             "notes": "朝夜使いやすい低刺激寄り",
-            "tags": ["低刺激", "ジェル", "毎日"]
+            "tags": ["低刺激", "ジェル", "毎日"],
+            "ingredients": "水、グリセリン、ココイルグルタミン酸Na、BG、ベタイン、クエン酸、フェノキシエタノール"
         },
         {
             "id": "c02",
@@ -99,7 +150,8 @@ def ensure_local_products():
             "good_for": ["ベタつき"],
             "avoid_if": ["赤み"],
             "notes": "皮脂が気になる日に向く",
-            "tags": ["泡", "さっぱり"]
+            "tags": ["泡", "さっぱり"],
+            "ingredients": "水、ミリスチン酸、グリセリン、水酸化K、ラウリン酸、BG、フェノキシエタノール"
         },
 
         # 化粧水
@@ -115,7 +167,8 @@ def ensure_local_products():
             "good_for": ["乾燥", "赤み"],
             "avoid_if": [],
             "notes": "刺激が少ない前提のシンプル保湿",
-            "tags": ["保湿", "シンプル"]
+            "tags": ["保湿", "シンプル"],
+            "ingredients": "水、グリセリン、BG、ヒアルロン酸Na、セラミドNP、パンテノール、フェノキシエタノール"
         },
         {
             "id": "t02",
@@ -129,7 +182,8 @@ def ensure_local_products():
             "good_for": ["ベタつき"],
             "avoid_if": [],
             "notes": "ベタつきやすい人向けの軽い使用感想定",
-            "tags": ["軽め", "さっぱり"]
+            "tags": ["軽め", "さっぱり"],
+            "ingredients": "水、BG、エタノール、グリコール酸、ハマメリス葉エキス、PEG-60水添ヒマシ油、フェノキシエタノール"
         },
 
         # 美容液
@@ -145,7 +199,8 @@ def ensure_local_products():
             "good_for": ["乾燥", "赤み"],
             "avoid_if": [],
             "notes": "保湿寄りの毎日使い想定",
-            "tags": ["保湿", "毎日"]
+            "tags": ["保湿", "毎日"],
+            "ingredients": "水、グリセリン、DPG、ヒアルロン酸Na、アラントイン、グリチルリチン酸2K、セラミドNP、フェノキシエタノール"
         },
         {
             "id": "s02",
@@ -159,7 +214,23 @@ def ensure_local_products():
             "good_for": ["ベタつき", "毛穴目立ち"],
             "avoid_if": ["赤み"],
             "notes": "刺激が出やすい人は様子見",
-            "tags": ["整肌", "軽め"]
+            "tags": ["整肌", "軽め"],
+            "ingredients": "水、BG、ナイアシンアミド、サリチル酸、グリセリン、キサンタンガム、フェノキシエタノール"
+        },
+        {
+            "id": "s03",
+            "name": "レチノール美容液C（夜用）",
+            "category": "美容液",
+            "price_jpy": 2800,
+            "months_last": 2.0,
+            "fragrance_free": True,
+            "alcohol_free": True,
+            "skin_types": ["混合", "脂性", "普通"],
+            "good_for": ["毛穴目立ち", "くすみ"],
+            "avoid_if": ["赤み", "乾燥"],
+            "notes": "夜だけ・少量から。酸（AHA/BHA）との同じ夜の併用は避ける",
+            "tags": ["レチノール", "夜向け"],
+            "ingredients": "水、スクワラン、グリセリン、レチノール、トコフェロール、BG、フェノキシエタノール"
         },
 
         # 乳液 / クリーム
@@ -175,7 +246,8 @@ def ensure_local_products():
             "good_for": ["ベタつき", "乾燥"],
             "avoid_if": [],
             "notes": "量で調整しやすい",
-            "tags": ["軽い", "調整しやすい"]
+            "tags": ["軽い", "調整しやすい"],
+            "ingredients": "水、スクワラン、グリセリン、BG、ジメチコン、カルボマー、フェノキシエタノール"
         },
         {
             "id": "m02",
@@ -189,7 +261,8 @@ def ensure_local_products():
             "good_for": ["乾燥", "赤み"],
             "avoid_if": ["ベタつき"],
             "notes": "乾燥部位中心の使用向け",
-            "tags": ["高保湿", "夜向け"]
+            "tags": ["高保湿", "夜向け"],
+            "ingredients": "水、グリセリン、シア脂、セラミドNP、ワセリン、パンテノール、フェノキシエタノール"
         },
 
         # 日焼け止め
@@ -205,7 +278,8 @@ def ensure_local_products():
             "good_for": ["赤み", "乾燥"],
             "avoid_if": [],
             "notes": "低刺激寄りの想定",
-            "tags": ["UV", "低刺激"]
+            "tags": ["UV", "低刺激"],
+            "ingredients": "水、酸化亜鉛、酸化チタン、シクロペンタシロキサン、グリセリン、BG"
         },
         {
             "id": "u02",
@@ -219,37 +293,37 @@ def ensure_local_products():
             "good_for": ["ベタつき"],
             "avoid_if": ["赤み", "乾燥"],
             "notes": "軽い使用感優先。乾燥・赤み時は注意",
-            "tags": ["UV", "軽い"]
+            "tags": ["UV", "軽い"],
+            "ingredients": "水、エタノール、メトキシケイヒ酸エチルヘキシル、ジエチルアミノヒドロキシベンゾイル安息香酸ヘキシル、テトラヘキシルデカン酸アスコルビル、BG"
         }
     ]
     write_json(PRODUCTS_PATH, seed)
 
-def load_products() -> List[Dict[str, Any]]:
+@timed()
+def load_product_catalog() -> Catalog:
+    # パースは catalog のストアで1回だけ（ファイル更新時のみ再読込）
     ensure_local_products()
-    data = read_json(PRODUCTS_PATH, [])
-    return data if isinstance(data, list) else []
+    return load_catalog(PRODUCTS_PATH)
+
+def load_products() -> Tuple[Product, ...]:
+    return load_product_catalog().products
 
 # ---------------------------------------------------------
 # 成分チェック（ルールベース）
 # ---------------------------------------------------------
-INGREDIENT_PATTERNS = {
-    "retinoid": [
-        r"\bretinol\b", r"\bretinal\b", r"\bretinaldehyde\b", r"\bretinyl\b",
-        r"\badapalene\b", r"\btretinoin\b"
-    ],
-    "bha": [r"\bsalicylic acid\b", r"\bbeta hydroxy acid\b"],
-    "aha": [r"\bglycolic acid\b", r"\blactic acid\b", r"\bmandelic acid\b", r"\baha\b"],
-    "vitamin_c": [
-        r"\bascorbic acid\b", r"\bsodium ascorbyl phosphate\b",
-        r"\bmagnesium ascorbyl phosphate\b", r"\b3-o-ethyl ascorbic acid\b",
-        r"\bascorbyl glucoside\b"
-    ],
-    "niacinamide": [r"\bniacinamide\b"],
-    "benzoyl_peroxide": [r"\bbenzoyl peroxide\b"],
-    "fragrance": [r"\bfragrance\b", r"\bparfum\b", r"\bperfume\b"],
-    "essential_oil_allergens": [r"\blimonene\b", r"\blinalool\b", r"\bgeraniol\b", r"\bcitral\b", r"\bcitronellol\b", r"\beugenol\b"],
-    "drying_alcohol": [r"\balcohol denat\b", r"\bethanol\b", r"\bisopropyl alcohol\b"],
-    "physical_exfoliant": [r"\bwalnut shell\b", r"\bapricot kernel powder\b", r"\bscrub\b"],
+# 成分辞書（ingredient_dict.py）の分類 → このチェックのカテゴリ
+INGREDIENT_TAGS = {
+    "retinoid": "retinoid",
+    "bha": "bha",
+    "aha": "aha",
+    "vitamin_c": "vitamin_c",
+    "niacinamide": "niacinamide",
+    "benzoyl_peroxide": "benzoyl_peroxide",
+    "fragrance": "fragrance",
+    "fragrance_allergen": "essential_oil_allergens",
+    "essential_oil": "essential_oil_allergens",
+    "drying_alcohol": "drying_alcohol",
+    "physical_exfoliant": "physical_exfoliant",
 }
 
 CATEGORY_LABELS = {
@@ -265,25 +339,41 @@ CATEGORY_LABELS = {
     "physical_exfoliant": "物理スクラブ候補",
 }
 
+SEVERITY_LABELS = {"high": "高", "medium": "中", "low": "低"}
+
 def _normalize_ingredients(text: str) -> str:
     t = (text or "").lower()
     t = t.replace("、", ",").replace("，", ",").replace(";", ",")
     return t
 
-def analyze_ingredients_rule_based(ingredients_text: str, user_allergies: Optional[List[str]] = None) -> Dict[str, Any]:
+@timed()
+def analyze_ingredients_rule_based(
+    ingredients_text: str,
+    user_allergies: Optional[List[str]] = None,
+    max_distance: int = MAX_DISTANCE,
+) -> Dict[str, Any]:
+    """max_distance: 辞書に無い成分名を誤記とみなして寄せる最大編集距離（0 で近似一致しない）。"""
     t = _normalize_ingredients(ingredients_text)
+    d = load_dictionary()
     detected: Dict[str, List[str]] = {}
-
-    for tag, patterns in INGREDIENT_PATTERNS.items():
-        hits = []
-        for p in patterns:
-            if re.search(p, t):
-                hits.append(p)
-        if hits:
-            detected[tag] = hits
+    found: List[str] = []
+    fuzzy = []
+
+    for token in split_ingredients(ingredients_text):
+        ids, guess = d.resolve(token, max_distance)
+        if guess is not None:
+            fuzzy.append(guess)
+        for cid in ids:
+            found.append(cid)
+            for cls in d.classes_of(cid):
+                tag = INGREDIENT_TAGS.get(cls)
+                if tag:
+                    detected.setdefault(tag, []).append(cid)
+    found = list(dict.fromkeys(found))
 
     allergies = [str(a).strip().lower() for a in (user_allergies or []) if str(a).strip()]
-    allergy_hits = [a for a in allergies if a in t]
+    # 「limonene」と登録していても「リモネン」表記で当たるよう、辞書で同じ成分かも見る
+    allergy_hits = [a for a in allergies if a in t or any(cid in found for cid in d.match_ids(a))]
 
     cautions: List[str] = []
     notes: List[str] = []
@@ -297,19 +387,32 @@ def analyze_ingredients_rule_based(ingredients_text: str, user_allergies: Option
         cautions.append("香料/香料アレルゲンの可能性。敏感な方はパッチテスト推奨。")
     if "drying_alcohol" in detected:
         cautions.append("アルコール系の可能性。乾燥肌・敏感肌は使用感を確認。")
-    if "benzoyl_peroxide" in detected and "retinoid" in detected:
-        cautions.append("過酸化ベンゾイルとレチノイドの併用は刺激が出る人も。分けて使う検討を。")
+    conflicts = load_conflict_graph().check_profile(profile_for_ids(d, found))
+    for h in conflicts:
+        cautions.append(f"併用注意（{SEVERITY_LABELS[h.severity]}）: {h.rule.message('ja')}")
     if "physical_exfoliant" in detected:
         cautions.append("物理スクラブの可能性。摩擦に注意。赤みが出るなら中止。")
     if allergy_hits:
         cautions.append("登録アレルギー候補と一致する成分文字列を検出。ラベル再確認を。")
+    for m in fuzzy:
+        notes.append(f"表記ゆれとして推定: {m.text} → {d.display_name(m.id)}（信頼度 {m.confidence:.0%}）")
+    error = rules_error()
+    if error:
+        notes.append(f"併用ルールの最新の編集を読み込めなかったため、前回のルールで判定しています: {error}")
     if not detected:
-        notes.append("代表的キーワードの検出なし（表記ゆれ・別名で検出漏れの可能性あり）。")
+        notes.append("代表的成分の検出なし（辞書にない成分名・表記の可能性あり）。")
 
     notes.append("これはルールベースの簡易チェック。最終判断は製品ラベル・メーカー情報・専門家確認を優先。")
 
     return {
         "detected_categories": sorted(detected.keys()),
+        "detected_ingredients": {tag: list(dict.fromkeys(ids)) for tag, ids in sorted(detected.items())},
+        "ingredients": found,
+        "fuzzy_matches": [
+            {"token": m.text, "id": m.id, "key": m.key, "distance": m.distance, "confidence": m.confidence}
+            for m in fuzzy
+        ],
+        "conflicts": [{"rule": h.rule.id, "severity": h.severity, "classes": list(h.classes)} for h in conflicts],
         "allergy_matches": allergy_hits,
         "cautions": cautions,
         "notes": notes,
@@ -321,6 +424,11 @@ def format_ingredient_result(result: Dict[str, Any]) -> str:
     if cats:
         labels = [CATEGORY_LABELS.get(c, c) for c in cats]
         lines.append("要点: 検出カテゴリ → " + " / ".join(labels))
+        d = load_dictionary()
+        for c in cats:
+            names = [d.display_name(cid) for cid in result.get("detected_ingredients", {}).get(c, [])]
+            if names:
+                lines.append(f"- {CATEGORY_LABELS.get(c, c)}: {'、'.join(names)}")
     else:
         lines.append("要点: 特徴的な成分カテゴリは検出されませんでした（簡易判定）")
 
@@ -338,6 +446,44 @@ def format_ingredient_result(result: Dict[str, Any]) -> str:
 
     return "\n".join(lines)
 
+def parse_routine_products(text: str) -> List[Tuple[str, str]]:
+    """「化粧水: 水, グリセリン | 美容液: レチノール」→ [(商品名, 成分表示)]。名前が無ければ 商品1, 商品2 …"""
+    items = []
+    for i, part in enumerate(p.strip() for p in text.split("|")):
+        if not part:
+            continue
+        name, sep, body = part.partition(":") if ":" in part else part.partition("：")
+        items.append((name.strip(), body.strip()) if sep and body.strip() else (f"商品{i + 1}", part))
+    return items
+
+@timed()
+def check_routine_conflicts(items: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    d = load_dictionary()
+    profiles: List[Tuple[str, IngredientProfile]] = []
+    for name, label in items:
+        ids = [cid for token in split_ingredients(label) for cid in d.resolve(token)[0]]
+        profiles.append((name, profile_for_ids(d, ids)))
+    return [
+        {"rule": h.rule.id, "severity": h.severity, "classes": list(h.classes), "products": list(h.sources), "message": h.rule.message("ja")}
+        for h in load_conflict_graph().check_routine(profiles)
+    ]
+
+def format_routine_conflicts(items: List[Tuple[str, str]]) -> str:
+    if len(items) < 2:
+        return "商品を「|」で区切って2つ以上入れてください（例: 併用チェック 美容液: レチノール | 化粧水: グリコール酸）"
+    conflicts = check_routine_conflicts(items)
+    names = " / ".join(name for name, _ in items)
+    if not conflicts:
+        lines = [f"併用チェック（{names}）: 注意が必要な組み合わせは見つかりませんでした（簡易判定）。"]
+    else:
+        lines = [f"併用チェック（{names}）:"]
+    for c in conflicts:
+        lines.append(f"- 【{SEVERITY_LABELS[c['severity']]}】{c['message']}（{' × '.join(c['products'])}）")
+    error = rules_error()
+    if error:
+        lines.append(f"※ 併用ルールの最新の編集を読み込めなかったため、前回のルールで判定しています: {error}")
+    return "\n".join(lines)
+
 # ---------------------------------------------------------
 # 肌日記（保存 / 一覧 / 傾向）
 # ---------------------------------------------------------
@@ -394,8 +540,9 @@ def parse_journal_text(text: str) -> Dict[str, Any]:
         "date": datetime.now().strftime("%Y-%m-%d"),
     }
 
-def save_skin_journal(entry: Dict[str, Any]) -> Dict[str, Any]:
-    row = {
+@timed()
+def save_skin_journal(entry: Dict[str, Any]) -> JournalEntry:
+    saved = entry_from_cli_row({
         "id": f"journal_{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}",
         "created_at": now_iso(),
         "date": entry.get("date") or datetime.now().strftime("%Y-%m-%d"),
@@ -405,24 +552,25 @@ def save_skin_journal(entry: Dict[str, Any]) -> Dict[str, Any]:
         "sleep_hours": entry.get("sleep_hours"),
         "stress_level_1to5": entry.get("stress_level_1to5"),
         "memo": entry.get("memo"),
-    }
-    append_jsonl(JOURNAL_PATH, row)
-    return row
+    })
+    append_jsonl(JOURNAL_PATH, entry_to_cli_row(saved))
+    return saved
 
-def list_skin_journal(limit: int = 7) -> List[Dict[str, Any]]:
+@timed()
+def list_skin_journal(limit: int = 7) -> List[JournalEntry]:
     n = max(1, min(limit, 30))
-    return list(reversed(read_jsonl(JOURNAL_PATH)))[:n]
+    return [entry_from_cli_row(r) for r in reversed(read_jsonl(JOURNAL_PATH))][:n]
 
-def journal_summary(entries: List[Dict[str, Any]]) -> str:
+def journal_summary(entries: List[JournalEntry]) -> str:
     if not entries:
         return "日記データはまだありません。"
 
-    sleep_vals = [e.get("sleep_hours") for e in entries if isinstance(e.get("sleep_hours"), (int, float))]
-    stress_vals = [e.get("stress_level_1to5") for e in entries if isinstance(e.get("stress_level_1to5"), int)]
+    sleep_vals = [e.sleep_hours for e in entries if e.sleep_hours is not None]
+    stress_vals = [e.stress for e in entries if e.stress is not None]
 
     symptom_count: Dict[str, int] = {}
     for e in entries:
-        for s in (e.get("symptoms") or []):
+        for s in e.symptoms:
             symptom_count[s] = symptom_count.get(s, 0) + 1
 
     top_symptoms = sorted(symptom_count.items(), key=lambda x: x[1], reverse=True)[:3]
@@ -443,23 +591,27 @@ def journal_summary(entries: List[Dict[str, Any]]) -> str:
     lines.append("- 強い赤み・痛み・腫れ・化膿・急な悪化がある場合は皮膚科へ。")
     return "\n".join(lines)
 
-def format_journal_entries(entries: List[Dict[str, Any]]) -> str:
-    if not entries:
-        return "日記はまだありません。"
-
-    lines = []
+def iter_journal_entries(entries: Iterable[JournalEntry]) -> Iterator[str]:
+    """日記の表示行を1行ずつ（全件分の文字列を作らない）。"""
+    empty = True
     for e in entries:
-        lines.append(f" {e.get('condition_summary', '')}")
-        if e.get("symptoms"):
-            lines.append(f"  症状: {', '.join(e['symptoms'])}")
-        if e.get("products_used"):
-            lines.append(f"  使用: {', '.join(e['products_used'])}")
-        if e.get("sleep_hours") is not None:
-            lines.append(f"  睡眠: {e['sleep_hours']}時間")
-        if e.get("stress_level_1to5") is not None:
-            lines.append(f"  ストレス: {e['stress_level_1to5']}/5")
-        lines.append("")
-    return "\n".join(lines).rstrip()
+        if not empty:
+            yield ""
+        empty = False
+        yield f" {e.condition_summary}"
+        if e.symptoms:
+            yield f"  症状: {', '.join(e.symptoms)}"
+        if e.products_used:
+            yield f"  使用: {', '.join(e.products_used)}"
+        if e.sleep_hours is not None:
+            yield f"  睡眠: {e.sleep_hours}時間"
+        if e.stress is not None:
+            yield f"  ストレス: {e.stress}/5"
+    if empty:
+        yield "日記はまだありません。"
+
+def format_journal_entries(entries: List[JournalEntry]) -> str:
+    return "\n".join(iter_journal_entries(entries))
 
 # ---------------------------------------------------------
 # 症状正規化・テンプレ提案
@@ -493,7 +645,7 @@ def get_recent_symptoms_from_journal(limit: int = 7) -> List[str]:
     entries = list_skin_journal(limit=limit)
     count: Dict[str, int] = {"乾燥": 0, "赤み": 0, "ベタつき": 0}
     for e in entries:
-        joined = " ".join(e.get("symptoms") or [])
+        joined = " ".join(e.symptoms)
         for s in normalize_symptoms_from_text(joined):
             count[s] += 1
     return [k for k, v in sorted(count.items(), key=lambda x: x[1], reverse=True) if v > 0]
@@ -604,6 +756,7 @@ def routine_cautions(symptoms: List[str]) -> List[str]:
     cautions.append("強い赤み・痛み・腫れ・化膿・急な悪化があれば皮膚科へ。")
     return cautions
 
+@timed()
 def generate_offline_routine(user_text: str) -> Dict[str, Any]:
     morning_min, night_min = parse_time_budget(user_text)
     symptoms = normalize_symptoms_from_text(user_text)
@@ -671,40 +824,41 @@ def wants_fragrance_free(text: str) -> bool:
 def wants_alcohol_free(text: str) -> bool:
     return ("アルコールなし" in text) or ("アルコールフリー" in text)
 
-def estimate_monthly_cost(item: Dict[str, Any]) -> int:
-    price = float(item.get("price_jpy", 0) or 0)
-    months = float(item.get("months_last", 1) or 1)
+def estimate_monthly_cost(item: Product) -> int:
+    price = float(item.price_jpy or 0)
+    months = float(item.months_last or 1)
     if months <= 0:
         months = 1
     return round(price / months)
 
-def score_product(item: Dict[str, Any], symptoms: List[str], skin_type: Optional[str], fragrance_free: bool, alcohol_free: bool) -> Tuple[int, List[str]]:
+# 肌悩み1つに合うときの加点（併用注意の減点 CONFLICT_PENALTY の単位）
+CONCERN_MATCH = 3
+
+def score_product(item: Product, symptoms: List[str], skin_type: Optional[str], fragrance_free: bool, alcohol_free: bool) -> Tuple[int, List[str]]:
     score = 0
     reasons = []
 
-    if fragrance_free and not item.get("fragrance_free", False):
+    if fragrance_free and not item.fragrance_free:
         return (-999, ["無香料条件に不一致"])
-    if alcohol_free and not item.get("alcohol_free", False):
+    if alcohol_free and not item.alcohol_free:
         return (-999, ["アルコールフリー条件に不一致"])
 
-    if skin_type and skin_type in (item.get("skin_types") or []):
+    if skin_type and SKIN_TYPE_CODES.get(skin_type, skin_type) in item.skin_types:
         score += 2
         reasons.append(f"肌質相性({skin_type})")
 
-    good_for = item.get("good_for") or []
-    avoid_if = item.get("avoid_if") or []
-
     for s in symptoms:
-        if s in good_for:
-            score += 3
+        code = CONCERN_CODES.get(s, s)
+        if code in item.concerns:
+            score += CONCERN_MATCH
             reasons.append(f"{s}向け")
-        if s in avoid_if:
+        if code in item.avoid_if:
             score -= 4
             reasons.append(f"{s}時は注意")
 
     # 低刺激/シンプルなどのタグ加点（赤み優先）
-    tags = item.get("tags") or []
-    notes = item.get("notes", "")
+    tags = item.tags
+    notes = item.display_desc("ja")
     if "赤み" in symptoms and ("低刺激" in tags or "シンプル" in tags or "低刺激" in notes):
         score += 2
         reasons.append("赤み時に低刺激寄り")
@@ -717,11 +871,13 @@ def score_product(item: Dict[str, Any], symptoms: List[str], skin_type: Optional
 
     return (score, reasons)
 
+@timed()
 def recommend_products_local(
     user_text: str,
     routine: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
-    products = load_products()
+    catalog = load_product_catalog()
+    products = catalog.products
     skin_type = normalize_skin_type_from_text(user_text)
 
     symptoms = normalize_symptoms_from_text(user_text)
@@ -736,22 +892,64 @@ def recommend_products_local(
     ff = wants_fragrance_free(user_text)
     af = wants_alcohol_free(user_text)
 
-    ranked_by_cat: Dict[str, List[Dict[str, Any]]] = {c: [] for c in CATEGORY_ORDER}
+    # カテゴリごとに 商品 / スコア / 理由 / 月額 を並列配列で保持（行のコピーを作らない）
+    cands_by_cat: Dict[str, List[Product]] = {c: [] for c in CATEGORY_ORDER}
+    scores_by_cat: Dict[str, array] = {c: array("i") for c in CATEGORY_ORDER}
+    costs_by_cat: Dict[str, array] = {c: array("i") for c in CATEGORY_ORDER}
+    reasons_by_cat: Dict[str, List[List[str]]] = {c: [] for c in CATEGORY_ORDER}
     for p in products:
-        cat = p.get("category")
-        if cat not in ranked_by_cat:
+        cat = p.category
+        if cat not in cands_by_cat:
             continue
         score, reasons = score_product(p, symptoms, skin_type, ff, af)
         if score <= -999:
             continue
-        row = dict(p)
-        row["_score"] = score
-        row["_reasons"] = reasons
-        row["_monthly_cost_jpy"] = estimate_monthly_cost(p)
-        ranked_by_cat[cat].append(row)
-
-    for cat in ranked_by_cat:
-        ranked_by_cat[cat].sort(key=lambda x: (x["_score"], -x["_monthly_cost_jpy"]), reverse=True)
+        cands_by_cat[cat].append(p)
+        scores_by_cat[cat].append(score)
+        costs_by_cat[cat].append(estimate_monthly_cost(p))
+        reasons_by_cat[cat].append(reasons)
+
+    # 選んだ商品の成分の分類ビット（カタログ読み込み時に解析済み）を OR で積み上げ、
+    # 候補を足したときに新しくできる衝突だけをビット演算で判定する
+    profiles = catalog.profiles
+    graph = load_conflict_graph()
+    mask = multi = 0
+    skipped: List[Tuple[Product, ConflictHit]] = []
+
+    def best_in(cat: str) -> Optional[ScoredProduct]:
+        nonlocal mask, multi
+        cands = cands_by_cat.get(cat)
+        if not cands:
+            return None
+        scores = scores_by_cat[cat]
+        costs = costs_by_cat[cat]
+        best = None
+        rejected = None
+        for j, p in enumerate(cands):
+            score = scores[j]
+            hits: List[ConflictHit] = []
+            prof = profiles.get(p.id)
+            if prof is not None:
+                hits = graph.added(mask, multi, prof)
+            # (スコア高い, 月額安い) の順。同点は先に登録された商品を優先
+            key = (score, -costs[j], -j)
+            if hits and hits[0].severity == "high":
+                if rejected is None or key > rejected[0]:
+                    rejected = (key, p, hits[0])
+                continue
+            key = (score - conflict_penalty(hits, CONCERN_MATCH), -costs[j], -j)
+            if best is None or key > best[0]:
+                best = (key, j, hits)
+        if rejected is not None and (best is None or rejected[0] > best[0]):
+            skipped.append(rejected[1:])
+        if best is None:
+            return None
+        key, i, hits = best
+        reasons = reasons_by_cat[cat][i] + [f"併用注意（{SEVERITY_LABELS[h.severity]}）で減点" for h in hits]
+        prof = profiles.get(cands[i].id)
+        if prof is not None:
+            mask, multi = add_profile(mask, multi, prof)
+        return ScoredProduct(cands[i], key[0], tuple(reasons), costs[i])
 
     # 基本セット候補（1カテゴリ1件）
     selected = []
@@ -769,11 +967,11 @@ def recommend_products_local(
         if cat in seen_cat:
             continue
         seen_cat.add(cat)
-        cands = ranked_by_cat.get(cat, [])
-        if cands:
-            selected.append(cands[0])
+        best = best_in(cat)
+        if best is not None:
+            selected.append(best)
 
-    total_monthly = sum(x["_monthly_cost_jpy"] for x in selected)
+    total_monthly = sum(x.monthly_cost_jpy for x in selected)
 
     # 予算がある場合、削減調整（優先度低いものから外す）
     removed = []
@@ -784,11 +982,15 @@ def recommend_products_local(
             if total_monthly <= budget:
                 break
             for i, item in enumerate(selected):
-                if item["category"] == cat:
+                if item.product.category == cat:
                     removed.append(selected.pop(i))
-                    total_monthly = sum(x["_monthly_cost_jpy"] for x in selected)
+                    total_monthly = sum(x.monthly_cost_jpy for x in selected)
                     break
 
+    conflicts = graph.check_routine([
+        (x.product.display_name("ja"), profiles[x.product.id]) for x in selected if x.product.id in profiles
+    ])
+
     return {
         "symptoms": symptoms,
         "skin_type": skin_type,
@@ -797,6 +999,8 @@ def recommend_products_local(
         "alcohol_free": af,
         "selected": selected,
         "removed_for_budget": removed,
+        "skipped_for_conflict": skipped,
+        "conflicts": conflicts,
         "total_estimated_monthly_jpy": total_monthly,
         "catalog_count": len(products),
     }
@@ -816,20 +1020,33 @@ def format_product_recommendation(rec: Dict[str, Any]) -> str:
 
     lines.append("【おすすめ候補】")
     for item in rec["selected"]:
-        reasons = " / ".join(item.get("_reasons") or []) or "条件一致"
+        p = item.product
+        reasons = " / ".join(item.reasons) or "条件一致"
         lines.append(
-            f"- {item['category']}: {item['name']} "
-            f"(税込目安 {item['price_jpy']}円 / 月額換算 約{item['_monthly_cost_jpy']}円)"
+            f"- {p.category}: {p.display_name('ja')} "
+            f"(税込目安 {p.price_jpy}円 / 月額換算 約{item.monthly_cost_jpy}円)"
         )
         lines.append(f"  理由: {reasons}")
-        if item.get("notes"):
-            lines.append(f"  メモ: {item['notes']}")
+        if p.display_desc("ja"):
+            lines.append(f"  メモ: {p.display_desc('ja')}")
 
     if rec["removed_for_budget"]:
         lines.append("")
         lines.append("【予算調整で外した候補】")
         for item in rec["removed_for_budget"]:
-            lines.append(f"- {item['category']}: {item['name']}（月額換算 約{item['_monthly_cost_jpy']}円）")
+            lines.append(f"- {item.product.category}: {item.product.display_name('ja')}（月額換算 約{item.monthly_cost_jpy}円）")
+
+    if rec.get("skipped_for_conflict"):
+        lines.append("")
+        lines.append("【併用注意で外した候補】")
+        for p, hit in rec["skipped_for_conflict"]:
+            lines.append(f"- {p.category}: {p.display_name('ja')}（{SEVERITY_LABELS[hit.severity]}: {hit.rule.message('ja')}）")
+
+    if rec.get("conflicts"):
+        lines.append("")
+        lines.append("【セット内の併用注意】")
+        for hit in rec["conflicts"]:
+            lines.append(f"- 【{SEVERITY_LABELS[hit.severity]}】{hit.rule.message('ja')}（{' × '.join(hit.sources)}）")
 
     lines.append("")
     lines.append("※ ローカルDBベースの参考提案です。実商品の成分・価格・在庫は店頭/公式情報で確認してください。")
@@ -866,6 +1083,10 @@ def extract_ingredients_text(user_text: str) -> Optional[str]:
             return m.group(1).strip()
     return None
 
+def extract_routine_check_text(user_text: str) -> Optional[str]:
+    m = re.match(r"^併用チェック[:：]?\s*(.*)$", user_text.strip())
+    return m.group(1) if m else None
+
 def is_journal_save_request(user_text: str) -> bool:
     t = user_text
     return ("日記" in t and "保存" in t) or ("肌日記" in t) or ("記録して" in t)
@@ -882,6 +1103,36 @@ def is_journal_list_request(user_text: str) -> bool:
 def is_journal_trend_request(user_text: str) -> bool:
     return ("傾向" in user_text and "日記" in user_text) or ("最近の肌日記を見て傾向" in user_text)
 
+def is_journal_search_request(user_text: str) -> bool:
+    return user_text.startswith("日記検索")
+
+@timed()
+def format_journal_search(user_text: str, limit: int = 20) -> str:
+    query = user_text[len("日記検索"):].strip()
+    if not query:
+        return "検索語を入れてください（例: 日記検索 ヒリつき）"
+    hits = search_index_for_jsonl(JOURNAL_PATH).search(query, limit=limit)
+    if not hits:
+        return f"「{query}」を含む日記は見つかりませんでした。"
+    lines = [f"「{query}」を含む日記（新しい順 / 最大{limit}件）:"]
+    for e in hits:
+        lines.append(f"■ {e.date}")
+        lines.append(format_journal_entries([e]))
+    return "\n".join(lines)
+
+def is_usage_impact_request(user_text: str) -> bool:
+    return "アイテム" in user_text and ("分析" in user_text or "影響" in user_text)
+
+def parse_window_days(user_text: str) -> Optional[int]:
+    m = re.search(r"([0-9]+)\s*日", user_text)
+    return max(1, int(m.group(1))) if m else None
+
+@timed()
+def format_usage_impact(user_text: str) -> str:
+    window = parse_window_days(user_text)
+    index = usage_for_jsonl(JOURNAL_PATH, load_catalog(PRODUCTS_PATH))
+    return format_impacts(index.impacts(window_days=window), window)
+
 def is_symptom_template_request(user_text: str) -> bool:
     return ("症状別テンプレ" in user_text) or ("テンプレ提案" in user_text and any(k in user_text for k in ["乾燥", "赤み", "ベタつき", "てかり"]))
 
@@ -908,19 +1159,23 @@ def is_routine_plus_product_request(user_text: str) -> bool:
 def is_product_list_request(user_text: str) -> bool:
     return ("商品一覧" in user_text) or ("ローカル商品一覧" in user_text)
 
-def format_product_list() -> str:
+def iter_product_list() -> Iterator[str]:
     products = load_products()
     if not products:
-        return "ローカル商品DBが空です。"
-    lines = [f"ローカル商品一覧（{len(products)}件）:"]
+        yield "ローカル商品DBが空です。"
+        return
+    yield f"ローカル商品一覧（{len(products)}件）:"
     for p in products:
         monthly = estimate_monthly_cost(p)
-        lines.append(
-            f"- {p['id']} | {p['category']} | {p['name']} | 価格 {p['price_jpy']}円 | 月額換算 約{monthly}円 | 無香料={'○' if p.get('fragrance_free') else '×'}"
-        )
-    lines.append("")
-    lines.append(f"編集ファイル: {PRODUCTS_PATH}")
-    return "\n".join(lines)
+        yield f"- {p.id} | {p.category} | {p.display_name('ja')} | 価格 {p.price_jpy}円 | 月額換算 約{monthly}円 | 無香料={'○' if p.fragrance_free else '×'}"
+    yield ""
+    yield f"編集ファイル: {PRODUCTS_PATH}（保存すると自動で読み込み直します）"
+    error = reload_error(PRODUCTS_PATH)
+    if error:
+        yield f"※ 最新の編集は読み込めなかったため、前回の内容を表示しています: {error}"
+
+def format_product_list() -> str:
+    return "\n".join(iter_product_list())
 
 # ---------------------------------------------------------
 # CLI
@@ -930,6 +1185,9 @@ HELP_TEXT = f"""
 ■ 成分チェック
 - 成分チェックして Water, Glycerin, Niacinamide, Fragrance, Limonene
 
+■ 併用チェック（ルーティンの商品どうしの組み合わせ。商品は「|」で区切る）
+- 併用チェック 美容液: Retinol, Squalane | 化粧水: Water, Glycolic Acid | 日焼け止め: Zinc Oxide
+
 ■ 肌日記保存（自然文OK）
 - 今日は少し赤みと乾燥あり 睡眠5時間 ストレス4 化粧水と美容液を使った 肌日記として保存して
 
@@ -938,6 +1196,14 @@ HELP_TEXT = f"""
 - 日記一覧 5
 - 最近の肌日記を見て傾向を教えて
 
+■ 日記検索（メモ・症状・使用アイテムから全文検索）
+- 日記検索 ヒリつき
+- 日記検索 サウナ 赤み
+
+■ 使用アイテムと症状の関係（使った日 / 使わなかった日の症状出現率）
+- アイテム分析
+- アイテムの影響 直近30日
+
 ■ 症状別テンプレ提案
 - 症状別テンプレ 乾燥
 - 症状別テンプレ 赤み ベタつき
@@ -959,98 +1225,458 @@ HELP_TEXT = f"""
 - 商品一覧
   （編集ファイル: {PRODUCTS_PATH}）
 
+■ 処理時間の確認（関数ごとの呼び出し回数・p50/p90/p99。BEAUTY_AGENT_METRICS=0 で計測なし）
+- stats
+- stats reset
+
+■ 遅いリクエストのプロファイル（BEAUTY_AGENT_PROFILE_SLOW_MS=500 などで閾値を設定。保存先: {PROFILES_DIR}）
+- プロファイル集計
+
 ■ 終了
 - exit / quit
 """.strip()
 
-def main():
-    ensure_local_products()
-    print("美容AIエージェント（ローカル完全版）起動")
-    print("※ API不要（成分チェック / 日記 / 症状テンプレ / ルーティン / 商品おすすめ）")
-    print("終了: exit / quit")
-    print("help で使い方")
-    print()
+class Reply:
+    """1リクエスト分の返答。lines() は表示用の行、rows() は --json / --ndjson 用の dict（どちらも呼んだときに作る）。"""
+    __slots__ = ("intent", "_lines", "_rows")
+
+    def __init__(self, intent: str, lines: Callable[[], Iterable[str]], rows: Callable[[], Iterable[Dict[str, Any]]]) -> None:
+        self.intent = intent
+        self._lines = lines
+        self._rows = rows
+
+    def lines(self) -> Iterable[str]:
+        return self._lines()
+
+    def rows(self) -> Iterable[Dict[str, Any]]:
+        return self._rows()
+
+    def text(self) -> str:
+        return "\n".join(self.lines())
+
+def _text_reply(intent: str, text: Callable[[], str], rows: Optional[Callable[[], Iterable[Dict[str, Any]]]] = None) -> Reply:
+    """表示がテキスト1つの返答。rows が無ければ {"message": テキスト} の1行。"""
+    return Reply(intent, lambda: text().splitlines(), rows or (lambda: [{"message": text()}]))
+
+def respond(user_text: str) -> Reply:
+    """入力1件を意図ごとに振り分ける。保存などの副作用はここで実行し、表示 / 行の生成は遅延させる。"""
+    if user_text.lower() in {"help", "?", "使い方"}:
+        return _text_reply("help", lambda: HELP_TEXT, lambda: [{"message": HELP_TEXT.strip()}])
+
+    # 処理時間の計測（関数ごとの呼び出し回数・パーセンタイル）
+    if user_text.lower() in {"stats", "stats reset"}:
+        if user_text.lower() == "stats reset":
+            reset_metrics()
+            return _text_reply("stats", lambda: "計測をリセットしました。", lambda: [{"reset": True}])
+        return _text_reply(
+            "stats",
+            lambda: "処理時間（起動または stats reset 以降 / ms）\n" + format_snapshot(),
+            lambda: ({"name": name, **summary} for name, summary in metrics_snapshot().items()),
+        )
 
-    while True:
-        try:
-            user_text = input("あなた > ").strip()
-        except (KeyboardInterrupt, EOFError):
-            print("\n終了します。")
-            break
+    # 遅いリクエストのプロファイル集計
+    if user_text in {"プロファイル集計", "profiles"}:
+        return _text_reply(
+            "profiles",
+            lambda: format_profile_summary(summarize_profiles(PROFILES_DIR)),
+            lambda: [summarize_profiles(PROFILES_DIR)],
+        )
 
-        if not user_text:
-            continue
+    # 0) 併用チェック（成分チェックより先に判定する）
+    routine_text = extract_routine_check_text(user_text)
+    if routine_text is not None:
+        items = parse_routine_products(routine_text)
+        return _text_reply(
+            "routine_check",
+            lambda: format_routine_conflicts(items),
+            (lambda: check_routine_conflicts(items)) if len(items) >= 2 else None,
+        )
 
-        if user_text.lower() in {"exit", "quit"}:
-            print("終了します。")
-            break
+    # 1) 成分チェック
+    ingredients = extract_ingredients_text(user_text)
+    if ingredients:
+        def analyze() -> Dict[str, Any]:
+            return analyze_ingredients_rule_based(ingredients, try_load_allergies_from_profile())
+        return _text_reply("ingredient_check", lambda: format_ingredient_result(analyze()), lambda: [analyze()])
+
+    # 2-0) 日記検索
+    if is_journal_search_request(user_text):
+        query = user_text[len("日記検索"):].strip()
+        return _text_reply(
+            "journal_search",
+            lambda: format_journal_search(user_text),
+            (lambda: (entry_to_cli_row(e) for e in search_index_for_jsonl(JOURNAL_PATH).search(query, limit=20))) if query else None,
+        )
 
-        if user_text.lower() in {"help", "?", "使い方"}:
-            print_ai(HELP_TEXT)
-            continue
+    # 2) 日記傾向
+    if is_journal_trend_request(user_text):
+        def trend() -> Tuple[str, Any]:
+            summary = journal_summary(list_skin_journal(limit=7))
+            with timer("analytics_for_jsonl"):
+                analytics = analytics_for_jsonl(JOURNAL_PATH)   # 全期間（journal.jsonl の追記分だけ読み足す）
+            return summary, analytics
+
+        def trend_text() -> str:
+            summary, analytics = trend()
+            return summary + ("\n" + format_analytics(analytics) if analytics.days else "")
+
+        def trend_rows() -> List[Dict[str, Any]]:
+            summary, analytics = trend()
+            return [{"summary": summary, "analytics": analytics}]
+        return _text_reply("journal_trend", trend_text, trend_rows)
+
+    # 2-2) 使用アイテムと症状の関係
+    if is_usage_impact_request(user_text):
+        return _text_reply(
+            "usage_impact",
+            lambda: format_usage_impact(user_text),
+            lambda: usage_for_jsonl(JOURNAL_PATH, load_catalog(PRODUCTS_PATH)).impacts(window_days=parse_window_days(user_text)),
+        )
 
-        # 1) 成分チェック
-        ingredients = extract_ingredients_text(user_text)
-        if ingredients:
-            allergies = try_load_allergies_from_profile()
-            result = analyze_ingredients_rule_based(ingredients, allergies)
-            print_ai(format_ingredient_result(result))
-            continue
+    # 3) 日記一覧
+    if is_journal_list_request(user_text):
+        limit = parse_journal_list_limit(user_text)
+        return Reply(
+            "journal_list",
+            lambda: iter_journal_entries(list_skin_journal(limit=limit)),
+            lambda: (entry_to_cli_row(e) for e in list_skin_journal(limit=limit)),
+        )
 
-        # 2) 日記傾向
-        if is_journal_trend_request(user_text):
-            print_ai(journal_summary(list_skin_journal(limit=7)))
-            continue
+    # 4) 日記保存
+    if is_journal_save_request(user_text):
+        saved = save_skin_journal(parse_journal_text(user_text))
+        msg = (
+            "日記を保存しました\n"
+            f"- 日付: {saved.date}\n"
+            f"- 要約: {saved.condition_summary}\n"
+            f"- 症状: {', '.join(saved.symptoms) or 'なし'}\n"
+            f"- 使用: {', '.join(saved.products_used) or 'なし'}\n"
+            f"- 睡眠: {saved.sleep_hours if saved.sleep_hours is not None else '未記録'}\n"
+            f"- ストレス: {saved.stress if saved.stress is not None else '未記録'}"
+        )
+        return _text_reply("journal_save", lambda: msg, lambda: [entry_to_cli_row(saved)])
+
+    # 5) 症状別テンプレ
+    if is_symptom_template_request(user_text):
+        symptoms = extract_template_symptoms(user_text)
+        return _text_reply(
+            "symptom_template",
+            lambda: format_symptom_templates(symptoms),
+            (lambda: ({"symptom": s, "template": symptom_template(s)} for s in symptoms)) if symptoms else None,
+        )
 
-        # 3) 日記一覧
-        if is_journal_list_request(user_text):
-            print_ai(format_journal_entries(list_skin_journal(limit=parse_journal_list_limit(user_text))))
-            continue
+    # 6) ルーティン + 商品セット
+    if is_routine_plus_product_request(user_text):
+        def routine_plus() -> Dict[str, Any]:
+            routine = generate_offline_routine(user_text)
+            return {"routine": routine, "recommendation": recommend_products_local(user_text, routine=routine)}
+        return _text_reply("routine_plus_products", lambda: format_routine_plus_products(user_text), lambda: [routine_plus()])
+
+    # 7) ローカル商品おすすめ
+    if is_product_recommend_request(user_text):
+        return _text_reply(
+            "product_recommend",
+            lambda: format_product_recommendation(recommend_products_local(user_text)),
+            lambda: [recommend_products_local(user_text)],
+        )
 
-        # 4) 日記保存
-        if is_journal_save_request(user_text):
-            saved = save_skin_journal(parse_journal_text(user_text))
-            msg = (
-                "日記を保存しました\n"
-                f"- 日付: {saved.get('date')}\n"
-                f"- 要約: {saved.get('condition_summary')}\n"
-                f"- 症状: {', '.join(saved.get('symptoms') or []) or 'なし'}\n"
-                f"- 使用: {', '.join(saved.get('products_used') or []) or 'なし'}\n"
-                f"- 睡眠: {saved.get('sleep_hours') if saved.get('sleep_hours') is not None else '未記録'}\n"
-                f"- ストレス: {saved.get('stress_level_1to5') if saved.get('stress_level_1to5') is not None else '未記録'}"
-            )
-            print_ai(msg)
-            continue
+    # 8) 商品一覧
+    if is_product_list_request(user_text):
+        return Reply("product_list", iter_product_list, lambda: (product_to_cli_row(p) for p in load_products()))
 
-        # 5) 症状別テンプレ
-        if is_symptom_template_request(user_text):
-            print_ai(format_symptom_templates(extract_template_symptoms(user_text)))
-            continue
+    # 9) ルーティン作成
+    if is_routine_request(user_text):
+        return _text_reply(
+            "routine",
+            lambda: format_routine(generate_offline_routine(user_text)),
+            lambda: [generate_offline_routine(user_text)],
+        )
 
-        # 6) ルーティン + 商品セット
-        if is_routine_plus_product_request(user_text):
-            print_ai(format_routine_plus_products(user_text))
-            continue
+    # 10) その他
+    return _text_reply("unknown", lambda: (
+        "使える機能 → 成分チェック / 肌日記保存 / 日記一覧 / 傾向 / 症状別テンプレ / 朝夜ルーティン / 商品おすすめ\n"
+        "例: 商品おすすめ 乾燥 無香料 予算5000円\n"
+        "例: ルーティンと商品おすすめ 赤み 朝2分 夜8分 無香料 予算6000円"
+    ))
 
-        # 7) ローカル商品おすすめ
-        if is_product_recommend_request(user_text):
-            print_ai(format_product_recommendation(recommend_products_local(user_text)))
-            continue
+def handle_request(user_text: str) -> Tuple[str, str]:
+    """入力1件を意図ごとに振り分けて (意図, 返答テキスト) を返す。"""
+    reply = respond(user_text)
+    return reply.intent, reply.text()
 
-        # 8) 商品一覧
-        if is_product_list_request(user_text):
-            print_ai(format_product_list())
+# ---------------------------------------------------------
+# 出力（text: 従来の表示 / ndjson: 1行1 JSON / json: 1リクエスト1ドキュメント）
+# 行はジェネレータから1件ずつ書き出すので、大きな一覧でも全体を文字列にしない
+# ---------------------------------------------------------
+OUTPUT_FORMATS = ("text", "json", "ndjson")
+
+def _json_default(obj: Any) -> Any:
+    # Product は 商品一覧 と同じ形（日本語の表示名・ラベル）、ScoredProduct / DiaryAnalytics などの dataclass はフィールドの dict に
+    if isinstance(obj, Product):
+        return product_to_cli_row(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=_json_default)
+
+def write_reply(reply: Reply, fmt: str, out: TextIO, meta: Optional[Dict[str, Any]] = None, flush: bool = True) -> None:
+    """meta（run の行番号・入力など）は JSON の各行 / ドキュメントの先頭に付ける。"""
+    head = {"intent": reply.intent, **(meta or {})}
+    if fmt == "ndjson":
+        for row in reply.rows():
+            if not isinstance(row, dict):
+                row = _json_default(row)   # ItemImpact / ScoredProduct などの dataclass、Product
+            out.write(_dumps({**head, **row}))
+            out.write("\n")
+    elif fmt == "json":
+        out.write(_dumps(head)[:-1] + ', "rows": [')
+        for i, row in enumerate(reply.rows()):
+            if i:
+                out.write(", ")
+            out.write(_dumps(row))
+        out.write("]}\n")
+    else:
+        for line in reply.lines():
+            out.write("美容AI > " + line + "\n")
+    if flush:
+        out.flush()
+
+# ---------------------------------------------------------
+# バッチ実行（beauty_agent.py run --file commands.txt / 標準入力から）
+# - 1行1コマンド。空行と # で始まる行は読み飛ばし、exit / quit で終わり
+# - 結果は入力の順に書き出す（JSON には line / input を付ける）。1件が失敗しても止めず intent "error" の結果にする
+# - --workers N でスレッド / プロセスに分ける。プロセスは WorkerPool（成分辞書を warm 済み、
+#   商品カタログは shared_catalog で共有）。投入は上限付きなので、何万行でもメモリは一定
+# - 日記の保存と stats / プロファイル集計（プロセスごとの状態）は親で順に実行する。
+#   それより前の結果を書き終えてから実行し、後ろのコマンドは保存後の日記を読む（逐次実行と同じ結果）
+# - スレッドどうしは journal.jsonl のキャッシュ（検索 / 分析 / 使用アイテム）を共有する。取り込みは
+#   journal_analytics.path_lock でファイルごとに1つずつ（benchmarks/bench_batch.py --check で逐次と突き合わせる）
+# ---------------------------------------------------------
+POOL_KINDS = ("process", "thread")
+
+def iter_batch_commands(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    for lineno, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text or text.startswith("#"):
             continue
+        if text.lower() in {"exit", "quit"}:
+            return
+        yield lineno, text
+
+def _error_reply(e: BaseException) -> Reply:
+    return _text_reply("error", lambda: f"エラー: {type(e).__name__}: {e}", lambda: [{"error": type(e).__name__, "message": str(e)}])
+
+def _render(reply: Reply, command: Tuple[int, str], fmt: str) -> str:
+    lineno, text = command
+    out = io.StringIO()
+    if fmt == "text":
+        out.write(f"あなた > {text}\n")
+    write_reply(reply, fmt, out, {"line": lineno, "input": text}, flush=False)
+    return out.getvalue()
+
+def render_command(command: Tuple[int, str], fmt: str) -> Tuple[str, str]:
+    """1コマンドを実行して (意図, 書き出す文字列) を返す（ワーカーでも親でも同じ形）。"""
+    with SLOW_REQUESTS.request("cli") as req:
+        try:
+            reply = respond(command[1])
+            req.name = reply.intent
+            return reply.intent, _render(reply, command, fmt)
+        except Exception as e:   # 書き出しの途中で失敗しても、その分は捨ててエラーの結果だけにする
+            return "error", _render(_error_reply(e), command, fmt)
+
+def _runs_in_parent(text: str) -> bool:
+    # 保存の判定は respond より広め（一覧・検索などが混ざっても逐次になるだけ）
+    return text.lower() in {"stats", "stats reset", "プロファイル集計", "profiles"} or is_journal_save_request(text)
+
+def _batch_warm(user_id: str) -> None:
+    """プロセスワーカーの初期化: 成分辞書・併用ルールの読み込み、共有カタログへの接続、ユーザーの切り替え。"""
+    from shared_catalog import attach_worker
+
+    attach_worker(PRODUCTS_PATH)
+    use_user(user_id)
+
+def _ordered(submit: Callable[..., "Future[Any]"], fn: Callable[[Any], Any], items: Iterable[Any], window: int) -> Iterator[Tuple[Any, "Future[Any]"]]:
+    pending: Deque[Tuple[Any, "Future[Any]"]] = deque()
+    for item in items:
+        pending.append((item, submit(fn, item)))
+        if len(pending) >= window:
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
+
+def run_batch(lines: Iterable[str], fmt: str, out: TextIO, workers: int = 1, pool: str = "process", user_id: str = "") -> Tuple[int, int]:
+    """lines のコマンドを順に実行して out に書き出す。戻り値は (件数, エラー件数)。"""
+    render = functools.partial(render_command, fmt=fmt)
+    done = errors = 0
+
+    def emit(intent: str, chunk: str) -> None:
+        nonlocal done, errors
+        out.write(chunk)
+        done += 1
+        errors += intent == "error"
+        incr("requests", intent=intent)
+
+    commands = iter_batch_commands(lines)
+    if workers <= 1:
+        for command in commands:
+            emit(*render(command))
+        out.flush()
+        return done, errors
+
+    if pool == "thread":
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor: Any = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+        submit = executor.submit
+        close = executor.shutdown
+    else:
+        from shared_catalog import publish_catalog
+        from worker_pool import WorkerPool
+
+        manager = watch_catalog(PRODUCTS_PATH)
+        publish_catalog(PRODUCTS_PATH, manager.get() or load_catalog(PRODUCTS_PATH))
+        manager.on_swap(functools.partial(publish_catalog, PRODUCTS_PATH))
+        executor = WorkerPool(workers=workers, queue_size=workers * 4, warm=functools.partial(_batch_warm, user_id))
+        submit = executor.submit
+        close = executor.close
+
+    barrier: Optional[Tuple[int, str]] = None
+
+    def until_barrier() -> Iterator[Tuple[int, str]]:
+        nonlocal barrier
+        for command in commands:
+            if _runs_in_parent(command[1]):
+                barrier = command
+                return
+            yield command
+
+    try:
+        while True:
+            for command, future in _ordered(submit, render, until_barrier(), workers * 8):
+                try:
+                    emit(*future.result())
+                except Exception as e:   # タイムアウト / ワーカーの異常終了 / pickle できない結果
+                    emit("error", _render(_error_reply(e), command, fmt))
+            if barrier is None:
+                break
+            emit(*render(barrier))
+            barrier = None
+    finally:
+        close()
+    out.flush()
+    return done, errors
+
+def start_metrics_exporter(port: int) -> None:
+    # http.server は公開するときだけ読み込む
+    from metrics_exporter import start_exporter
+
+    register_gauge("journal_entries", "Rows in journal.jsonl.", lambda: count_jsonl_rows(JOURNAL_PATH))
+    register_gauge("journal_bytes", "Size of journal.jsonl in bytes.", lambda: JOURNAL_PATH.stat().st_size if JOURNAL_PATH.exists() else 0)
+    register_gauge("catalog_products", "Products in the local catalog.", lambda: len(load_catalog(PRODUCTS_PATH)))
+    start_exporter(port)
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="美容AIエージェント（ローカル完全版）")
+    ap.add_argument("--metrics-port", type=int, default=None,
+                    help="Prometheus 形式のメトリクスを http://127.0.0.1:PORT/metrics で公開する（環境変数 BEAUTY_AGENT_METRICS_PORT でも可）")
+    ap.add_argument("--profile-slow-ms", type=float, default=None,
+                    help="この時間を超えたリクエストを数え、--profile-sample 件に1件の割合でプロファイルを保存する")
+    ap.add_argument("--profile-sample", type=int, default=None)
+    ap.add_argument("--user", default=os.environ.get("BEAUTY_AGENT_USER", ""),
+                    help="ユーザーID（日記とプロフィールを beauty_agent_data/users/<id>/ に分ける。環境変数 BEAUTY_AGENT_USER でも可）")
+    out_fmt = ap.add_mutually_exclusive_group()
+    out_fmt.add_argument("--json", dest="format", action="store_const", const="json",
+                         help="1リクエストごとに {\"intent\": ..., \"rows\": [...]} を1行で出力する")
+    out_fmt.add_argument("--ndjson", dest="format", action="store_const", const="ndjson",
+                         help="結果を1件1行の JSON で出力する（jq 向け。各行に intent を含む）")
+    ap.set_defaults(format="text")
+    ap.add_argument("command", nargs="?", choices=["run"],
+                    help="run: --file（省略時は標準入力）のコマンドを1行ずつまとめて実行する")
+    ap.add_argument("--file", default=None, help="run で読むコマンドファイル（1行1コマンド。- は標準入力）")
+    ap.add_argument("--workers", type=int, default=1, help="run を並列に実行する数（既定 1 = 順に実行）")
+    ap.add_argument("--pool", choices=POOL_KINDS, default="process", help="--workers の並列化の方式（既定 process）")
+    args = ap.parse_args(argv)
+    if args.command != "run" and (args.file is not None or args.workers != 1):
+        ap.error("--file / --workers は run と一緒に指定します（例: beauty_agent.py run --file commands.txt）")
+    try:
+        use_user(args.user.strip())
+    except ValueError:
+        ap.error("--user は英数字と _ . - のみ（先頭は英数字、64文字まで）")
+    if args.profile_slow_ms is not None:
+        SLOW_REQUESTS.threshold_ms = args.profile_slow_ms
+    if args.profile_sample is not None:
+        SLOW_REQUESTS.sample = max(1, args.profile_sample)
+    port = args.metrics_port
+    if port is None and os.environ.get("BEAUTY_AGENT_METRICS_PORT"):
+        from metrics_exporter import port_from_env
+
+        port = port_from_env()
+
+    # JSON 出力のときは stdout を結果だけにする（案内は stderr、プロンプトは出さない）
+    text_mode = args.format == "text" and args.command != "run"
+    info = sys.stdout if text_mode else sys.stderr
+    prompt = "あなた > " if text_mode else ""
 
-        # 9) ルーティン作成
-        if is_routine_request(user_text):
-            print_ai(format_routine(generate_offline_routine(user_text)))
+    ensure_local_products()
+    watch_catalog(PRODUCTS_PATH)
+    if port:
+        start_metrics_exporter(port)
+        print(f"メトリクス: http://127.0.0.1:{port}/metrics", file=info)
+    if text_mode:
+        print("美容AIエージェント（ローカル完全版）起動")
+        print("※ API不要（成分チェック / 日記 / 症状テンプレ / ルーティン / 商品おすすめ）")
+        print("終了: exit / quit")
+        print("help で使い方")
+        if args.user.strip():
+            print(f"ユーザー: {args.user.strip()}（{JOURNAL_PATH.parent}）")
+        print()
+
+    if args.command == "run":
+        t0 = time.perf_counter()
+        if args.file in (None, "-"):
+            source: TextIO = sys.stdin
+        else:
+            try:
+                source = open(args.file, encoding="utf-8-sig")   # メモ帳で保存した BOM 付きも読む
+            except OSError as e:
+                ap.error(f"--file を開けません: {e}")
+        try:
+            with source:
+                done, errors = run_batch(source, args.format, sys.stdout, args.workers, args.pool, args.user.strip())
+        except BrokenPipeError:
+            # | head などで読み手が先に閉じた: 残りは捨てる（終了時の flush で再び例外にしない）
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return 1
+        print(f"{done}件を実行（エラー {errors}件 / {time.perf_counter() - t0:.2f}秒）", file=sys.stderr)
+        return 1 if errors else 0
+
+    while True:
+        try:
+            user_text = input(prompt).strip()
+        except (KeyboardInterrupt, EOFError):
+            if text_mode:
+                print("\n終了します。")
+            break
+
+        if not user_text:
             continue
 
-        # 10) その他
-        print_ai("使える機能 → 成分チェック / 肌日記保存 / 日記一覧 / 傾向 / 症状別テンプレ / 朝夜ルーティン / 商品おすすめ")
-        print_ai("例: 商品おすすめ 乾燥 無香料 予算5000円")
-        print_ai("例: ルーティンと商品おすすめ 赤み 朝2分 夜8分 無香料 予算6000円")
+        if user_text.lower() in {"exit", "quit"}:
+            if text_mode:
+                print("終了します。")
+            break
+
+        with SLOW_REQUESTS.request("cli") as req:
+            reply = respond(user_text)
+            req.name = reply.intent
+            write_reply(reply, args.format, sys.stdout)
+        incr("requests", intent=reply.intent)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
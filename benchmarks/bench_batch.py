@@ -0,0 +1,110 @@
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.generators import gen_cli_journal  # noqa: E402
+
+# =========================================================
+# バッチ実行（beauty_agent.py run）: 逐次 vs 並列（スレッド / プロセス）
+# - 大きな journal.jsonl に対して、日記を読むコマンド（一覧 / 検索 / 傾向 / アイテム分析）を
+#   --repeat 回ずつ続けて並べた一式と保存1件を繰り返すファイルを実行し、所要時間と「並列の出力が逐次と同じか」を出す
+#   （同じキャッシュを使うコマンドが並列に走るので、journal.jsonl の取り込みが重なると結果がずれる）
+# - 保存は実行時刻から id / created_at を作るので、比較ではこの2つを除く
+# - 実行ごとに beauty_agent_data を作り直す（保存で journal.jsonl が変わるため）
+#   python benchmarks/bench_batch.py --days 20000 --blocks 10 --workers 4 --check
+# =========================================================
+
+_READS = (
+    "日記一覧 20",
+    "日記検索 赤み",
+    "最近の肌日記を見て傾向を教えて",
+    "アイテム分析",
+    "日記検索 サウナ 乾燥",
+    "アイテムの影響 直近30日",
+    "商品おすすめ 乾燥 無香料 予算5000円",
+)
+_SAVE = "今日は少し赤みと乾燥あり 睡眠5時間 ストレス4 化粧水と美容液を使った 肌日記として保存して"
+_VOLATILE = ("id", "created_at")
+
+
+def commands(blocks: int, repeat: int) -> List[str]:
+    lines: List[str] = []
+    for _ in range(blocks):
+        for text in _READS:
+            lines.extend([text] * repeat)   # 同じコマンドを並べて、同じキャッシュへの取り込みを重ねる
+        lines.append(_SAVE)
+    return lines
+
+
+def _normalize(line: str) -> Any:
+    row = json.loads(line)
+    for key in _VOLATILE:
+        row.pop(key, None)
+    return row
+
+
+def run(workdir: Path, journal: List[str], cmd_file: Path, workers: int, pool: str) -> Tuple[float, List[Any]]:
+    data = workdir / "beauty_agent_data"
+    shutil.rmtree(data, ignore_errors=True)
+    data.mkdir(parents=True)
+    shutil.copy(ROOT / "beauty_agent_data" / "products_local.json", data / "products_local.json")
+    (data / "journal.jsonl").write_text("".join(journal), encoding="utf-8")
+    args = [sys.executable, str(ROOT / "beauty_agent.py"), "run", "--file", str(cmd_file), "--ndjson",
+            "--workers", str(workers), "--pool", pool]
+    t0 = time.perf_counter()
+    out = subprocess.run(args, cwd=workdir, check=False, capture_output=True, text=True, encoding="utf-8")
+    elapsed = time.perf_counter() - t0
+    return elapsed, [_normalize(line) for line in out.stdout.splitlines() if line]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=20000, help="journal.jsonl の行数（1日1件）")
+    ap.add_argument("--blocks", type=int, default=10, help="「読むコマンド一式 + 保存1件」の繰り返し数")
+    ap.add_argument("--repeat", type=int, default=3, help="一式の中で読むコマンドを繰り返す回数")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--check", action="store_true", help="並列の出力が逐次と違えば終了コード 1")
+    args = ap.parse_args()
+
+    journal = [json.dumps(row, ensure_ascii=False) + "\n" for row in gen_cli_journal(args.days)]
+    results: Dict[str, Dict[str, Any]] = {}
+    mismatched = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        cmd_file = workdir / "commands.txt"
+        cmd_file.write_text("\n".join(commands(args.blocks, args.repeat)) + "\n", encoding="utf-8")
+        serial_s, serial = run(workdir, journal, cmd_file, 1, "thread")
+        results["serial"] = {"seconds": round(serial_s, 2), "results": len(serial)}
+        for pool in ("thread", "process"):
+            seconds, rows = run(workdir, journal, cmd_file, args.workers, pool)
+            diff = [i for i, (a, b) in enumerate(zip(serial, rows)) if a != b]
+            same = not diff and len(rows) == len(serial)
+            results[pool] = {
+                "seconds": round(seconds, 2),
+                "results": len(rows),
+                "speedup": round(serial_s / seconds, 2) if seconds else None,
+                "same_as_serial": same,
+                "first_diff_line": serial[diff[0]].get("line") if diff else None,
+            }
+            if not same:
+                mismatched.append(pool)
+
+    print(json.dumps({"days": args.days, "commands": len(commands(args.blocks, args.repeat)), "workers": args.workers, "runs": results},
+                     ensure_ascii=False, indent=2))
+    if args.check and mismatched:
+        print(f"並列の出力が逐次と一致しません: {', '.join(mismatched)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.generators import (  # noqa: E402
+    gen_app_diaries,
+    gen_app_products,
+    gen_cli_journal,
+    gen_cli_products,
+    gen_ingredient_labels,
+)
+
+import app_core  # noqa: E402
+import beauty_agent  # noqa: E402
+from journal import entry_from_app_row  # noqa: E402
+
+# =========================================================
+# エンジン関数のベンチマーク一式（CLI / Streamlit 共通のデータ規模で）
+# - 商品カタログ（CLI / app の両スキーマ）・日記（1日1件 × 年数）・成分表示を seed 固定で生成
+# - 1ケースごとに1回空打ちしてから repeat 回測り、中央値 / 最小値（ms）を JSON で出す
+# - --save で結果を保存、--baseline で保存済みの結果と比べて遅くなったケースを表示（あれば終了コード 1）
+#   python benchmarks/bench_engine.py --products 1000,100000 --years 1,50 --save baseline.json
+#   python benchmarks/bench_engine.py --products 1000,100000 --years 1,50 --baseline baseline.json
+# =========================================================
+
+PROFILE = {
+    "skin_type": "combo",
+    "concerns": ["dryness", "pores"],
+    "fragrance_pref": "none",
+    "monthly_budget": 6000,
+    "am_minutes": 3,
+    "pm_minutes": 10,
+}
+CLI_QUERY = "乾燥と赤みが気になる 敏感肌 無香料 予算5000円"
+LABEL_RATIO = 0.01   # 生成カタログのうち成分表示を持つ商品の割合（カタログ読み込み時の成分解析を含める）
+
+
+def _ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    fn()   # 初回のキャッシュ構築（カタログ / 辞書 / 日記の読み込み）は含めない
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": round(statistics.median(runs), 4), "min_ms": round(min(runs), 4), "runs": repeat}
+
+
+def run_suite(args: argparse.Namespace, tmp: Path) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    labels = gen_ingredient_labels(args.labels)
+
+    def each_label(fn: Callable[[str], Any]) -> Callable[[], None]:
+        def run() -> None:
+            for label in labels:
+                fn(label)
+        return run
+
+    # 成分表示（labels 件をまとめて1回）
+    results[f"analyze_ingredients_rule_based[labels={len(labels)}]"] = measure(
+        each_label(beauty_agent.analyze_ingredients_rule_based), args.repeat)
+    results[f"analyze_ingredients[labels={len(labels)}]"] = measure(
+        each_label(lambda label: app_core.analyze_ingredients(label, "ja")), args.repeat)
+    results["generate_routine"] = measure(lambda: app_core.generate_routine(PROFILE, "ja"), args.repeat)
+
+    # 商品カタログ（規模ごとに別ファイル。カタログのストアはパスごとにキャッシュされる）
+    for n in _ints(args.products):
+        cli_path = tmp / f"cli_products_{n}.json"
+        cli_path.write_text(json.dumps(gen_cli_products(n, seed=1, labels=labels, label_ratio=LABEL_RATIO), ensure_ascii=False), encoding="utf-8")
+        beauty_agent.PRODUCTS_PATH = cli_path
+        results[f"recommend_products_local[products={n}]"] = measure(
+            lambda: beauty_agent.recommend_products_local(CLI_QUERY), args.repeat)
+
+        app_path = tmp / f"app_products_{n}.json"
+        app_path.write_text(json.dumps(gen_app_products(n, seed=2, labels=labels, label_ratio=LABEL_RATIO), ensure_ascii=False), encoding="utf-8")
+        app_core.PRODUCTS_FILE = app_path
+        products = app_core.load_products()
+        profiles = app_core.load_product_profiles()
+        results[f"recommend_products[products={n}]"] = measure(
+            lambda: app_core.recommend_products(products, PROFILE, limit=8, profiles=profiles), args.repeat)
+
+    # 日記（1日1件 × 年数）
+    for years in _ints(args.years):
+        days = years * 365
+        journal_path = tmp / f"journal_{years}y.jsonl"
+        with journal_path.open("w", encoding="utf-8") as f:
+            for row in gen_cli_journal(days, seed=3):
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        beauty_agent.JOURNAL_PATH = journal_path
+        results[f"list_skin_journal[years={years}]"] = measure(lambda: beauty_agent.list_skin_journal(7), args.repeat)
+
+        diary_rows = gen_app_diaries(days, seed=4)
+        diaries = [entry_from_app_row(r) for r in diary_rows]
+        results[f"summarize_trends[years={years}]"] = measure(lambda: app_core.summarize_trends(diaries), args.repeat)
+
+        # 保存は毎回ファイル全体を書き直すので、回数を抑えて測る（1回ごとに1件ずつ増える）
+        diary_path = tmp / f"skin_diary_{years}y.json"
+        diary_path.write_text(json.dumps(diary_rows, ensure_ascii=False), encoding="utf-8")
+        app_core.DIARY_FILE = diary_path
+        entry = diaries[-1]
+        results[f"save_diary_entry[years={years}]"] = measure(
+            lambda: app_core.save_diary_entry(entry), max(1, args.repeat // 5))
+    return results
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float, floor_ms: float) -> List[Dict[str, Any]]:
+    """中央値が baseline より threshold（割合）以上、かつ floor_ms 以上遅くなったケース。"""
+    regressions = []
+    for name, now in current.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        before, after = old["median_ms"], now["median_ms"]
+        if after - before >= floor_ms and after > before * (1 + threshold):
+            regressions.append({"case": name, "baseline_ms": before, "current_ms": after, "ratio": round(after / before, 2) if before else None})
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", default="1000,100000", help="カタログの商品数（カンマ区切り。最大 1000000 程度）")
+    ap.add_argument("--years", default="1,50", help="日記の年数（1日1件、カンマ区切り）")
+    ap.add_argument("--labels", type=int, default=200)
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--save", type=Path, help="結果の JSON を保存するパス（次回の --baseline 用）")
+    ap.add_argument("--baseline", type=Path, help="比較する保存済みの結果")
+    ap.add_argument("--threshold", type=float, default=0.2, help="遅くなったとみなす割合（0.2 = 20%%）")
+    ap.add_argument("--floor-ms", type=float, default=0.05, help="これ未満の差は誤差として無視")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_suite(args, Path(tmp))
+
+    report: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {"products": args.products, "years": args.years, "labels": args.labels, "repeat": args.repeat},
+        "results": results,
+    }
+    regressions: Optional[List[Dict[str, Any]]] = None
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline.get("results", {}), args.threshold, args.floor_ms)
+        report["baseline"] = str(args.baseline)
+        report["regressions"] = regressions
+    if args.save is not None:
+        args.save.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    for r in regressions or []:
+        print(f"遅くなった: {r['case']} {r['baseline_ms']}ms -> {r['current_ms']}ms", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import argparse
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.generators import gen_ingredient_labels  # noqa: E402
+from ingredient_dict import FuzzyIndex, _trie_keys, build_dictionary, load_dictionary  # noqa: E402
+
+# =========================================================
+# 成分辞書: import / トライ構築の時間と、成分表示1件あたりの解析時間
+# - import_ms / first_lookup_ms は新しいプロセスで測る（import 時には辞書を読まないことの確認）
+# - 近似一致: 見出しに1〜2文字の誤記を入れた語で、索引の構築時間・1語あたりの時間・正解率を測る
+#   python benchmarks/bench_ingredients.py --labels 2000 --typos 2000
+# =========================================================
+
+_CHILD = """
+import sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import ingredient_dict
+t1 = time.perf_counter()
+ingredient_dict.load_dictionary().scan("niacinamide")
+t2 = time.perf_counter()
+print(round((t1 - t0) * 1000, 2), round((t2 - t1) * 1000, 2))
+"""
+
+def gen_typos(n: int, seed: int = 13):
+    """(誤記, 正解の成分ID)。7文字以上の見出しに削除 / 挿入 / 置換 / 入れ替えを1〜2回。"""
+    rnd = random.Random(seed)
+    d = load_dictionary()
+    vocab = [(key, idx) for key, idx in _trie_keys(d.trie) if len(key) >= 7]
+
+    def edit(w: str) -> str:
+        i = rnd.randrange(len(w) - 1)
+        op = rnd.randrange(4)
+        if op == 0:
+            return w[:i] + w[i + 1:]
+        if op == 1:
+            return w[:i] + rnd.choice("aeiounrst") + w[i:]
+        if op == 2:
+            return w[:i] + rnd.choice("aeiounrst") + w[i + 1:]
+        return w[:i] + w[i + 1] + w[i] + w[i + 2:]
+
+    out = []
+    for _ in range(n):
+        key, idx = rnd.choice(vocab)
+        typo = edit(key)
+        if len(key) >= 12 and rnd.random() < 0.5:
+            typo = edit(typo)
+        out.append((typo, d.ids[idx]))
+    return out
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--labels", type=int, default=2000)
+    ap.add_argument("--typos", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    child = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(root=str(ROOT))],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+
+    builds = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        d = build_dictionary()
+        builds.append((time.perf_counter() - t0) * 1000)
+
+    from app_core import analyze_ingredients
+    from beauty_agent import analyze_ingredients_rule_based
+
+    labels = gen_ingredient_labels(args.labels)
+    tokens = sum(len(label.split("、")) if "、" in label else len(label.split(", ")) for label in labels)
+
+    t0 = time.perf_counter()
+    for label in labels:
+        analyze_ingredients_rule_based(label)
+    cli_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    for label in labels:
+        analyze_ingredients(label, "ja")
+    app_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    FuzzyIndex(_trie_keys(d.trie))
+    fuzzy_build_ms = (time.perf_counter() - t0) * 1000
+
+    typos = gen_typos(args.typos)
+    d.fuzzy_index()
+    correct = found = 0
+    t0 = time.perf_counter()
+    for typo, cid in typos:
+        m = d.fuzzy(typo)
+        if m is not None:
+            found += 1
+            # 同じ分類の別の見出し（retinol / retinal など）に寄った場合も「正解」とは数えない
+            correct += m.id == cid
+    fuzzy_ms = (time.perf_counter() - t0) * 1000
+
+    print(json.dumps({
+        "ingredients": len(d),
+        "keys": d.keys,
+        "import_ms": float(child[0]),
+        "first_lookup_ms": float(child[1]),
+        "build_ms": round(min(builds), 1),
+        "labels": len(labels),
+        "tokens": tokens,
+        "cli_us_per_label": round(cli_ms / len(labels) * 1000, 1),
+        "app_us_per_label": round(app_ms / len(labels) * 1000, 1),
+        "fuzzy_keys": len(d.fuzzy_index()),
+        "fuzzy_deletes": len(d.fuzzy_index().index),
+        "fuzzy_build_ms": round(fuzzy_build_ms, 1),
+        "fuzzy_us_per_word": round(fuzzy_ms / len(typos) * 1000, 1),
+        "fuzzy_found": round(found / len(typos), 3),
+        "fuzzy_correct": round(correct / len(typos), 3),
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import argparse
+import gc
+import json
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.generators import gen_app_diaries, gen_cli_products  # noqa: E402
+from catalog import build_catalog  # noqa: E402
+from journal import entry_from_app_row  # noqa: E402
+
+# =========================================================
+# 1行あたりのメモリ: json.loads した dict 行 vs slotted レコード
+#   python benchmarks/bench_memory.py --rows 100000 --check
+# =========================================================
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    del kept
+    return used
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--check", action="store_true", help="レコード/辞書 の比が 0.5 以上なら終了コード 1")
+    args = ap.parse_args()
+
+    products_text = json.dumps(gen_cli_products(args.rows), ensure_ascii=False)
+    diaries_text = json.dumps(gen_app_diaries(args.rows), ensure_ascii=False)
+
+    results = {}
+    for name, text, to_records in [
+        ("products", products_text, lambda rows: build_catalog(rows).products),
+        ("journal", diaries_text, lambda rows: [entry_from_app_row(r) for r in rows]),
+    ]:
+        dict_bytes = measure(lambda: json.loads(text))
+        record_bytes = measure(lambda: to_records(json.loads(text)))
+        results[name] = {
+            "rows": args.rows,
+            "dict_bytes_per_row": round(dict_bytes / args.rows, 1),
+            "record_bytes_per_row": round(record_bytes / args.rows, 1),
+            "ratio": round(record_bytes / dict_bytes, 3),
+        }
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.check and any(r["ratio"] >= 0.5 for r in results.values()):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
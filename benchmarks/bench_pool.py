@@ -0,0 +1,67 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.generators import gen_ingredient_labels  # noqa: E402
+from beauty_agent import analyze_ingredients_rule_based  # noqa: E402
+from worker_pool import WorkerPool  # noqa: E402
+
+# =========================================================
+# ワーカープール（worker_pool.py）のスループット: 成分表示の一括チェックをワーカー数ごとに
+# - 1プロセス（プール無し）を基準に、labels/s と速度比（理想はワーカー数倍）を出す
+# - ワーカーの起動と warm は計測に含めない（1回空打ちしてから測る）
+#   python benchmarks/bench_pool.py --labels 20000 --workers 1,2,4,8 --chunksize 100
+# =========================================================
+
+
+def _ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--labels", type=int, default=20000)
+    ap.add_argument("--workers", default=",".join(str(n) for n in (1, 2, 4, 8) if n <= (os.cpu_count() or 1)) or "1")
+    ap.add_argument("--chunksize", type=int, default=100)
+    args = ap.parse_args()
+
+    labels = gen_ingredient_labels(args.labels)
+    for label in labels[:10]:
+        analyze_ingredients_rule_based(label)
+    t0 = time.perf_counter()
+    for label in labels:
+        analyze_ingredients_rule_based(label)
+    inline_s = time.perf_counter() - t0
+
+    runs: Dict[str, Dict[str, Any]] = {}
+    for n in _ints(args.workers):
+        with WorkerPool(workers=n, queue_size=n * 4) as pool:
+            list(pool.map(analyze_ingredients_rule_based, labels[: n * args.chunksize], chunksize=args.chunksize))
+            t0 = time.perf_counter()
+            count = sum(1 for _ in pool.map(analyze_ingredients_rule_based, labels, chunksize=args.chunksize))
+            elapsed = time.perf_counter() - t0
+        runs[str(n)] = {
+            "labels_per_s": round(count / elapsed),
+            "speedup": round(inline_s / elapsed, 2),
+            "efficiency": round(inline_s / elapsed / n, 2),
+        }
+
+    print(json.dumps({
+        "cpus": os.cpu_count(),
+        "labels": len(labels),
+        "chunksize": args.chunksize,
+        "inline_labels_per_s": round(len(labels) / inline_s),
+        "workers": runs,
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import argparse
+import json
+import sys
+import time
+from html import escape
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from app_core import fragrance_label, generate_routine, product_type_label, t  # noqa: E402
+from benchmarks.generators import gen_cli_products  # noqa: E402
+from catalog import build_catalog  # noqa: E402
+from ui_templates import STEP_TITLES, _card_cache, product_grid_html, step_list_html  # noqa: E402
+
+# =========================================================
+# 商品カード / ステップカードの描画: 1カード1デルタ（旧） vs グリッド1ブロック（ui_templates）
+# 1回の rerun で Streamlit に送る st.markdown デルタ数とバイト数、組み立て時間を比べる
+#   python benchmarks/bench_render.py --picks 8
+# 旧方式のデルタ数には st.columns(2) のコンテナ分（ブロック1 + 列2）を含める
+# =========================================================
+
+_COLUMNS_DELTAS = 3
+
+
+def legacy_product_card(prod, lang):
+    """旧 app.render_product_card の HTML（比較用にそのまま残す）。"""
+    tags_html = "".join([f"<span class='ec-tag'>{escape(str(tag))}</span>" for tag in prod.tags[:4]])
+    return f"""
+    <div class="ec-card">
+      <div class="ec-top">
+        <div class="ec-emoji">{escape(prod.emoji)}</div>
+        <div>
+          <div class="ec-name">{escape(prod.display_name(lang))}</div>
+          <div class="ec-meta">{escape(product_type_label(prod.type, lang))} ・ {escape(fragrance_label(prod.fragrance, lang))}</div>
+        </div>
+      </div>
+      <div class="ec-desc">{escape(prod.display_desc(lang))}</div>
+      <div class="ec-tags">{tags_html}</div>
+      <div class="ec-price">{escape(t('price', lang))}: {escape(f"¥{prod.price_jpy:,}")}</div>
+      <div class="ec-footer">
+        <span class="ec-badge">{escape(t("product_card_note", lang))}</span>
+        <span class="ec-btn">{escape(t("cta_try", lang))}</span>
+      </div>
+    </div>
+    """
+
+
+def legacy_step_list(title, steps, lang):
+    """旧 app.render_step_list が送っていたデルタ（見出し + ステップごと + 合計メモ）。"""
+    blocks = [f"### {escape(title)}"]
+    total_m = 0
+    for idx, s in enumerate(steps, start=1):
+        total_m += int(s.get("minutes", 0))
+        head_title = f"{idx}. {STEP_TITLES.get(s['title'], {}).get(lang, s['title'])}"
+        blocks.append(f"""
+        <div class="step-card">
+          <div class="step-head">
+            <div class="step-title">{escape(head_title)}</div>
+            <div class="step-min">{escape(f"{int(s.get('minutes', 1))}{t('minutes', lang)}")}</div>
+          </div>
+          <div class="step-desc">{escape(str(s.get("desc", "")))}</div>
+        </div>
+        """)
+    total_label = {
+        "ja": f"合計目安: {total_m}分",
+        "en": f"Estimated total: {total_m} min",
+        "ko": f"예상 총 시간: {total_m}분",
+        "zh": f"预计总时长：{total_m}分钟",
+    }.get(lang, f"{total_m} min")
+    blocks.append("<div class='small-note'>{}</div>".format(escape(total_label)))
+    return blocks
+
+
+def measure(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        blocks = fn()
+    elapsed_us = (time.perf_counter() - t0) / repeat * 1e6
+    return {
+        "deltas": len(blocks),
+        "bytes": sum(len(b.encode("utf-8")) for b in blocks),
+        "build_us": round(elapsed_us, 1),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--picks", type=int, default=8)
+    ap.add_argument("--lang", default="ja")
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    picks = list(build_catalog(gen_cli_products(args.picks, seed=1)).products)
+    profile = {"skin_type": "dry", "concerns": ["dryness", "redness"], "am_minutes": 5, "pm_minutes": 15}
+    routine = generate_routine(profile, args.lang)
+    lang = args.lang
+
+    _card_cache.clear()
+    cold = measure(lambda: [product_grid_html(picks, lang)], 1)
+    result = {
+        "picks": len(picks),
+        "products": {
+            "per_card": measure(
+                lambda: [""] * _COLUMNS_DELTAS + [legacy_product_card(p, lang) for p in picks], args.repeat
+            ),
+            "grid_cold": cold,
+            "grid_memoized": measure(lambda: [product_grid_html(picks, lang)], args.repeat),
+        },
+        "routine": {
+            "per_step": measure(
+                lambda: legacy_step_list("AM", routine["am"], lang) + legacy_step_list("PM", routine["pm"], lang),
+                args.repeat,
+            ),
+            "batched": measure(
+                lambda: [f"### {escape('AM')}", step_list_html(routine["am"], lang),
+                         f"### {escape('PM')}", step_list_html(routine["pm"], lang)],
+                args.repeat,
+            ),
+        },
+    }
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.generators import gen_app_diaries  # noqa: E402
+from journal import entry_from_app_row  # noqa: E402
+from journal_search import JournalSearchIndex  # noqa: E402
+
+# =========================================================
+# 日記の全文検索: インデックス構築時間と検索レイテンシ（1クエリあたり ms）
+#   python benchmarks/bench_search.py --rows 100000
+# =========================================================
+
+QUERIES = ["ヒリつき", "サウナ", "sauna", "乾燥 化粧水", "赤", "見つからない語"]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+
+    entries = [entry_from_app_row(r) for r in gen_app_diaries(args.rows, seed=5)]
+    for e in entries[::97]:
+        e.memo = (e.memo or "") + " サウナのあと sauna"
+
+    t0 = time.perf_counter()
+    index = JournalSearchIndex()
+    index.extend(entries)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    queries = {}
+    for q in QUERIES:
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            hits = index.search(q, limit=50)
+        queries[q] = {"hits": len(hits), "ms": round((time.perf_counter() - t0) / args.repeat * 1000, 3)}
+
+    print(json.dumps({
+        "rows": args.rows,
+        "grams": len(index.postings),
+        "build_ms": round(build_ms, 1),
+        "queries": queries,
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
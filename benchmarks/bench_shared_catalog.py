@@ -0,0 +1,117 @@
+import argparse
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.generators import gen_cli_products, gen_ingredient_labels  # noqa: E402
+from catalog import build_catalog, file_version, load_catalog, load_catalog_file, read_catalog_rows  # noqa: E402
+from shared_catalog import attach_worker, generation_snapshot_path, publish_catalog  # noqa: E402
+from worker_pool import WorkerPool, warm_engine  # noqa: E402
+
+# =========================================================
+# ワーカー1つあたりのメモリ: 共有カタログ（shared_catalog.py）vs 各ワーカーが JSON から読む
+# - none: warm_engine のみ（カタログ無し）の基準
+# - shared: attach_worker（mmap したスナップショットから Product を組み立てる）
+# - json: 各ワーカーが JSON をパースして build_catalog
+# /proc/self/smaps_rollup の Rss / Pss / Private を出す（Linux のみ）。Private の差がワーカーごとに複製される分
+#   python benchmarks/bench_shared_catalog.py --products 100000 --workers 4
+# =========================================================
+
+_FIELDS = ("Rss", "Pss", "Shared_Clean", "Private_Clean", "Private_Dirty")
+
+
+def _memory_kb() -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in _FIELDS:
+                out[key] = int(rest.split()[0])
+    return out
+
+
+def _warm_json(json_path: Path) -> None:
+    warm_engine()
+    catalog = build_catalog(read_catalog_rows(json_path) or [])
+    globals()["_catalog"] = catalog   # ワーカーが保持し続ける
+
+
+def _probe(json_path: Path, mode: str) -> Dict[str, Any]:
+    if mode == "shared":
+        products = len(load_catalog(json_path))
+    elif mode == "json":
+        products = len(globals()["_catalog"])
+    else:
+        products = 0
+    time.sleep(0.3)   # 各ワーカーに1件ずつ行き渡らせる
+    return {"pid": os.getpid(), "products": products, **_memory_kb()}
+
+
+def _measure(json_path: Path, mode: str, workers: int) -> Dict[str, Any]:
+    warm = {
+        "none": warm_engine,
+        "shared": functools.partial(attach_worker, json_path),
+        "json": functools.partial(_warm_json, json_path),
+    }[mode]
+    with WorkerPool(workers=workers, queue_size=workers * 2, warm=warm, timeout=600) as pool:
+        samples = [f.result() for f in [pool.submit(_probe, json_path, mode) for _ in range(workers)]]
+    per_pid = {s["pid"]: s for s in samples}
+    n = len(per_pid)
+
+    def mean_mb(key: str) -> float:
+        return round(sum(s.get(key, 0) for s in per_pid.values()) / n / 1024, 1)
+
+    return {
+        "workers_sampled": n,
+        "products": samples[0]["products"],
+        "rss_mb": mean_mb("Rss"),
+        "pss_mb": mean_mb("Pss"),
+        "shared_clean_mb": mean_mb("Shared_Clean"),
+        "private_mb": round(sum(s.get("Private_Clean", 0) + s.get("Private_Dirty", 0) for s in per_pid.values()) / n / 1024, 1),
+    }
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--products", type=int, default=100000)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--label-ratio", type=float, default=0.3)
+    args = ap.parse_args()
+    if not Path("/proc/self/smaps_rollup").exists():
+        print("Linux の /proc/self/smaps_rollup が必要です")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = Path(tmp) / "products_local.json"
+        labels = gen_ingredient_labels(500)
+        json_path.write_text(json.dumps(gen_cli_products(args.products, labels=labels, label_ratio=args.label_ratio), ensure_ascii=False), encoding="utf-8")
+        catalog = load_catalog_file(json_path, file_version(json_path))
+        publish_catalog(json_path, catalog)
+
+        runs = {mode: _measure(json_path, mode, args.workers) for mode in ("none", "shared", "json")}
+        base = runs["none"]["private_mb"]
+        for mode in ("shared", "json"):
+            runs[mode]["private_over_none_mb"] = round(runs[mode]["private_mb"] - base, 1)
+        json_mb = json_path.stat().st_size / 1024 / 1024
+        snapshot_mb = generation_snapshot_path(json_path, 1).stat().st_size / 1024 / 1024
+
+    print(json.dumps({
+        "products": args.products,
+        "workers": args.workers,
+        "json_mb": round(json_mb, 1),
+        "snapshot_mb": round(snapshot_mb, 1),
+        "modes": runs,
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
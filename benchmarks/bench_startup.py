@@ -0,0 +1,59 @@
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.generators import gen_cli_products  # noqa: E402
+
+# =========================================================
+# カタログのコールドスタート: JSON パース vs バイナリスナップショット
+# 毎回新しいプロセスで load_catalog を1回呼んだ時間を測る
+#   python benchmarks/bench_startup.py --rows 100000
+# =========================================================
+
+_CHILD = """
+import sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+from catalog import load_catalog
+from pathlib import Path
+c = load_catalog(Path({path!r}))
+print(len(c), round((time.perf_counter() - t0) * 1000, 1))
+"""
+
+
+def cold_load_ms(path: Path) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(root=str(ROOT), path=str(path))],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return float(out[1])
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "products_local.json"
+        path.write_text(json.dumps(gen_cli_products(args.rows), ensure_ascii=False), encoding="utf-8")
+        first_ms = cold_load_ms(path)       # JSON パース + スナップショット生成
+        snap_ms = cold_load_ms(path)        # 生成済みスナップショットから復元
+        print(json.dumps({
+            "rows": args.rows,
+            "json_bytes": path.stat().st_size,
+            "snapshot_bytes": path.with_suffix(".snap").stat().st_size,
+            "cold_first_run_ms": first_ms,
+            "cold_snapshot_ms": snap_ms,
+        }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
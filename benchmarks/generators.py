@@ -0,0 +1,134 @@
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+# =========================================================
+# ベンチマーク用の合成データ（seed 固定で再現可能）
+# =========================================================
+
+CLI_CATEGORIES = ["洗顔", "化粧水", "美容液", "乳液", "クリーム", "日焼け止め"]
+CLI_SKIN_TYPES = ["乾燥", "敏感", "混合", "脂性"]
+CLI_CONCERNS = ["乾燥", "赤み", "ベタつき", "毛穴目立ち"]
+CLI_TAGS = ["低刺激", "保湿", "高保湿", "軽い", "さっぱり", "シンプル", "毎日", "UV", "ジェル", "泡"]
+SYMPTOMS = ["赤み", "乾燥", "かゆみ", "ヒリつき", "ニキビ", "皮むけ", "ベタつき", "毛穴目立ち", "くすみ"]
+ITEMS = ["化粧水", "乳液", "美容液", "クリーム", "洗顔", "クレンジング", "日焼け止め", "パック"]
+
+APP_TYPES = ["cleanser", "lotion", "serum", "moisturizer", "sunscreen", "spot"]
+APP_SKIN_TYPES = ["dry", "oily", "combo", "sensitive", "normal"]
+APP_CONCERNS = ["dryness", "redness", "oiliness", "pores", "dullness", "acne", "sensitivity"]
+APP_TEXTURES = ["foam", "watery", "serum", "gel", "gel-cream", "rich cream", "milk"]
+FRAGRANCES = ["none", "light", "like"]
+UNKNOWN_INGREDIENTS = ["aqua mineral complex", "オリジナル保湿成分", "plant extract blend", "植物エキス", "ci 12345"]
+
+
+def gen_ingredient_labels(n: int, seed: int = 11) -> List[str]:
+    """辞書の名前（英語 / 日本語）と辞書に無い名前を混ぜた、20〜35成分の成分表示。"""
+    from ingredient_dict import load_dictionary
+
+    rng = random.Random(seed)
+    names = [name for group in load_dictionary().names for name in group]
+    labels = []
+    for _ in range(n):
+        parts = [rng.choice(names) for _ in range(rng.randint(20, 35))]
+        parts += rng.sample(UNKNOWN_INGREDIENTS, 2)
+        rng.shuffle(parts)
+        labels.append(("、" if rng.random() < 0.5 else ", ").join(parts))
+    return labels
+
+
+def _label_for(rng: random.Random, labels: Optional[Sequence[str]], ratio: float) -> Optional[str]:
+    if labels and rng.random() < ratio:
+        return rng.choice(labels)
+    return None
+
+
+def gen_cli_products(n: int, seed: int = 0, labels: Optional[Sequence[str]] = None, label_ratio: float = 0.0) -> List[Dict[str, Any]]:
+    """CLI（beauty_agent.py）スキーマの商品。labels を渡すと label_ratio の割合で成分表示を付ける。"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        cat = rng.choice(CLI_CATEGORIES)
+        rows.append({
+            "id": f"g{i:07d}",
+            "name": f"{cat}{i}",
+            "category": cat,
+            "price_jpy": rng.randrange(500, 8000, 10),
+            "months_last": rng.choice([1.0, 1.2, 1.5, 2.0]),
+            "fragrance_free": rng.random() < 0.7,
+            "alcohol_free": rng.random() < 0.8,
+            "skin_types": rng.sample(CLI_SKIN_TYPES, rng.randint(1, 3)),
+            "good_for": rng.sample(CLI_CONCERNS, rng.randint(1, 2)),
+            "avoid_if": rng.sample(CLI_CONCERNS, rng.randint(0, 1)),
+            "notes": rng.choice(["朝夜使いやすい", "乾燥部位中心", "軽い使用感", ""]),
+            "tags": rng.sample(CLI_TAGS, rng.randint(1, 3)),
+        })
+        label = _label_for(rng, labels, label_ratio)
+        if label:
+            rows[-1]["ingredients"] = label
+    return rows
+
+
+def gen_app_products(n: int, seed: int = 0, labels: Optional[Sequence[str]] = None, label_ratio: float = 0.0) -> List[Dict[str, Any]]:
+    """Streamlit（app.py）スキーマの商品（多言語 name / description）。"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        p_type = rng.choice(APP_TYPES)
+        row = {
+            "id": f"a{i:07d}",
+            "name": {"ja": f"{p_type}{i}", "en": f"{p_type.title()} {i}"},
+            "type": p_type,
+            "price_jpy": rng.randrange(500, 8000, 10),
+            "fragrance": rng.choice(FRAGRANCES),
+            "skin_types": rng.sample(APP_SKIN_TYPES, rng.randint(1, 3)),
+            "concerns": rng.sample(APP_CONCERNS, rng.randint(1, 3)),
+            "tags": rng.sample(CLI_TAGS, rng.randint(1, 3)),
+            "emoji": "🧴",
+            "steps": [p_type],
+            "texture": rng.choice(APP_TEXTURES),
+            "description": {"ja": rng.choice(["朝夜使いやすい", "乾燥部位中心", "軽い使用感", ""])},
+        }
+        label = _label_for(rng, labels, label_ratio)
+        if label:
+            row["ingredients"] = label
+        rows.append(row)
+    return rows
+
+
+def gen_cli_journal(days: int, seed: int = 0, start: date = date(2000, 1, 1)) -> List[Dict[str, Any]]:
+    """CLI の journal.jsonl の行（1日1件）。"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(days):
+        d = start + timedelta(days=i)
+        symptoms = rng.sample(SYMPTOMS, rng.randint(0, 3))
+        rows.append({
+            "id": f"journal_{d.strftime('%Y%m%d')}210000000000",
+            "created_at": f"{d.isoformat()}T12:00:00Z",
+            "date": d.isoformat(),
+            "condition_summary": "、".join(symptoms) or "記録",
+            "symptoms": symptoms,
+            "products_used": rng.sample(ITEMS, rng.randint(1, 4)),
+            "sleep_hours": rng.choice([4.5, 5.0, 5.5, 6.0, 6.5, 7.0, 7.5, 8.0]),
+            "stress_level_1to5": rng.randint(1, 5),
+            "memo": rng.choice([None, "睡眠不足", "マスク時間が長かった", "生理前"]),
+        })
+    return rows
+
+
+def gen_app_diaries(days: int, seed: int = 0, start: date = date(2000, 1, 1)) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(days):
+        d = start + timedelta(days=i)
+        rows.append({
+            "date": d.isoformat(),
+            "symptoms": ", ".join(rng.sample(SYMPTOMS, rng.randint(0, 3))),
+            "sleep_hours": rng.choice([4.5, 5.0, 5.5, 6.0, 6.5, 7.0, 7.5, 8.0]),
+            "stress": rng.randint(1, 5),
+            "used_items": " / ".join(rng.sample(ITEMS, rng.randint(1, 4))),
+            "memo": rng.choice(["", "睡眠不足", "マスク時間が長かった", "生理前"]),
+            "lang": "ja",
+            "created_at": f"{d.isoformat()}T21:00:00",
+        })
+    return rows
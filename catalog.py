@@ -0,0 +1,440 @@
+import json
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from metrics import cache_hit
+
+if TYPE_CHECKING:
+    from ingredient_rules import IngredientProfile
+
+# =========================================================
+# 商品カタログ（CLI / Streamlit 共通）
+# - beauty_agent.py の旧スキーマ: category / good_for / avoid_if / months_last / notes
+# - app.py の旧スキーマ: type / concerns / fragrance / 多言語 name・description
+# どちらの行も読み込み時に1回だけ Product へ正規化し、以降はメモリ上のストアを参照する
+# 成分表示（ingredients）のある商品は、カタログ構築時に分類ビットまで解析して Catalog.profiles に持つ
+# =========================================================
+
+# CLI カテゴリ（日本語） <-> Streamlit type コード
+CATEGORY_TO_TYPE = {
+    "洗顔": "cleanser",
+    "化粧水": "lotion",
+    "美容液": "serum",
+    "乳液": "moisturizer",
+    "クリーム": "moisturizer",
+    "日焼け止め": "sunscreen",
+    "部分用ケア": "spot",
+}
+TYPE_TO_CATEGORY = {
+    "cleanser": "洗顔",
+    "lotion": "化粧水",
+    "serum": "美容液",
+    "moisturizer": "乳液",
+    "sunscreen": "日焼け止め",
+    "spot": "部分用ケア",
+}
+
+# CLI の肌質・症状（日本語） -> 共通コード
+SKIN_TYPE_CODES = {
+    "乾燥": "dry",
+    "敏感": "sensitive",
+    "混合": "combo",
+    "脂性": "oily",
+    "普通": "normal",
+}
+CONCERN_CODES = {
+    "乾燥": "dryness",
+    "赤み": "redness",
+    "ベタつき": "oiliness",
+    "毛穴目立ち": "pores",
+    "くすみ": "dullness",
+    "ニキビ": "acne",
+    "刺激感": "sensitivity",
+}
+SKIN_TYPE_LABELS_JA = {v: k for k, v in SKIN_TYPE_CODES.items()}
+CONCERN_LABELS_JA = {v: k for k, v in CONCERN_CODES.items()}
+
+# 多言語テキストは dict ではなく LANGS 順の位置タプルで持つ（1言語だけなら要素1つ）
+LANGS = ("ja", "en", "ko", "zh")
+_LANG_INDEX = {lang: i for i, lang in enumerate(LANGS)}
+
+_interned_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_tuple(items: Tuple[str, ...]) -> Tuple[str, ...]:
+    """肌質・悩み・タグなどは語彙が小さいので、同じ組み合わせのタプルを行間で共有する。"""
+    cached = _interned_tuples.get(items)
+    if cached is None:
+        cached = tuple(sys.intern(s) for s in items)
+        _interned_tuples[cached] = cached
+    return cached
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class Product:
+    id: str
+    name: Tuple[str, ...]          # LANGS 順
+    category: str
+    type: str
+    price_jpy: int
+    months_last: float
+    fragrance: str
+    alcohol_free: bool
+    skin_types: Tuple[str, ...]
+    concerns: Tuple[str, ...]
+    avoid_if: Tuple[str, ...]
+    tags: Tuple[str, ...]
+    description: Tuple[str, ...]   # LANGS 順
+    emoji: str
+    texture: str
+    steps: Tuple[str, ...]
+    ingredients: Tuple[str, ...] = ()   # 成分表示（成分名ごと）
+
+    @property
+    def fragrance_free(self) -> bool:
+        return self.fragrance == "none"
+
+    def display_name(self, lang: str = "ja") -> str:
+        return i18n_get(self.name, lang) or next((v for v in self.name if v), "Product")
+
+    def display_desc(self, lang: str = "ja") -> str:
+        return i18n_get(self.description, lang)
+
+
+@dataclass(slots=True, eq=False)
+class ScoredProduct:
+    """おすすめ結果の1件。スコアリング中は並列配列で持ち、選ばれた候補だけをこれにする。"""
+    product: Product
+    score: float
+    reasons: Tuple[str, ...]
+    monthly_cost_jpy: int
+
+
+# ---------------------------------------------------------
+# 旧スキーマ -> Product
+# ---------------------------------------------------------
+def i18n_get(text: Tuple[str, ...], lang: str) -> str:
+    """指定言語 → 日本語 の順でフォールバック。"""
+    i = _LANG_INDEX.get(lang, 0)
+    if i < len(text) and text[i]:
+        return text[i]
+    return text[0] if text else ""
+
+
+def _as_i18n(value: Any) -> Tuple[str, ...]:
+    if isinstance(value, dict):
+        items = [str(value.get(lang) or "") for lang in LANGS]
+        while items and not items[-1]:
+            items.pop()
+        if items and not items[0]:
+            # 日本語が無い行はフォールバック先として最初の訳を先頭にも置く
+            items[0] = next(v for v in items if v)
+        return tuple(items)
+    if value is None or value == "":
+        return ()
+    return (str(value),)
+
+
+def _as_tuple(value: Any, mapping: Optional[Dict[str, str]] = None) -> Tuple[str, ...]:
+    if not isinstance(value, (list, tuple)):
+        return ()
+    items = [str(v) for v in value]
+    if mapping:
+        items = [mapping.get(v, v) for v in items]
+    return intern_tuple(tuple(dict.fromkeys(items)))
+
+
+def _as_ingredients(value: Any) -> Tuple[str, ...]:
+    """成分名のリスト、または成分表示の文字列（「、」「,」区切り）。"""
+    if isinstance(value, str):
+        from ingredient_dict import split_ingredients
+
+        return tuple(split_ingredients(value))
+    if not isinstance(value, (list, tuple)):
+        return ()
+    return tuple(s for s in (str(v).strip() for v in value) if s)
+
+
+def _as_int(value: Any, default: int = 0) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_float(value: Any, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def product_from_cli_row(row: Dict[str, Any]) -> Product:
+    category = str(row.get("category", ""))
+    return Product(
+        id=str(row.get("id", "")),
+        name=_as_i18n(row.get("name")),
+        category=sys.intern(category),
+        type=CATEGORY_TO_TYPE.get(category, "serum"),
+        price_jpy=_as_int(row.get("price_jpy")),
+        months_last=_as_float(row.get("months_last"), 1.0),
+        fragrance="none" if row.get("fragrance_free") else "any",
+        alcohol_free=bool(row.get("alcohol_free", False)),
+        skin_types=_as_tuple(row.get("skin_types"), SKIN_TYPE_CODES),
+        concerns=_as_tuple(row.get("good_for"), CONCERN_CODES),
+        avoid_if=_as_tuple(row.get("avoid_if"), CONCERN_CODES),
+        tags=_as_tuple(row.get("tags")),
+        description=_as_i18n(row.get("notes")),
+        emoji="🧴",
+        texture="",
+        steps=(),
+        ingredients=_as_ingredients(row.get("ingredients")),
+    )
+
+
+def product_from_app_row(row: Dict[str, Any]) -> Product:
+    p_type = str(row.get("type", "serum"))
+    texture = str(row.get("texture", ""))
+    category = TYPE_TO_CATEGORY.get(p_type, "美容液")
+    if p_type == "moisturizer" and "cream" in texture:
+        category = "クリーム"
+    return Product(
+        id=str(row.get("id", "")),
+        name=_as_i18n(row.get("name")),
+        category=category,
+        type=sys.intern(p_type),
+        price_jpy=_as_int(row.get("price_jpy")),
+        months_last=_as_float(row.get("months_last"), 1.0),
+        fragrance=sys.intern(str(row.get("fragrance", "any"))),
+        alcohol_free=bool(row.get("alcohol_free", False)),
+        skin_types=_as_tuple(row.get("skin_types")),
+        concerns=_as_tuple(row.get("concerns")),
+        avoid_if=_as_tuple(row.get("avoid_if")),
+        tags=_as_tuple(row.get("tags")),
+        description=_as_i18n(row.get("description")),
+        emoji=sys.intern(str(row.get("emoji", "🧴"))),
+        texture=sys.intern(texture),
+        steps=_as_tuple(row.get("steps")),
+        ingredients=_as_ingredients(row.get("ingredients")),
+    )
+
+
+def product_from_row(row: Any) -> Optional[Product]:
+    """旧スキーマを行ごとに判定して変換（dict 以外は None）。"""
+    if not isinstance(row, dict):
+        return None
+    if "type" in row or "concerns" in row or isinstance(row.get("name"), dict):
+        return product_from_app_row(row)
+    return product_from_cli_row(row)
+
+
+# ---------------------------------------------------------
+# Product -> 旧スキーマ（書き出し・表示互換用）
+# ---------------------------------------------------------
+def product_to_cli_row(p: Product) -> Dict[str, Any]:
+    row = {
+        "id": p.id,
+        "name": p.display_name("ja"),
+        "category": p.category,
+        "price_jpy": p.price_jpy,
+        "months_last": p.months_last,
+        "fragrance_free": p.fragrance_free,
+        "alcohol_free": p.alcohol_free,
+        "skin_types": [SKIN_TYPE_LABELS_JA.get(s, s) for s in p.skin_types],
+        "good_for": [CONCERN_LABELS_JA.get(c, c) for c in p.concerns],
+        "avoid_if": [CONCERN_LABELS_JA.get(c, c) for c in p.avoid_if],
+        "notes": p.display_desc("ja"),
+        "tags": list(p.tags),
+    }
+    if p.ingredients:
+        row["ingredients"] = list(p.ingredients)
+    return row
+
+
+# ---------------------------------------------------------
+# カタログ / ストア
+# ---------------------------------------------------------
+@dataclass(frozen=True, slots=True, eq=False)
+class Catalog:
+    products: Tuple[Product, ...]
+    by_id: Dict[str, Product]
+    by_category: Dict[str, Tuple[Product, ...]]
+    source: Optional[Path]
+    version: Optional[Tuple[int, int]]  # (mtime_ns, size)。ファイル無しなら None
+    profiles: Dict[str, "IngredientProfile"]  # 商品ID → 成分の分類ビット（成分表示のある商品だけ）
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def __iter__(self) -> Iterator[Product]:
+        return iter(self.products)
+
+
+def build_catalog(rows: Sequence[Any], source: Optional[Path] = None, version: Optional[Tuple[int, int]] = None) -> Catalog:
+    products = tuple(p for p in (product_from_row(r) for r in rows) if p is not None)
+    return catalog_from_products(products, source, version)
+
+
+def catalog_from_products(products: Tuple[Product, ...], source: Optional[Path] = None, version: Optional[Tuple[int, int]] = None) -> Catalog:
+    by_category: Dict[str, List[Product]] = {}
+    for p in products:
+        by_category.setdefault(p.category, []).append(p)
+    profiles: Dict[str, "IngredientProfile"] = {}
+    if any(p.ingredients for p in products):
+        # 成分辞書は成分表示のある商品があるときだけ読む
+        from ingredient_rules import analyze_products
+
+        profiles = analyze_products(products)
+    return Catalog(
+        products=products,
+        by_id={p.id: p for p in products},
+        by_category={k: tuple(v) for k, v in by_category.items()},
+        source=source,
+        version=version,
+        profiles=profiles,
+    )
+
+
+def file_version(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def read_catalog_rows(path: Path) -> Optional[List[Any]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    return data if isinstance(data, list) else None
+
+
+class CatalogError(ValueError):
+    """商品カタログのファイルが読めない / 中身が不正（strict な読み込みのとき）。"""
+
+
+def validate_catalog_rows(rows: Sequence[Any], limit: int = 5) -> List[str]:
+    """編集ミスの検出用。問題の説明（最大 limit 件）。空なら問題なし。"""
+    errors: List[str] = []
+    if not rows:
+        errors.append("商品が1件もありません")
+    seen: Dict[str, int] = {}
+    for i, row in enumerate(rows):
+        if len(errors) >= limit:
+            break
+        if not isinstance(row, dict):
+            errors.append(f"{i + 1}件目: オブジェクトではありません")
+            continue
+        pid = str(row.get("id") or "").strip()
+        if not pid:
+            errors.append(f"{i + 1}件目: id がありません")
+        elif pid in seen:
+            errors.append(f"{i + 1}件目: id {pid} が {seen[pid] + 1}件目と重複しています")
+        else:
+            seen[pid] = i
+        price = row.get("price_jpy")
+        if price is not None and (isinstance(price, bool) or not isinstance(price, (int, float)) or price < 0):
+            errors.append(f"{i + 1}件目: price_jpy が不正です（{price!r}）")
+    return errors
+
+
+def load_catalog_file(
+    path: Path,
+    version: Optional[Tuple[int, int]],
+    fallback_rows: Optional[Sequence[Any]] = None,
+    strict: bool = False,
+) -> Catalog:
+    """スナップショット → JSON の順に読む。ファイルが無ければ fallback_rows。
+
+    strict=False（従来の動作）は読めない JSON も fallback_rows で置き換える。
+    strict=True は読めない / 不正な JSON で CatalogError（呼び出し側が今のカタログを使い続ける）。
+    """
+    from catalog_snapshot import DECODE_ERRORS, open_snapshot, write_snapshot
+
+    if version is None:
+        return build_catalog(list(fallback_rows or []), source=path, version=version)
+    reader = open_snapshot(path, version)
+    if reader is not None:
+        try:
+            return catalog_from_products(reader.products(), source=path, version=version)
+        except DECODE_ERRORS:
+            pass   # 壊れたスナップショット: JSON から読み直して書き直す
+    rows = read_catalog_rows(path)
+    if strict:
+        if rows is None:
+            raise CatalogError(f"{path.name}: JSON の配列として読めません")
+        errors = validate_catalog_rows(rows)
+        if errors:
+            raise CatalogError(f"{path.name}: " + " / ".join(errors))
+    if rows is None:
+        return build_catalog(list(fallback_rows or []), source=path, version=version)
+    catalog = build_catalog(rows, source=path, version=version)
+    write_snapshot(catalog.products, path, version)
+    return catalog
+
+
+class CatalogStore:
+    """パスごとに1回だけパースして保持する。ファイル更新（mtime/サイズ変化）時のみ再構築。
+
+    JSON の隣にバイナリスナップショット（catalog_snapshot）があり version が一致すれば
+    JSON をパースせずにそこから復元する。JSON から作り直した時はスナップショットも更新する。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._catalogs: Dict[str, Catalog] = {}
+        self._providers: Dict[str, Callable[[], Optional[Catalog]]] = {}
+
+    def attach(self, path: Path, provider: Optional[Callable[[], Optional[Catalog]]]) -> None:
+        """path のカタログを provider() から取る（ワーカー間の共有カタログなど。shared_catalog.py）。
+
+        provider が None を返したときは通常どおりファイルから読む。provider=None で解除。
+        """
+        key = os.path.abspath(path)
+        if provider is None:
+            self._providers.pop(key, None)
+        else:
+            self._providers[key] = provider
+
+    def get(self, path: Path, fallback_rows: Optional[Sequence[Any]] = None) -> Catalog:
+        key = os.path.abspath(path)
+        provider = self._providers.get(key)
+        if provider is not None:
+            shared = provider()
+            if shared is not None:
+                return shared
+        version = file_version(path)
+        cached = self._catalogs.get(key)
+        if cached is not None and cached.version == version:
+            cache_hit("catalog", True)
+            return cached
+
+        with self._lock:
+            cached = self._catalogs.get(key)
+            if cached is not None and cached.version == version:
+                cache_hit("catalog", True)
+                return cached
+            cache_hit("catalog", False)
+            catalog = load_catalog_file(Path(path), version, fallback_rows)
+            self._catalogs[key] = catalog
+            return catalog
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._catalogs.clear()
+            else:
+                self._catalogs.pop(os.path.abspath(path), None)
+
+
+STORE = CatalogStore()
+
+
+def load_catalog(path: Path, fallback_rows: Optional[Sequence[Any]] = None) -> Catalog:
+    return STORE.get(path, fallback_rows)
@@ -0,0 +1,139 @@
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from catalog import STORE, Catalog, CatalogError, file_version, load_catalog_file
+from metrics import incr
+
+# =========================================================
+# 商品カタログのホットリロード（products_local.json を編集すると、再起動せずに反映）
+# - バックグラウンドのスレッドが interval 秒ごとに (mtime, size) を見て、変わっていれば
+#   読み込み・検証・索引（カテゴリ別 / 成分の分類ビット / スナップショット）の構築まで済ませてから参照を差し替える
+# - リクエスト側の load_catalog(path) は差し替え済みのカタログを返すだけ（stat もパースもしない）
+# - 編集途中の保存や JSON の書き間違いは検証で弾き、直前のカタログを使い続ける（error に理由を残す）
+# - 監視は標準ライブラリだけで動くよう mtime のポーリング（inotify は使わない）
+# - on_swap(fn) で差し替え時に呼ぶ関数を登録できる（ワーカーへの publish_catalog など）。
+#   フックが例外を出しても差し替えと監視は続け、理由を error に残す
+# =========================================================
+
+INTERVAL_ENV = "BEAUTY_AGENT_CATALOG_POLL_S"
+DEFAULT_INTERVAL = 1.0
+
+
+class CatalogManager:
+    def __init__(self, path: Path, fallback_rows: Optional[Sequence[Any]] = None, interval: float = DEFAULT_INTERVAL) -> None:
+        self.path = Path(path)
+        self.interval = interval
+        self.error: Optional[str] = None     # 直近の読み込みに失敗した理由（成功すれば None）
+        self._fallback_rows = fallback_rows
+        self._catalog: Optional[Catalog] = None
+        self._seen: Optional[Tuple[int, int]] = None   # 最後に読もうとした version（失敗した版を毎回読み直さない）
+        self._swap_hooks: List[Callable[[Catalog], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def catalog(self) -> Catalog:
+        if self._catalog is None:
+            self.check()
+            if self._catalog is None:
+                raise RuntimeError(self.error or "catalog could not be loaded")
+        return self._catalog
+
+    def get(self) -> Optional[Catalog]:
+        return self._catalog
+
+    def on_swap(self, fn: Callable[[Catalog], None]) -> None:
+        self._swap_hooks.append(fn)
+
+    def check(self) -> bool:
+        """ファイルが変わっていれば読み直す。差し替えたら True。"""
+        version = file_version(self.path)
+        if self._catalog is not None and version == self._seen:
+            return False
+        with self._lock:
+            if self._catalog is not None and version == self._seen:
+                return False
+            self._seen = version
+            if version is None and self._catalog is not None:
+                # 保存時に一度消してから書き直すエディタもあるので、消えている間は今のカタログのまま
+                self.error = f"{self.path.name}: ファイルがありません"
+                return False
+            try:
+                catalog = load_catalog_file(self.path, version, self._fallback_rows, strict=self._catalog is not None)
+            except CatalogError as e:
+                self.error = str(e)
+                incr("catalog_reloads", result="invalid")
+                return False
+            except Exception as e:   # 索引の構築で落ちても配信は止めない
+                self.error = f"{type(e).__name__}: {e}"
+                incr("catalog_reloads", result="error")
+                return False
+            first = self._catalog is None
+            self._catalog = catalog
+            self.error = None
+        if not first:
+            incr("catalog_reloads", result="ok")
+        for fn in list(self._swap_hooks):
+            try:
+                fn(catalog)
+            except Exception as e:   # 差し替えは済んでいる。フックの失敗で監視を止めない
+                name = getattr(getattr(fn, "func", fn), "__name__", repr(fn))
+                self.error = f"{name}: {type(e).__name__}: {e}"
+                incr("catalog_reloads", result="hook_error")
+        return True
+
+    def start(self) -> "CatalogManager":
+        """初回を読み込み、load_catalog(path) をこのマネージャーに向けてから監視を始める。
+
+        初回が読めなくても例外にせず監視を始める（理由は error。読めるまで load_catalog は従来どおりファイルから読む）。
+        """
+        self.check()
+        STORE.attach(self.path, self.get)
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name=f"catalog-reload-{self.path.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        STORE.attach(self.path, None)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:   # stat などで落ちても次の周期で見直す（スレッドを終わらせない）
+                self.error = f"{type(e).__name__}: {e}"
+                incr("catalog_reloads", result="error")
+
+
+_managers: Dict[str, CatalogManager] = {}
+_managers_lock = threading.Lock()
+
+
+def interval_from_env() -> float:
+    value = os.environ.get(INTERVAL_ENV, "").strip()
+    try:
+        return float(value) if value else DEFAULT_INTERVAL
+    except ValueError:
+        return DEFAULT_INTERVAL
+
+
+def watch_catalog(path: Path, fallback_rows: Optional[Sequence[Any]] = None, interval: Optional[float] = None) -> CatalogManager:
+    """path の監視を開始する（パスごとに1つ。2回目以降は既存のマネージャーを返す）。"""
+    key = os.path.abspath(path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = CatalogManager(path, fallback_rows, interval_from_env() if interval is None else interval).start()
+            _managers[key] = manager
+    return manager
+
+
+def reload_error(path: Path) -> Optional[str]:
+    """path を監視中で、直近の編集が読み込めなかったときの理由。"""
+    manager = _managers.get(os.path.abspath(path))
+    return manager.error if manager is not None else None
@@ -0,0 +1,270 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from catalog import Product, intern_tuple
+
+# =========================================================
+# 商品カタログのバイナリスナップショット（列指向 + 文字列テーブル）
+# - products_local.json の隣に products_local.snap を作る
+# - ヘッダに元 JSON の (mtime_ns, size) を持ち、一致しなければ使わない（=自動で再生成）
+# - 読み込みは mmap。数値列は memoryview のままゼロコピー、文字列は参照された分だけデコード
+#
+# 手動ビルド:
+#   python catalog_snapshot.py beauty_agent_data/products_local.json
+# =========================================================
+
+MAGIC = b"BACSNAP3"
+_HEADER = struct.Struct("<8sqqII")      # magic, src mtime_ns, src size, rows, columns
+_COLDIR = struct.Struct("<16sc7xQQ")    # name, kind, offset, length
+_ALIGN = 8
+
+# 列の種類: q=int64 / d=float64 / b=bool(uint8) / s=文字列ID / l=文字列IDのリスト
+# 並びは Product のフィールド順と同じ（products() で位置引数として渡す）
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("id", "s"),
+    ("name", "l"),
+    ("category", "s"),
+    ("type", "s"),
+    ("price_jpy", "q"),
+    ("months_last", "d"),
+    ("fragrance", "s"),
+    ("alcohol_free", "b"),
+    ("skin_types", "l"),
+    ("concerns", "l"),
+    ("avoid_if", "l"),
+    ("tags", "l"),
+    ("description", "l"),
+    ("emoji", "s"),
+    ("texture", "s"),
+    ("steps", "l"),
+    ("ingredients", "l"),
+)
+_STRINGS = "__strings__"
+_ITEM_SIZE = {"q": 8, "d": 8, "b": 1, "s": 4, "l": 4, "t": 1}
+
+# 中身が壊れたスナップショットを展開したときに出うる例外（呼び出し側は JSON から作り直す）
+DECODE_ERRORS = (TypeError, ValueError, IndexError, UnicodeDecodeError, struct.error)
+
+
+def snapshot_path(json_path: Path) -> Path:
+    return Path(json_path).with_suffix(".snap")
+
+
+def _pad(n: int) -> int:
+    return (-n) % _ALIGN
+
+
+# ---------------------------------------------------------
+# 書き出し
+# ---------------------------------------------------------
+def encode_snapshot(products: Sequence[Product], version: Tuple[int, int]) -> bytes:
+    string_ids: Dict[str, int] = {}
+
+    def sid(s: str) -> int:
+        i = string_ids.get(s)
+        if i is None:
+            i = string_ids[s] = len(string_ids)
+        return i
+
+    regions: List[Tuple[str, str, bytes]] = []
+    for name, kind in COLUMNS:
+        values = [getattr(p, name) for p in products]
+        if kind == "q":
+            data = array("q", values).tobytes()
+        elif kind == "d":
+            data = array("d", values).tobytes()
+        elif kind == "b":
+            data = bytes(1 if v else 0 for v in values)
+        elif kind == "s":
+            data = array("I", [sid(v) for v in values]).tobytes()
+        else:
+            offsets = array("I", [0])
+            ids = array("I")
+            for v in values:
+                ids.extend(sid(x) for x in v)
+                offsets.append(len(ids))
+            data = offsets.tobytes() + ids.tobytes()
+        regions.append((name, kind, data))
+
+    encoded = [s.encode("utf-8") for s in string_ids]
+    str_offsets = array("I", [0])
+    for b in encoded:
+        str_offsets.append(str_offsets[-1] + len(b))
+    regions.append((_STRINGS, "t", array("I", [len(encoded)]).tobytes() + str_offsets.tobytes() + b"".join(encoded)))
+
+    head = _HEADER.pack(MAGIC, version[0], version[1], len(products), len(regions))
+    offset = len(head) + _COLDIR.size * len(regions)
+    offset += _pad(offset)
+    directory = []
+    body = []
+    for name, kind, data in regions:
+        directory.append(_COLDIR.pack(name.encode("ascii"), kind.encode("ascii"), offset, len(data)))
+        body.append(data + b"\0" * _pad(len(data)))
+        offset += len(data) + _pad(len(data))
+    prefix = head + b"".join(directory)
+    return prefix + b"\0" * _pad(len(prefix)) + b"".join(body)
+
+
+def write_snapshot(products: Sequence[Product], json_path: Path, version: Tuple[int, int]) -> bool:
+    """一時ファイルに書いてから置き換える（読み込み中の他プロセスを壊さない）。"""
+    if sys.byteorder != "little":
+        return False
+    path = snapshot_path(json_path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp.write_bytes(encode_snapshot(products, version))
+        os.replace(tmp, path)
+        return True
+    except (OSError, OverflowError, ValueError):   # 書けない / int64 に入らない価格など（JSON から読んだカタログで続ける）
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        return False
+
+
+# ---------------------------------------------------------
+# 読み込み
+# ---------------------------------------------------------
+class SnapshotReader:
+    """mmap 上のスナップショット。列は初回アクセス時にだけ展開してキャッシュする。"""
+
+    def __init__(self, buf: Any, rows: int, directory: Dict[str, Tuple[str, int, int]]) -> None:
+        self._buf = buf
+        self._view = memoryview(buf)
+        self.rows = rows
+        self._dir = directory
+        self._columns: Dict[str, Sequence[Any]] = {}
+        self._strings: Optional[List[Optional[str]]] = None
+        self._str_offsets: Any = None
+        self._str_blob: Any = None
+
+    def close(self) -> None:
+        """列をまだ展開していない reader を閉じる（展開済みの列は mmap を参照している）。"""
+        self._view.release()
+        self._buf.close()
+
+    def _region(self, name: str) -> Tuple[str, memoryview]:
+        kind, offset, length = self._dir[name]
+        return kind, self._view[offset:offset + length]
+
+    def string(self, i: int) -> str:
+        if self._strings is None:
+            _, region = self._region(_STRINGS)
+            count = region[:4].cast("I")[0]
+            self._str_offsets = region[4:4 + (count + 1) * 4].cast("I")
+            self._str_blob = region[4 + (count + 1) * 4:]
+            self._strings = [None] * count
+        s = self._strings[i]
+        if s is None:
+            s = self._strings[i] = sys.intern(str(self._str_blob[self._str_offsets[i]:self._str_offsets[i + 1]], "utf-8"))
+        return s
+
+    def column(self, name: str) -> Sequence[Any]:
+        cached = self._columns.get(name)
+        if cached is not None:
+            return cached
+        kind, region = self._region(name)
+        if kind in ("q", "d"):
+            col: Sequence[Any] = region.cast(kind)
+        elif kind == "b":
+            col = [b != 0 for b in region]
+        elif kind == "s":
+            string = self.string
+            col = [string(i) for i in region.cast("I").tolist()]
+        else:
+            offsets = region[:(self.rows + 1) * 4].cast("I").tolist()
+            ids = region[(self.rows + 1) * 4:].cast("I").tolist()
+            # 同じID列（タグの組み合わせ等）は1回だけデコードする
+            decoded: Dict[Tuple[int, ...], Tuple[str, ...]] = {}
+            col = []
+            for start, end in zip(offsets, offsets[1:]):
+                key = tuple(ids[start:end])
+                value = decoded.get(key)
+                if value is None:
+                    value = decoded[key] = intern_tuple(tuple(self.string(i) for i in key))
+                col.append(value)
+        self._columns[name] = col
+        return col
+
+    def products(self) -> Tuple[Product, ...]:
+        cols = [self.column(name) for name, _ in COLUMNS]
+        return tuple(Product(*values) for values in zip(*cols))
+
+
+def _region_fits(kind: str, offset: int, length: int, rows: int, size: int) -> bool:
+    item = _ITEM_SIZE.get(kind)
+    if item is None or offset % _ALIGN or offset + length > size or length % item:
+        return False
+    if kind in ("q", "d", "b", "s"):
+        return length == rows * item
+    if kind == "l":
+        return length >= (rows + 1) * 4
+    return length >= 8   # t: 件数 + オフセット1つ以上
+
+
+def open_snapshot(json_path: Path, version: Tuple[int, int]) -> Optional[SnapshotReader]:
+    """元 JSON の version と一致するスナップショットがあれば開く。無い/古い/壊れている場合は None。"""
+    opened = open_snapshot_file(snapshot_path(json_path))
+    if opened is None:
+        return None
+    reader, src_version = opened
+    if src_version != tuple(version):
+        reader.close()
+        return None
+    return reader
+
+
+def open_snapshot_file(path: Path) -> Optional[Tuple[SnapshotReader, Tuple[int, int]]]:
+    """スナップショットのファイルを直接開く。(reader, 元 JSON の version)。"""
+    if sys.byteorder != "little":
+        return None
+    try:
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        magic, mtime_ns, size, rows, ncols = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            buf.close()
+            return None
+        directory = {}
+        for i in range(ncols):
+            name, kind, offset, length = _COLDIR.unpack_from(buf, _HEADER.size + i * _COLDIR.size)
+            directory[name.rstrip(b"\0").decode("ascii")] = (kind.decode("ascii"), offset, length)
+        if any(directory.get(name, ("",))[0] != kind for name, kind in COLUMNS) or _STRINGS not in directory:
+            buf.close()
+            return None
+        if not all(_region_fits(kind, offset, length, rows, len(buf)) for kind, offset, length in directory.values()):
+            buf.close()   # 途中で切れた / 壊れたファイル
+            return None
+        return SnapshotReader(buf, rows, directory), (mtime_ns, size)
+    except (struct.error, UnicodeDecodeError):
+        buf.close()
+        return None
+
+
+def main(argv: List[str]) -> int:
+    from catalog import build_catalog, file_version, read_catalog_rows
+
+    targets = [Path(a) for a in argv] or [Path("beauty_agent_data") / "products_local.json"]
+    for json_path in targets:
+        version = file_version(json_path)
+        rows = read_catalog_rows(json_path) if version else None
+        if rows is None:
+            print(f"skip: {json_path}（読み込めません）")
+            continue
+        catalog = build_catalog(rows)
+        ok = write_snapshot(catalog.products, json_path, version)
+        print(f"{'built' if ok else 'failed'}: {snapshot_path(json_path)}（{len(catalog)}件）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,397 @@
+import os
+import re
+import sys
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from catalog import file_version
+from metrics import cache_hit
+
+# =========================================================
+# 成分名の同義語辞書（INCI 名 / 日本語の表示名称 / 韓国語・中国語 / よくある誤記 → 正規化ID）
+# - 元データは ingredient_data/synonyms.tsv（1行 = 1成分）
+# - 初回使用時に文字トライ（dict のネスト）へ変換し、成分1つあたり1回のトライ走査で判定する
+#   （変換は数十 ms。marshal で保存しても読み込みの方が遅かったのでキャッシュファイルは作らない）
+#
+# 見出しの重複・未定義の分類のチェック:
+#   python ingredient_dict.py
+# =========================================================
+
+DATA_DIR = Path(__file__).resolve().parent / "ingredient_data"
+SYNONYMS_PATH = DATA_DIR / "synonyms.tsv"
+
+# 分類の語彙（TSV の2列目）。解析側（beauty_agent.py / app_core.py）がそれぞれの表示カテゴリへ対応づける
+CLASSES: Tuple[str, ...] = (
+    "humectant", "emollient", "occlusive", "soothing", "brightening", "antioxidant", "active",
+    "retinoid", "aha", "bha", "pha", "exfoliant", "vitamin_c", "niacinamide", "benzoyl_peroxide",
+    "fragrance", "fragrance_allergen", "essential_oil", "drying_alcohol", "physical_exfoliant",
+    "preservative", "sensitizer", "surfactant", "uv_filter", "peptide", "ceramide", "barrier",
+    "emulsifier", "thickener", "film_former", "solvent", "ph_adjuster", "chelator", "silicone",
+    "acne", "sebum_control", "astringent", "colorant", "drug", "claim",
+)
+
+_END = ""          # トライの終端キー（文字は空にならないので衝突しない）
+_WHOLE = "="       # TSV でこの接頭辞が付いた名前は、成分名の先頭から一致したときだけ採用（bg / アルコール など）
+_DASHES = str.maketrans({c: " " for c in "-‐‑‒–—−"})
+_PAREN = re.compile(r"\s*\([^)]*\)")
+_SPACES = re.compile(r"\s+")
+_SEPARATORS = re.compile(r"[,、，;；\n]+|\s/\s")
+
+
+def normalize_name(text: str) -> str:
+    """全角/半角・大文字小文字・ハイフン/空白の揺れを吸収する（ヒアルロン酸Ｎａ → ヒアルロン酸na、alpha-arbutin → alpha arbutin）。"""
+    text = unicodedata.normalize("NFKC", text).lower().translate(_DASHES)
+    return _SPACES.sub(" ", text).strip()
+
+
+def split_ingredients(text: str) -> List[str]:
+    """成分表示を成分ごとに分ける（「,」「、」「;」改行。caprylic/capric のような / は名前の一部として残す）。"""
+    return [p.strip() for p in _SEPARATORS.split(text or "") if p.strip()]
+
+
+def _word(c: str) -> bool:
+    return c.isascii() and c.isalnum()
+
+
+def name_variants(raw: str) -> List[str]:
+    """見出しにする正規化済みの名前。括弧書きの省略と、ハイフンでつないだ英字名の連結形（alpha-arbutin → alphaarbutin）を足す。"""
+    out = [raw]
+    base = _PAREN.sub("", raw).strip()
+    if base and base != raw:
+        out.append(base)
+    for v in list(out):
+        if "-" in v and any(_word(c) for c in v):
+            out.append(v.replace("-", ""))
+    return list(dict.fromkeys(normalize_name(v) for v in out))
+
+
+@dataclass(frozen=True, slots=True)
+class IngredientMatch:
+    id: str
+    start: int
+    end: int
+    text: str          # 正規化後の一致部分
+
+
+@dataclass(frozen=True, slots=True)
+class FuzzyMatch:
+    id: str
+    text: str          # 正規化後の入力
+    key: str           # 一致した辞書の見出し
+    distance: int
+    confidence: float  # 1 - 距離 / 長い方の文字数
+
+
+# ---------------------------------------------------------
+# 近似一致（OCR・手入力の誤記: niacinamid / glycerine / ナイアシナミド）
+# - 対称削除（symmetric delete）: 見出しから最大 k 文字消した文字列 -> 見出し の索引を作っておき、
+#   入力側も k 文字まで消して引く。語彙数に比例せず、候補だけ編集距離で確かめる
+# - 許す距離は文字数で決める（短い語ほど厳しく。3文字以下は近似一致しない）
+# ---------------------------------------------------------
+MAX_DISTANCE = 2
+MIN_CONFIDENCE = 0.7
+_PREFIX = 8
+_QUANTITY = re.compile(r"\s*[0-9.]+\s*%$")
+
+
+def allowed_distance(length: int, max_distance: int = MAX_DISTANCE) -> int:
+    return min(max_distance, 0 if length < 4 else 1 if length < 7 else 2)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """隣接文字の入れ替えを1とする編集距離（OSA）。limit を超えたら limit + 1 で打ち切る。"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        low = i
+        for j, cb in enumerate(b, 1):
+            v = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                v = min(v, prev2[j - 2] + 1)
+            cur.append(v)
+            if v < low:
+                low = v
+        if low > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def _deletes(word: str, k: int) -> set:
+    out = {word}
+    frontier = {word}
+    for _ in range(k):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+class FuzzyIndex:
+    def __init__(self, vocab: List[Tuple[str, int]], max_distance: int = MAX_DISTANCE) -> None:
+        self.max_distance = max_distance
+        self.vocab = vocab
+        # 見出しの先頭 _PREFIX 文字だけ削除形を作る（SymSpell の prefix length。長い INCI 名でも削除形が爆発しない）
+        groups: Dict[Tuple[str, int], List[int]] = {}
+        for pos, (key, _) in enumerate(vocab):
+            groups.setdefault((key[:_PREFIX], allowed_distance(len(key), max_distance)), []).append(pos)
+        index: Dict[str, List[int]] = {}
+        for (prefix, k), positions in groups.items():
+            for d in _deletes(prefix, k):
+                hit = index.get(d)
+                if hit is None:
+                    index[d] = positions
+                elif hit is positions:
+                    continue
+                else:
+                    index[d] = hit + positions
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> List[Tuple[int, str, int]]:
+        """(距離, 見出し, 成分の位置) を近い順に。"""
+        k = allowed_distance(len(word), self.max_distance if max_distance is None else min(max_distance, self.max_distance))
+        if k == 0:
+            return []
+        seen = set()
+        out = []
+        for d in _deletes(word[:_PREFIX], k):
+            for pos in self.index.get(d, ()):
+                if pos in seen:
+                    continue
+                seen.add(pos)
+                key, idx = self.vocab[pos]
+                dist = edit_distance(word, key, k)
+                if dist <= k:
+                    out.append((dist, key, idx))
+        out.sort(key=lambda x: (x[0], -len(x[1]), x[1]))
+        return out
+
+
+def _trie_keys(trie: dict) -> List[Tuple[str, int]]:
+    """(見出し, 成分の位置)。先頭一致専用（=bg など）の見出しは近似一致の対象外。"""
+    out = []
+    stack = [("", trie)]
+    while stack:
+        prefix, node = stack.pop()
+        for c, child in node.items():
+            if c == _END:
+                if not child[1]:
+                    out.append((prefix, child[0]))
+            else:
+                stack.append((prefix + c, child))
+    out.sort()
+    return out
+
+
+class IngredientDictionary:
+    def __init__(
+        self,
+        ids: Tuple[str, ...],
+        classes: Tuple[FrozenSet[str], ...],
+        names: Tuple[Tuple[str, ...], ...],
+        trie: dict,
+        keys: int,
+    ) -> None:
+        self.ids = ids
+        self.classes = classes
+        self.names = names              # 成分ごとの名前（TSV の並び。表示名に使う）
+        self.trie = trie
+        self.keys = keys                # トライに入っている名前の数（表記ゆれ込み）
+        self.index = {cid: i for i, cid in enumerate(ids)}
+        self._fuzzy: Optional[FuzzyIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def classes_of(self, cid: str) -> FrozenSet[str]:
+        i = self.index.get(cid)
+        return self.classes[i] if i is not None else frozenset()
+
+    def display_name(self, cid: str, lang: str = "ja") -> str:
+        """ja は最初の日本語名、それ以外は先頭の英語 INCI 名。"""
+        i = self.index.get(cid)
+        if i is None:
+            return cid
+        names = self.names[i]
+        if lang == "ja":
+            for n in names:
+                if any("぀" <= c <= "ヿ" or "一" <= c <= "鿿" for c in n):
+                    return n
+        return names[0]
+
+    def lookup(self, name: str) -> Optional[str]:
+        """名前全体が辞書の見出しと一致すれば正規化ID。"""
+        node = self.trie
+        for c in normalize_name(name):
+            node = node.get(c)
+            if node is None:
+                return None
+        hit = node.get(_END)
+        return self.ids[hit[0]] if hit is not None else None
+
+    def scan(self, token: str) -> List[IngredientMatch]:
+        """成分名1つの中から辞書の見出しを最長一致で拾う（左から右へ1回走査）。
+
+        英字は単語境界（\\b 相当）を守る。日本語などの連続文字列は途中からでも一致させる
+        （「高純度レチノール」→ retinol）。TSV で = を付けた名前は先頭一致のときだけ。
+        """
+        text = normalize_name(token)
+        n = len(text)
+        out: List[IngredientMatch] = []
+        i = 0
+        while i < n:
+            if i and _word(text[i]) and _word(text[i - 1]):
+                i += 1
+                continue
+            node = self.trie
+            best = None
+            j = i
+            while j < n:
+                node = node.get(text[j])
+                if node is None:
+                    break
+                j += 1
+                hit = node.get(_END)
+                if hit is None:
+                    continue
+                if j < n and _word(text[j]) and _word(text[j - 1]):
+                    continue
+                if hit[1] and (i or (j < n and text[j].isalnum())):
+                    continue
+                best = (hit[0], j)
+            if best is None:
+                i += 1
+                continue
+            out.append(IngredientMatch(self.ids[best[0]], i, best[1], text[i:best[1]]))
+            i = best[1]
+        return out
+
+    def match_ids(self, token: str) -> List[str]:
+        return list(dict.fromkeys(m.id for m in self.scan(token)))
+
+    def fuzzy_index(self) -> FuzzyIndex:
+        """近似一致の索引は初めて使うときに作る（辞書の読み込み自体は軽いままにする）。"""
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex(_trie_keys(self.trie))
+        return self._fuzzy
+
+    def fuzzy(
+        self,
+        token: str,
+        max_distance: int = MAX_DISTANCE,
+        min_confidence: float = MIN_CONFIDENCE,
+    ) -> Optional[FuzzyMatch]:
+        """辞書に無い成分名を、いちばん近い見出しに寄せる。分量（5%）と括弧書きは外して比べる。"""
+        text = _QUANTITY.sub("", _PAREN.sub("", normalize_name(token))).strip()
+        for dist, key, idx in self.fuzzy_index().lookup(text, max_distance):
+            confidence = 1 - dist / max(len(text), len(key))
+            if confidence >= min_confidence:
+                return FuzzyMatch(self.ids[idx], text, key, dist, round(confidence, 2))
+            break
+        return None
+
+    def resolve(self, token: str, max_distance: int = MAX_DISTANCE) -> Tuple[List[str], Optional[FuzzyMatch]]:
+        """成分名1つ -> 成分ID。完全一致が無いときだけ近似一致を試す（max_distance=0 で無効）。"""
+        ids = self.match_ids(token)
+        if ids or max_distance <= 0:
+            return ids, None
+        m = self.fuzzy(token, max_distance)
+        return ([m.id], m) if m is not None else ([], None)
+
+
+# ---------------------------------------------------------
+# TSV → トライ
+# ---------------------------------------------------------
+def parse_synonyms(text: str) -> List[Tuple[str, Tuple[str, ...], Tuple[str, ...]]]:
+    rows = []
+    for line in text.splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        cid, classes, names = line.split("\t")
+        rows.append((
+            cid.strip(),
+            tuple(c.strip() for c in classes.split(",") if c.strip()),
+            tuple(n.strip() for n in names.split("|") if n.strip()),
+        ))
+    return rows
+
+
+def compile_synonyms(rows) -> IngredientDictionary:
+    """同じ見出しは先に書いた成分を優先。"""
+    trie: dict = {}
+    keys = 0
+    for idx, (_, _, names) in enumerate(rows):
+        for raw in names:
+            whole = raw.startswith(_WHOLE)
+            for key in name_variants(raw.lstrip(_WHOLE)):
+                node = trie
+                for c in key:
+                    node = node.setdefault(c, {})
+                hit = node.get(_END)
+                if hit is None:
+                    node[_END] = (idx, whole)
+                    keys += 1
+                elif hit[0] == idx and hit[1] and not whole:
+                    node[_END] = (idx, False)
+    return IngredientDictionary(
+        tuple(cid for cid, _, _ in rows),
+        tuple(frozenset(classes) for _, classes, _ in rows),
+        tuple(tuple(n.lstrip(_WHOLE) for n in names) for _, _, names in rows),
+        trie,
+        keys,
+    )
+
+
+def build_dictionary(path: Path = SYNONYMS_PATH) -> IngredientDictionary:
+    if file_version(path) is None:
+        return compile_synonyms([])
+    return compile_synonyms(parse_synonyms(Path(path).read_text(encoding="utf-8")))
+
+
+_loaded: Dict[str, Tuple[Optional[Tuple[int, int]], IngredientDictionary]] = {}
+
+
+def load_dictionary(path: Path = SYNONYMS_PATH) -> IngredientDictionary:
+    """初回呼び出しで読み込む（import 時には読まない）。TSV が更新されたら作り直す。"""
+    key = os.path.abspath(path)
+    version = file_version(path)
+    cached = _loaded.get(key)
+    hit = cached is not None and cached[0] == version
+    cache_hit("ingredient_dict", hit)
+    if hit:
+        return cached[1]
+    d = build_dictionary(path)
+    _loaded[key] = (version, d)
+    return d
+
+
+def main(argv: List[str]) -> int:
+    path = Path(argv[0]) if argv else SYNONYMS_PATH
+    rows = parse_synonyms(path.read_text(encoding="utf-8"))
+    unknown = sorted({c for _, classes, _ in rows for c in classes} - set(CLASSES))
+    seen: Dict[str, str] = {}
+    clashes = []
+    for cid, _, names in rows:
+        for raw in names:
+            key = normalize_name(raw.lstrip(_WHOLE))
+            other = seen.setdefault(key, cid)
+            if other != cid:
+                clashes.append(f"{key}: {other} / {cid}")
+    d = build_dictionary(path)
+    print(f"{path}: {len(d)}成分 / 見出し {d.keys}件（表記ゆれ込み）")
+    for c in clashes:
+        print(f"重複: {c}")
+    if unknown:
+        print(f"未定義の分類: {', '.join(unknown)}")
+    return 1 if unknown else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,276 @@
+import json
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from catalog import Product, file_version
+from ingredient_dict import CLASSES, DATA_DIR, IngredientDictionary, load_dictionary
+from metrics import cache_hit, incr
+
+# =========================================================
+# 成分の併用注意（宣言的ルール → 分類のビットマスクのグラフ）
+# - ルールは ingredient_data/conflicts.json（分類 a × 分類 b、重要度、4言語のメッセージ）
+# - 読み込み時に「分類 i と衝突する分類のビット列」adj[i] へ変換する
+# - 判定は 検出された分類のビット列 mask に対して、立っている分類ごとに adj[i] & mask を見るだけ
+#   （検出分類数 k に対して O(k^2) のビット演算。ルール数には比例しない）
+# - 成分表示1つだけでなく、ルーティンの商品をまとめて判定できる（どの商品どうしの組み合わせかも返す）
+# - カタログの商品は読み込み時に1回だけ分類ビットへ変換しておき（analyze_products）、
+#   おすすめの選定中は「今のセットの mask / multi」に商品を足したときの新しい衝突だけを見る（added）
+# =========================================================
+
+CONFLICTS_PATH = DATA_DIR / "conflicts.json"
+SEVERITIES: Tuple[str, ...] = ("high", "medium", "low")
+# おすすめで、選んだ商品との新しい衝突1件ごとの減点（high はセットに入れないので無い）。
+# 単位は「肌悩み1つに合う」ときの加点1つ分。CLI / Streamlit のスコアは加点の大きさが違うので、
+# それぞれの CONCERN_MATCH を掛けて使う（conflict_penalty）
+CONFLICT_PENALTY: Dict[str, float] = {"medium": 1.0, "low": 0.25}
+CLASS_BIT: Dict[str, int] = {c: 1 << i for i, c in enumerate(CLASSES)}
+
+
+def class_mask(classes: Iterable[str]) -> int:
+    mask = 0
+    for c in classes:
+        mask |= CLASS_BIT.get(c, 0)
+    return mask
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+@dataclass(frozen=True, slots=True)
+class IngredientProfile:
+    """成分表示1つ分の分類ビット。multi は2種類以上の成分が持っている分類。"""
+    mask: int
+    multi: int
+    ids: Tuple[str, ...]
+
+
+def profile_for_ids(d: IngredientDictionary, ids: Iterable[str]) -> IngredientProfile:
+    ids = tuple(dict.fromkeys(ids))
+    mask = multi = 0
+    for cid in ids:
+        m = class_mask(d.classes_of(cid))
+        multi |= mask & m
+        mask |= m
+    return IngredientProfile(mask, multi, ids)
+
+
+def add_profile(mask: int, multi: int, profile: IngredientProfile) -> Tuple[int, int]:
+    """セットの (mask, multi) に商品1つ分を足す。別の商品と同じ分類も multi になる。"""
+    return mask | profile.mask, multi | profile.multi | (mask & profile.mask)
+
+
+def analyze_products(products: Iterable[Product]) -> Dict[str, IngredientProfile]:
+    """商品ID → 成分表示の分類ビット。成分表示の無い商品は入れない。
+    カタログでは同じ成分名・同じ成分表示が繰り返し出るので、解析はそれぞれ1回だけ（呼び出しの間だけ覚える）。"""
+    d = load_dictionary()
+    out: Dict[str, IngredientProfile] = {}
+    ids_of: Dict[str, Tuple[str, ...]] = {}
+    by_label: Dict[Tuple[str, ...], IngredientProfile] = {}
+    for p in products:
+        label = p.ingredients
+        if not label:
+            continue
+        profile = by_label.get(label)
+        if profile is None:
+            ids: List[str] = []
+            for token in label:
+                found = ids_of.get(token)
+                if found is None:
+                    found = ids_of[token] = tuple(d.resolve(token)[0])
+                ids.extend(found)
+            profile = by_label[label] = profile_for_ids(d, ids)
+        out[p.id] = profile
+    return out
+
+
+@dataclass(frozen=True, slots=True)
+class ConflictRule:
+    id: str
+    severity: str
+    messages: Dict[str, str]
+    fallback: bool = False
+
+    def message(self, lang: str = "ja") -> str:
+        return self.messages.get(lang) or self.messages.get("en") or self.messages.get("ja", self.id)
+
+
+@dataclass(frozen=True, slots=True)
+class ConflictHit:
+    rule: ConflictRule
+    classes: Tuple[str, str]
+    sources: Tuple[str, ...] = ()     # ルーティン判定で、該当する分類を持っていた商品
+
+    @property
+    def severity(self) -> str:
+        return self.rule.severity
+
+
+def conflict_penalty(hits: Iterable[ConflictHit], concern_match: float) -> float:
+    """衝突の減点合計。concern_match は呼び出し側のスコアで肌悩み1つに合うときの加点。"""
+    return concern_match * sum(CONFLICT_PENALTY.get(h.severity, 0.0) for h in hits)
+
+
+class ConflictGraph:
+    def __init__(self, rules: Sequence[ConflictRule], pairs: Sequence[Tuple[int, int, int]]) -> None:
+        """pairs: (分類 i, 分類 j, ルールの位置)。"""
+        self.rules = tuple(rules)
+        self.adj = [0] * len(CLASSES)
+        self.edge: Dict[Tuple[int, int], int] = {}
+        for i, j, r in pairs:
+            i, j = min(i, j), max(i, j)
+            self.edge.setdefault((i, j), r)
+            self.adj[i] |= 1 << j
+            self.adj[j] |= 1 << i
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def pairs(self, mask: int, multi: int = 0) -> List[Tuple[int, int]]:
+        """mask に含まれる衝突の組 (i, j)。i == j は multi（同じ分類が2種類以上）のときだけ。"""
+        out = []
+        for i in _bits(mask):
+            low = 1 << i
+            hits = self.adj[i] & mask & ~((low << 1) - 1)
+            for j in _bits(hits):
+                out.append((i, j))
+            if self.adj[i] & multi & low:
+                out.append((i, i))
+        return out
+
+    def check(self, mask: int, multi: int = 0) -> List[ConflictHit]:
+        hits: Dict[int, ConflictHit] = {}
+        for i, j in self.pairs(mask, multi):
+            r = self.edge[(i, j)]
+            if r not in hits:
+                hits[r] = ConflictHit(self.rules[r], (CLASSES[i], CLASSES[j]))
+        return _finish(hits.values())
+
+    def check_profile(self, profile: IngredientProfile) -> List[ConflictHit]:
+        return self.check(profile.mask, profile.multi)
+
+    def added(self, mask: int, multi: int, profile: IngredientProfile) -> List[ConflictHit]:
+        """セット (mask, multi) に profile を足したときに新しくできる衝突だけ。重要度の高い順。"""
+        new_mask, new_multi = add_profile(mask, multi, profile)
+        if new_mask == mask and new_multi == multi:
+            return []
+        # profile の分類と隣接する分類が新しいセットに無ければビット演算だけで終わる
+        touched = profile.mask | (new_multi & ~multi)
+        if not any(self.adj[i] & new_mask for i in _bits(touched)):
+            return []
+        before = set(self.pairs(mask, multi))
+        hits: Dict[int, ConflictHit] = {}
+        for i, j in self.pairs(new_mask, new_multi):
+            r = self.edge[(i, j)]
+            if (i, j) not in before and r not in hits:
+                hits[r] = ConflictHit(self.rules[r], (CLASSES[i], CLASSES[j]))
+        return _finish(hits.values())
+
+    def check_routine(self, items: Sequence[Tuple[str, IngredientProfile]]) -> List[ConflictHit]:
+        """ルーティン（商品名, 分類ビット）の組み合わせ全体で判定する。同じ分類が別の商品にあれば multi 扱い。"""
+        mask = multi = 0
+        for _, p in items:
+            mask, multi = add_profile(mask, multi, p)
+        hits: Dict[int, ConflictHit] = {}
+        for i, j in self.pairs(mask, multi):
+            r = self.edge[(i, j)]
+            if r in hits:
+                continue
+            pair = (1 << i) | (1 << j)
+            sources = tuple(name for name, p in items if p.mask & pair)
+            hits[r] = ConflictHit(self.rules[r], (CLASSES[i], CLASSES[j]), sources)
+        return _finish(hits.values())
+
+
+def _finish(hits: Iterable[ConflictHit]) -> List[ConflictHit]:
+    hits = list(hits)
+    if any(not h.rule.fallback for h in hits):
+        hits = [h for h in hits if not h.rule.fallback]
+    hits.sort(key=lambda h: SEVERITIES.index(h.severity))
+    return hits
+
+
+# ---------------------------------------------------------
+# conflicts.json → グラフ
+# ---------------------------------------------------------
+# ルールファイルの読み込み・検証の失敗（JSON の書き間違い・キーの欠け・未定義の分類 / 重要度など）
+RULE_ERRORS = (OSError, ValueError, KeyError, TypeError)
+
+
+def compile_rules(data: dict) -> ConflictGraph:
+    if not isinstance(data, dict) or not isinstance(data.get("rules", []), list):
+        raise ValueError('expected {"rules": [...]}')
+    rules: List[ConflictRule] = []
+    pairs: List[Tuple[int, int, int]] = []
+    for row in data.get("rules", []):
+        if not isinstance(row, dict):
+            raise ValueError(f"rule must be an object: {row!r}")
+        severity = row.get("severity", "low")
+        if severity not in SEVERITIES:
+            raise ValueError(f"{row.get('id')}: unknown severity {severity!r}")
+        unknown = [c for c in [*row["a"], *row["b"]] if c not in CLASS_BIT]
+        if unknown:
+            raise ValueError(f"{row.get('id')}: unknown class {', '.join(unknown)}")
+        r = len(rules)
+        rules.append(ConflictRule(row["id"], severity, dict(row.get("message", {})), bool(row.get("fallback", False))))
+        for a in row["a"]:
+            for b in row["b"]:
+                pairs.append((CLASSES.index(a), CLASSES.index(b), r))
+    return ConflictGraph(rules, pairs)
+
+
+_loaded: Dict[str, Tuple[Optional[Tuple[int, int]], ConflictGraph]] = {}
+_errors: Dict[str, str] = {}
+
+
+def load_conflict_graph(path: Path = CONFLICTS_PATH) -> ConflictGraph:
+    """ルールファイルが更新されたら作り直す。ファイルが無ければルール無し。
+    壊れた編集は反映せず、直前に読めたグラフ（初回なら空）を使い続ける（理由は rules_error）。"""
+    key = os.path.abspath(path)
+    version = file_version(path)
+    cached = _loaded.get(key)
+    hit = cached is not None and cached[0] == version
+    cache_hit("conflict_rules", hit)
+    if hit:
+        return cached[1]
+    graph = ConflictGraph((), ())
+    _errors.pop(key, None)
+    if version is not None:
+        try:
+            graph = compile_rules(json.loads(Path(path).read_text(encoding="utf-8")))
+        except RULE_ERRORS as e:
+            if cached is not None:
+                graph = cached[1]
+            _errors[key] = f"{Path(path).name}: {type(e).__name__}: {e}"
+            incr("conflict_rule_loads", result="error")
+        else:
+            incr("conflict_rule_loads", result="ok")
+    # 失敗した version も覚えておき、ファイルが変わるまで読み直さない
+    _loaded[key] = (version, graph)
+    return graph
+
+
+def rules_error(path: Path = CONFLICTS_PATH) -> Optional[str]:
+    """直近のルールファイルの編集が読み込めなかったときの理由（前回のルールで判定中）。"""
+    return _errors.get(os.path.abspath(path))
+
+
+def main(argv: List[str]) -> int:
+    path = Path(argv[0]) if argv else CONFLICTS_PATH
+    try:
+        graph = compile_rules(json.loads(path.read_text(encoding="utf-8")))
+    except RULE_ERRORS as e:
+        print(f"{path}: {type(e).__name__}: {e}")
+        return 1
+    print(f"{path}: ルール {len(graph)}件 / 分類の組 {len(graph.edge)}件")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
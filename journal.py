@@ -0,0 +1,125 @@
+import re
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from catalog import intern_tuple
+
+# =========================================================
+# 肌日記レコード（CLI / Streamlit 共通）
+# - beauty_agent.py の journal.jsonl 行: condition_summary / symptoms(list) / products_used(list) / stress_level_1to5
+# - app.py の skin_diary.json 行: symptoms(文字列) / used_items(文字列) / stress / memo / lang
+# =========================================================
+
+_SPLIT_RE = re.compile(r"[,\n/、，]+")
+# 睡眠時間は 0.5 刻みなど値の種類が少ないので float オブジェクトを共有する
+_shared_floats: Dict[float, float] = {}
+
+
+@dataclass(slots=True, eq=False)
+class JournalEntry:
+    id: str
+    created_at: str
+    date: str
+    condition_summary: str
+    symptoms: Tuple[str, ...]
+    products_used: Tuple[str, ...]
+    sleep_hours: Optional[float]
+    stress: Optional[int]
+    memo: Optional[str]
+    lang: str
+
+
+def split_items(value: Any) -> Tuple[str, ...]:
+    if isinstance(value, (list, tuple)):
+        items = [str(v).strip() for v in value]
+    elif value:
+        items = [p.strip() for p in _SPLIT_RE.split(str(value))]
+    else:
+        return ()
+    return intern_tuple(tuple(dict.fromkeys(p for p in items if p)))
+
+
+def _as_float(value: Any) -> Optional[float]:
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    try:
+        f = float(value)
+    except (TypeError, ValueError):
+        return None
+    return _shared_floats.setdefault(f, f)
+
+
+def _as_int(value: Any) -> Optional[int]:
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def entry_from_cli_row(row: Dict[str, Any]) -> JournalEntry:
+    return JournalEntry(
+        id=str(row.get("id", "")),
+        created_at=str(row.get("created_at", "")),
+        date=str(row.get("date", "")),
+        condition_summary=str(row.get("condition_summary", "記録")),
+        symptoms=split_items(row.get("symptoms")),
+        products_used=split_items(row.get("products_used")),
+        sleep_hours=_as_float(row.get("sleep_hours")),
+        stress=_as_int(row.get("stress_level_1to5")),
+        memo=row.get("memo"),
+        lang="ja",
+    )
+
+
+def entry_from_app_row(row: Dict[str, Any]) -> JournalEntry:
+    return JournalEntry(
+        id=str(row.get("id", "")),
+        created_at=str(row.get("created_at", "")),
+        date=str(row.get("date", "")),
+        condition_summary=str(row.get("condition_summary", "")),
+        symptoms=split_items(row.get("symptoms")),
+        products_used=split_items(row.get("used_items")),
+        sleep_hours=_as_float(row.get("sleep_hours")),
+        stress=_as_int(row.get("stress")),
+        memo=row.get("memo") or None,
+        lang=sys.intern(str(row.get("lang", "ja"))),
+    )
+
+
+def entry_to_cli_row(e: JournalEntry) -> Dict[str, Any]:
+    return {
+        "id": e.id,
+        "created_at": e.created_at,
+        "date": e.date,
+        "condition_summary": e.condition_summary,
+        "symptoms": list(e.symptoms),
+        "products_used": list(e.products_used),
+        "sleep_hours": e.sleep_hours,
+        "stress_level_1to5": e.stress,
+        "memo": e.memo,
+    }
+
+
+def entry_to_app_row(e: JournalEntry) -> Dict[str, Any]:
+    row: Dict[str, Any] = {
+        "date": e.date,
+        "symptoms": ", ".join(e.symptoms),
+        "sleep_hours": e.sleep_hours,
+        "stress": e.stress,
+        "used_items": " / ".join(e.products_used),
+        "memo": e.memo or "",
+        "lang": e.lang,
+        "created_at": e.created_at,
+    }
+    if e.id:
+        row["id"] = e.id
+    if e.condition_summary:
+        row["condition_summary"] = e.condition_summary
+    return row
+
+
+def entry_sort_key(e: JournalEntry) -> Tuple[str, str]:
+    return (e.date, e.created_at)
@@ -0,0 +1,369 @@
+import json
+import math
+import os
+import threading
+from array import array
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from catalog import file_version
+from journal import JournalEntry, entry_from_cli_row
+
+# =========================================================
+# 肌日記の分析（CLI「傾向」/ Streamlit 傾向タブ 共通）
+# - 症状の同時発生（共起）回数
+# - 直近 7日 / 30日 の症状出現率（記録のある日を分母にする）
+# - 睡眠・ストレスと「翌日以降の症状」のラグ相関（lag 1〜3日）
+#
+# JournalEntry を1件ずつ JournalColumns に追加していく（列 + 症状ビットマスク）。
+# 共起・日別集計は追加時に更新するので、journal.jsonl は前回の続きの行だけ読めばよい。
+# 結果はデータの version ごとにキャッシュする。
+# =========================================================
+
+WINDOWS = (7, 30)
+LAGS = (1, 2, 3)
+ANY_SYMPTOM = "*"          # 「いずれかの症状」を表すキー
+_MIN_PAIRS = 5             # 相関を出す最小ペア数
+
+_day_cache: Dict[str, int] = {}
+
+
+def day_number(value: str) -> Optional[int]:
+    """'YYYY-MM-DD' -> 日の通し番号（不正な日付は None）。"""
+    n = _day_cache.get(value)
+    if n is None:
+        try:
+            n = date.fromisoformat(value[:10]).toordinal()
+        except (TypeError, ValueError):
+            return None
+        _day_cache[value] = n
+    return n
+
+
+class JournalColumns:
+    """日記の列表現。症状は語彙ID のビットマスクで持つ。"""
+
+    __slots__ = (
+        "names", "vocab", "day", "mask", "sleep", "stress", "mask_counts",
+        "day_mask", "day_sleep", "day_stress",
+    )
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self.day = array("i")
+        self.mask: List[int] = []
+        self.sleep = array("d")      # 未記録は NaN
+        self.stress = array("d")
+        self.mask_counts: Dict[int, int] = {}
+        # 日別: 症状の OR / 睡眠・ストレスの (合計, 件数)
+        self.day_mask: Dict[int, int] = {}
+        self.day_sleep: Dict[int, Tuple[float, int]] = {}
+        self.day_stress: Dict[int, Tuple[float, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.mask)
+
+    def _bit(self, name: str) -> int:
+        i = self.vocab.get(name)
+        if i is None:
+            i = self.vocab[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def extend(self, entries: Iterable[JournalEntry]) -> None:
+        nan = math.nan
+        for e in entries:
+            d = day_number(e.date)
+            if d is None:
+                continue
+            m = 0
+            for s in e.symptoms:
+                m |= 1 << self._bit(s)
+            self.day.append(d)
+            self.mask.append(m)
+            self.sleep.append(nan if e.sleep_hours is None else e.sleep_hours)
+            self.stress.append(nan if e.stress is None else float(e.stress))
+
+            if m:
+                self.mask_counts[m] = self.mask_counts.get(m, 0) + 1
+            self.day_mask[d] = self.day_mask.get(d, 0) | m
+            if e.sleep_hours is not None:
+                total, n = self.day_sleep.get(d, (0.0, 0))
+                self.day_sleep[d] = (total + e.sleep_hours, n + 1)
+            if e.stress is not None:
+                total, n = self.day_stress.get(d, (0.0, 0))
+                self.day_stress[d] = (total + e.stress, n + 1)
+
+    def cooccurrence(self) -> Dict[Tuple[str, str], int]:
+        """同じ日記に一緒に書かれた症状ペアの回数。同じ組み合わせはまとめて数える。"""
+        pairs: Dict[Tuple[int, int], int] = {}
+        for m, count in self.mask_counts.items():
+            if m & (m - 1) == 0:
+                continue
+            bits = _bits(m)
+            for i, a in enumerate(bits):
+                for b in bits[i + 1:]:
+                    pairs[(a, b)] = pairs.get((a, b), 0) + count
+        names = self.names
+        return {(names[a], names[b]): c for (a, b), c in pairs.items()}
+
+    def symptom_counts(self) -> Dict[str, int]:
+        counts = [0] * len(self.names)
+        for m, count in self.mask_counts.items():
+            for b in _bits(m):
+                counts[b] += count
+        return {self.names[i]: c for i, c in enumerate(counts) if c}
+
+
+def _bits(m: int) -> List[int]:
+    out = []
+    i = 0
+    while m:
+        if m & 1:
+            out.append(i)
+        m >>= 1
+        i += 1
+    return out
+
+
+@dataclass(frozen=True, slots=True)
+class DiaryAnalytics:
+    entries: int
+    days: int
+    first_day: Optional[str]
+    last_day: Optional[str]
+    symptom_counts: Tuple[Tuple[str, int], ...]                   # 多い順
+    cooccurrence: Tuple[Tuple[str, str, int], ...]                # 多い順
+    rolling: Dict[int, Tuple[Tuple[str, float], ...]]             # window -> ((症状, 率), ...)
+    rolling_rows: Tuple[Tuple[str, float, float], ...]            # (日付, 7日率, 30日率) いずれかの症状
+    lagged: Tuple[Tuple[str, int, str, float, int], ...]          # (sleep|stress, lag, 症状, r, n) |r| 順
+
+
+def _pearson(xs: List[float], ys: List[float]) -> Optional[float]:
+    n = len(xs)
+    if n < _MIN_PAIRS:
+        return None
+    mx = sum(xs) / n
+    my = sum(ys) / n
+    sxx = sum((x - mx) ** 2 for x in xs)
+    syy = sum((y - my) ** 2 for y in ys)
+    if sxx == 0 or syy == 0:
+        return None
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / math.sqrt(sxx * syy)
+
+
+def analyze(cols: JournalColumns, top: int = 5) -> DiaryAnalytics:
+    day_mask = cols.day_mask
+    if not day_mask:
+        return DiaryAnalytics(len(cols), 0, None, None, (), (), {w: () for w in WINDOWS}, (), ())
+
+    first, last = min(day_mask), max(day_mask)
+    span = last - first + 1
+    counts = sorted(cols.symptom_counts().items(), key=lambda x: x[1], reverse=True)
+    top_names = [name for name, _ in counts[:top]]
+    top_bits = [(name, 1 << cols.vocab[name]) for name in top_names]
+
+    # 暦日ごとの累積和: logged[i] = 記録のある日数, hits[name][i] = その症状が出た日数
+    logged = array("i", [0]) * (span + 1)
+    any_hits = array("i", [0]) * (span + 1)
+    hits = {name: array("i", [0]) * (span + 1) for name in top_names}
+    for d, m in day_mask.items():
+        i = d - first + 1
+        logged[i] = 1
+        if m:
+            any_hits[i] = 1
+        for name, bit in top_bits:
+            if m & bit:
+                hits[name][i] = 1
+    for arr in (logged, any_hits, *hits.values()):
+        acc = 0
+        for i in range(1, span + 1):
+            acc += arr[i]
+            arr[i] = acc
+
+    def rate(arr: array, end: int, window: int) -> Optional[float]:
+        start = max(0, end - window)
+        n = logged[end] - logged[start]
+        return (arr[end] - arr[start]) / n if n else None
+
+    rolling = {}
+    for w in WINDOWS:
+        rates = []
+        for name in top_names:
+            r = rate(hits[name], span, w)
+            if r:
+                rates.append((name, round(r, 3)))
+        rolling[w] = tuple(sorted(rates, key=lambda x: x[1], reverse=True))
+
+    rolling_rows = []
+    for d in sorted(day_mask):
+        i = d - first + 1
+        r7, r30 = rate(any_hits, i, 7), rate(any_hits, i, 30)
+        rolling_rows.append((date.fromordinal(d).isoformat(), round(r7 or 0.0, 3), round(r30 or 0.0, 3)))
+
+    # ラグ相関: 日 d の睡眠/ストレス と 日 d+lag に症状が出たか（0/1）
+    lagged = []
+    targets = [(ANY_SYMPTOM, -1)] + top_bits[:3]
+    for factor, series in (("sleep", cols.day_sleep), ("stress", cols.day_stress)):
+        for lag in LAGS:
+            pairs = [(total / n, day_mask[d + lag]) for d, (total, n) in series.items() if d + lag in day_mask]
+            xs = [x for x, _ in pairs]
+            for name, bit in targets:
+                ys = [1.0 if m & bit else 0.0 for _, m in pairs]
+                r = _pearson(xs, ys)
+                if r is not None:
+                    lagged.append((factor, lag, name, round(r, 3), len(pairs)))
+    lagged.sort(key=lambda x: abs(x[3]), reverse=True)
+
+    pairs_sorted = sorted(cols.cooccurrence().items(), key=lambda x: x[1], reverse=True)[:top]
+    return DiaryAnalytics(
+        entries=len(cols),
+        days=len(day_mask),
+        first_day=date.fromordinal(first).isoformat(),
+        last_day=date.fromordinal(last).isoformat(),
+        symptom_counts=tuple(counts),
+        cooccurrence=tuple((a, b, c) for (a, b), c in pairs_sorted),
+        rolling=rolling,
+        rolling_rows=tuple(rolling_rows),
+        lagged=tuple(lagged),
+    )
+
+
+# ---------------------------------------------------------
+# キャッシュ付きの入口
+# ---------------------------------------------------------
+_path_locks: Dict[str, threading.Lock] = {}
+_path_locks_guard = threading.Lock()
+
+
+def path_lock(key: str) -> threading.Lock:
+    """journal.jsonl（絶対パス）ごとのロック。JsonlTail の取り込みと、それを持つキャッシュの
+    取得・作り直しをこの中で行う（スレッドから同時に read_new すると行を二重に読み、offset も進みすぎる）。"""
+    lock = _path_locks.get(key)
+    if lock is None:
+        with _path_locks_guard:
+            lock = _path_locks.setdefault(key, threading.Lock())
+    return lock
+
+
+_FINGERPRINT_BYTES = 256   # 読み済み部分の先頭 / 末尾から比べるバイト数
+
+
+class JsonlTail:
+    """追記専用の journal.jsonl を前回読んだ位置の続きから読む。
+
+    読み済み部分（offset まで）の先頭・末尾のバイト列と inode を覚えておき、
+    ファイルが置き換えられた / 書き換えられた（短くならなくても）ときは先頭から読み直す。"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.offset = 0
+        self.version: Optional[Tuple[int, int]] = None
+        self.inode: Optional[Tuple[int, int]] = None
+        self.fingerprint = (b"", b"")
+
+    def changed(self) -> bool:
+        return file_version(self.path) != self.version
+
+    def _fingerprint(self, f, offset: int) -> Tuple[bytes, bytes]:
+        f.seek(0)
+        head = f.read(min(offset, _FINGERPRINT_BYTES))
+        f.seek(max(0, offset - _FINGERPRINT_BYTES))
+        tail = f.read(min(offset, _FINGERPRINT_BYTES))
+        return head, tail
+
+    def read_new(self) -> Tuple[bool, List[JournalEntry]]:
+        """(reset, entries)。reset=True の時は先頭から読み直したので、呼び出し側は状態を作り直す。"""
+        version = file_version(self.path)
+        entries: List[JournalEntry] = []
+        if version is None:   # 消された
+            reset = self.offset > 0
+            self.offset, self.inode, self.fingerprint = 0, None, (b"", b"")
+            self.version = None
+            return reset, entries
+        with self.path.open("rb") as f:
+            st = os.fstat(f.fileno())
+            inode = (st.st_dev, st.st_ino)
+            reset = self.offset > 0 and (
+                st.st_size < self.offset                       # 短くなった
+                or inode != self.inode                         # 別のファイルに置き換えられた
+                or self._fingerprint(f, self.offset) != self.fingerprint   # 読み済みの行が書き換えられた
+            )
+            if reset:
+                self.offset = 0
+            f.seek(self.offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break   # 書き込み途中の行は次回
+                self.offset += len(raw)
+                line = raw.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                if isinstance(row, dict):
+                    entries.append(entry_from_cli_row(row))
+            self.inode = inode
+            self.fingerprint = self._fingerprint(f, self.offset)
+        self.version = version
+        return reset, entries
+
+
+class JsonlAnalytics:
+    """journal.jsonl 用。新しく追記された行だけ JournalColumns に足して再集計する。"""
+
+    def __init__(self, path: Path) -> None:
+        self.tail = JsonlTail(path)
+        self.cols = JournalColumns()
+        self.result: Optional[DiaryAnalytics] = None
+
+    def get(self) -> DiaryAnalytics:
+        if self.result is not None and not self.tail.changed():
+            return self.result
+        reset, entries = self.tail.read_new()
+        if reset:
+            self.cols = JournalColumns()
+        self.cols.extend(entries)
+        self.result = analyze(self.cols)
+        return self.result
+
+
+_jsonl: Dict[str, JsonlAnalytics] = {}
+
+
+def analytics_for_jsonl(path: Path) -> DiaryAnalytics:
+    key = os.path.abspath(path)
+    with path_lock(key):
+        state = _jsonl.get(key)
+        if state is None:
+            state = _jsonl[key] = JsonlAnalytics(Path(path))
+        return state.get()
+
+
+def format_analytics(a: DiaryAnalytics) -> str:
+    """CLI 表示用（日本語）。"""
+    if not a.days:
+        return "分析できる日記データはまだありません。"
+    lines = [f"日記分析（{a.first_day}〜{a.last_day} / {a.days}日 / {a.entries}件）:"]
+    for w in WINDOWS:
+        rates = a.rolling.get(w) or ()
+        text = " / ".join(f"{name} {rate * 100:.0f}%" for name, rate in rates) or "なし"
+        lines.append(f"- 直近{w}日の症状出現率: {text}")
+    if a.cooccurrence:
+        lines.append("- 一緒に出やすい症状: " + " / ".join(f"{x}+{y}({c})" for x, y, c in a.cooccurrence[:3]))
+    shown = [x for x in a.lagged if abs(x[3]) >= 0.3][:3]
+    for factor, lag, name, r, n in shown:
+        if factor == "sleep":
+            cause = "睡眠が長い日" if r > 0 else "睡眠が短い日"
+        else:
+            cause = "ストレスが高い日" if r > 0 else "ストレスが低い日"
+        target = "何らかの症状" if name == ANY_SYMPTOM else name
+        lines.append(f"- {cause}の{lag}日後に{target}が出やすい傾向（r={r:+.2f}, n={n}）")
+    if not shown:
+        lines.append("- 睡眠・ストレスとの目立った関連: まだ見えません（記録が増えると分かりやすくなります）")
+    return "\n".join(lines)
@@ -0,0 +1,137 @@
+import os
+import unicodedata
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from journal import JournalEntry, entry_sort_key
+from journal_analytics import JsonlTail, path_lock
+
+# =========================================================
+# 肌日記の全文検索（condition_summary / memo / symptoms / 使用アイテム）
+# - 日本語・韓国語・中国語は単語区切りが無いので文字 n-gram（1文字 + 2文字）で転置インデックスを作る
+# - 検索語の 2-gram の posting を小さい順に突き合わせて候補を絞り、最後に部分一致で確認する
+# - posting は追加順の文書ID（array('I')）なので、保存のたびに末尾へ足すだけ
+# =========================================================
+
+
+def normalize(text: str) -> str:
+    """全角/半角・大文字小文字の揺れを吸収する（ＳＡＵＮＡ → sauna）。"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def entry_text(e: JournalEntry) -> str:
+    parts = [e.condition_summary, e.memo or "", *e.symptoms, *e.products_used]
+    return normalize("\n".join(p for p in parts if p))
+
+
+def grams(text: str) -> set:
+    """1-gram と 2-gram。空白・改行をまたぐ 2-gram は作らない。"""
+    out = set()
+    for piece in text.split():
+        out.update(piece)
+        out.update(piece[i:i + 2] for i in range(len(piece) - 1))
+    return out
+
+
+def query_grams(term: str) -> List[str]:
+    if len(term) == 1:
+        return [term]
+    return list(dict.fromkeys(term[i:i + 2] for i in range(len(term) - 1)))
+
+
+class JournalSearchIndex:
+    def __init__(self) -> None:
+        self.entries: List[JournalEntry] = []
+        self.texts: List[str] = []
+        self.postings: Dict[str, array] = {}
+        # 追加順が日付順（entry_sort_key の昇順）のままなら、新しい方から limit 件で打ち切れる。
+        # 遡った日付を add() すると False になるので、持ち主は sorted_copy() などで入れ直す
+        self.ordered = True
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, entry: JournalEntry) -> None:
+        doc = len(self.entries)
+        text = entry_text(entry)
+        if self.ordered and self.entries and entry_sort_key(entry) < entry_sort_key(self.entries[-1]):
+            self.ordered = False
+        self.entries.append(entry)
+        self.texts.append(text)
+        postings = self.postings
+        for g in grams(text):
+            p = postings.get(g)
+            if p is None:
+                p = postings[g] = array("I")
+            p.append(doc)
+
+    def extend(self, entries: Iterable[JournalEntry]) -> None:
+        for e in entries:
+            self.add(e)
+
+    def sorted_copy(self) -> "JournalSearchIndex":
+        """日付順に入れ直した索引（ordered=True に戻る）。"""
+        index = JournalSearchIndex()
+        index.extend(sorted(self.entries, key=entry_sort_key))
+        return index
+
+    def search(self, query: str, limit: Optional[int] = 50) -> List[JournalEntry]:
+        """空白区切りの語をすべて含む日記（新しい順）。"""
+        terms = [normalize(t) for t in query.split()]
+        terms = [t for t in terms if t]
+        if not terms:
+            return []
+        lists = []
+        for term in terms:
+            for g in query_grams(term):
+                p = self.postings.get(g)
+                if p is None:
+                    return []
+                lists.append(p)
+        lists.sort(key=len)
+        smallest, others = lists[0], lists[1:]
+
+        texts = self.texts
+        entries = self.entries
+        hits = []
+        for doc in reversed(smallest):
+            if all(_contains(p, doc) for p in others) and all(t in texts[doc] for t in terms):
+                hits.append(entries[doc])
+                if self.ordered and limit is not None and len(hits) >= limit:
+                    return hits
+        if not self.ordered:
+            hits.sort(key=entry_sort_key, reverse=True)
+        return hits if limit is None else hits[:limit]
+
+
+def _contains(posting: array, doc: int) -> bool:
+    i = bisect_left(posting, doc)
+    return i < len(posting) and posting[i] == doc
+
+
+# ---------------------------------------------------------
+# journal.jsonl 用（追記された行だけ取り込む）
+# ---------------------------------------------------------
+_jsonl: Dict[str, Tuple[JsonlTail, JournalSearchIndex]] = {}
+
+
+def search_index_for_jsonl(path: Path) -> JournalSearchIndex:
+    key = os.path.abspath(path)
+    with path_lock(key):
+        state = _jsonl.get(key)
+        if state is None:
+            state = _jsonl[key] = (JsonlTail(Path(path)), JournalSearchIndex())
+        tail, index = state
+        if tail.changed():
+            reset, entries = tail.read_new()
+            if reset:
+                index = JournalSearchIndex()
+                _jsonl[key] = (tail, index)
+            index.extend(entries)
+            if not index.ordered:
+                # 遡った日付の行が追記された: 1回だけ日付順に入れ直す（以後の検索は limit で打ち切れる）
+                index = index.sorted_copy()
+                _jsonl[key] = (tail, index)
+        return index
@@ -0,0 +1,237 @@
+import functools
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+# =========================================================
+# 関数ごとの処理時間ヒストグラム（CLI / Streamlit 共通の計測レイヤー）
+# - @timed() を付けた関数 / with timer("名前") の区間について、呼び出し回数と所要時間を記録する
+# - HDR 風の対数バケット: 2のべき乗ごとに16分割（相対誤差 約3%）。µs 単位で 1 µs 〜 数日まで固定長の配列
+# - BEAUTY_AGENT_METRICS=0 のときは import 時にデコレータが元の関数をそのまま返す（オーバーヘッド無し）
+# - 値の加算はロック無し（スレッド間で稀に1件取りこぼしても統計としては問題ない）
+# - カウンタ（incr / cache_hit）と、取得時に値を計算するゲージ（register_gauge）も同じレジストリに持つ
+#   （metrics_exporter.py が Prometheus のテキスト形式で公開する）
+# =========================================================
+
+ENABLED = os.environ.get("BEAUTY_AGENT_METRICS", "1").strip().lower() not in {"0", "off", "false", "no"}
+
+_SUB_BITS = 5
+_SUB = 1 << _SUB_BITS          # 32 未満はそのままの値がバケット
+_HALF = _SUB >> 1
+_BUCKETS = _HALF * 64 + _HALF  # 2**63 µs まで
+_NULL = nullcontext()
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def bucket_index(us: int) -> int:
+    if us < _SUB:
+        return max(us, 0)
+    shift = us.bit_length() - _SUB_BITS
+    return shift * _HALF + (us >> shift)
+
+
+def bucket_value(index: int) -> int:
+    """バケットの下限（µs）。"""
+    if index < _SUB:
+        return index
+    shift = index // _HALF - 1
+    return (index % _HALF + _HALF) << shift
+
+
+class Histogram:
+    __slots__ = ("name", "count", "total_us", "min_us", "max_us", "counts")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.clear()
+
+    def clear(self) -> None:
+        self.count = 0
+        self.total_us = 0
+        self.min_us = 0
+        self.max_us = 0
+        self.counts = array("Q", bytes(8 * _BUCKETS))
+
+    def record_us(self, us: int) -> None:
+        if self.count == 0 or us < self.min_us:
+            self.min_us = us
+        if us > self.max_us:
+            self.max_us = us
+        self.count += 1
+        self.total_us += us
+        self.counts[bucket_index(us)] += 1
+
+    def percentile(self, q: float) -> int:
+        """q (0〜100) パーセンタイルのバケット下限（µs）。最大値は超えない。"""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c:
+                seen += c
+                if seen >= rank:
+                    return min(max(bucket_value(i), self.min_us), self.max_us)
+        return self.max_us
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_us / 1000, 3),
+            "mean_ms": round(self.total_us / self.count / 1000, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(50) / 1000,
+            "p90_ms": self.percentile(90) / 1000,
+            "p99_ms": self.percentile(99) / 1000,
+            "max_ms": self.max_us / 1000,
+        }
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hists: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, LabelKey], Counter] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[LabelKey, float]]]] = {}
+
+    def histogram(self, name: str) -> Histogram:
+        h = self._hists.get(name)
+        if h is None:
+            with self._lock:
+                h = self._hists.setdefault(name, Histogram(name))
+        return h
+
+    def counter(self, name: str, labels: LabelKey = ()) -> Counter:
+        key = (name, labels)
+        c = self._counters.get(key)
+        if c is None:
+            with self._lock:
+                c = self._counters.setdefault(key, Counter())
+        return c
+
+    def counters(self) -> Dict[Tuple[str, LabelKey], int]:
+        return {key: c.value for key, c in list(self._counters.items())}
+
+    def register_gauge(self, name: str, help_text: str, fn: Callable[[], Dict[LabelKey, float]]) -> None:
+        self._gauges[name] = (help_text, fn)
+
+    def gauges(self) -> Dict[str, Tuple[str, Dict[LabelKey, float]]]:
+        """ゲージは取得時に計算する。失敗したゲージは出さない。"""
+        out = {}
+        for name, (help_text, fn) in list(self._gauges.items()):
+            try:
+                out[name] = (help_text, fn())
+            except Exception:
+                continue
+        return out
+
+    def histograms(self) -> List[Histogram]:
+        return [h for h in list(self._hists.values()) if h.count]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """呼ばれたものだけ、合計時間の長い順。"""
+        hists = sorted((h for h in list(self._hists.values()) if h.count), key=lambda h: -h.total_us)
+        return {h.name: h.summary() for h in hists}
+
+    def reset(self) -> None:
+        # デコレータが掴んでいるヒストグラムはそのまま、中身だけ消す
+        with self._lock:
+            for h in self._hists.values():
+                h.clear()
+            for c in self._counters.values():
+                c.value = 0
+
+
+REGISTRY = Registry()
+
+
+def timed(name: Optional[str] = None) -> Callable[[F], F]:
+    """関数の所要時間を記録するデコレータ。名前を省略すると関数名。"""
+    def deco(fn: F) -> F:
+        if not ENABLED:
+            return fn
+        hist = REGISTRY.histogram(name or fn.__name__)
+        perf = time.perf_counter_ns
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            t0 = perf()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.record_us((perf() - t0) // 1000)
+        return wrapper  # type: ignore[return-value]
+    return deco
+
+
+def timer(name: str):
+    """区間の所要時間を記録するコンテキストマネージャ。無効時は共有の no-op。"""
+    if not ENABLED:
+        return _NULL
+    return _timed(name)
+
+
+@contextmanager
+def _timed(name: str) -> Iterator[None]:
+    t0 = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        REGISTRY.histogram(name).record_us((time.perf_counter_ns() - t0) // 1000)
+
+
+def incr(name: str, n: int = 1, **labels: str) -> None:
+    """カウンタを n 増やす（例: incr("requests", intent="ingredient_check")）。"""
+    if ENABLED:
+        REGISTRY.counter(name, tuple(sorted(labels.items()))).value += n
+
+
+def cache_hit(cache: str, hit: bool) -> None:
+    """キャッシュの参照1回分。ヒット率は exporter が hit / (hit + miss) で出す。"""
+    if ENABLED:
+        REGISTRY.counter("cache_requests", (("cache", cache), ("result", "hit" if hit else "miss"))).value += 1
+
+
+def register_gauge(name: str, help_text: str, fn: Callable[[], Any]) -> None:
+    """取得時に呼ばれるゲージ。fn は数値、または {ラベルのタプル: 数値} を返す。"""
+    def values() -> Dict[LabelKey, float]:
+        v = fn()
+        return v if isinstance(v, dict) else {(): float(v)}
+    REGISTRY.register_gauge(name, help_text, values)
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return REGISTRY.snapshot()
+
+
+def reset() -> None:
+    REGISTRY.reset()
+
+
+def format_snapshot(snap: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    snap = snapshot() if snap is None else snap
+    if not ENABLED:
+        return "計測は無効です（BEAUTY_AGENT_METRICS=0）。"
+    if not snap:
+        return "まだ計測された呼び出しはありません。"
+    width = max(len(name) for name in snap)
+    rows: List[Tuple[str, ...]] = [("name".ljust(width), "calls", "total ms", "mean", "p50", "p90", "p99", "max")]
+    for name, s in snap.items():
+        rows.append((
+            name.ljust(width), str(s["count"]), f"{s['total_ms']:.1f}", f"{s['mean_ms']:.2f}",
+            f"{s['p50_ms']:.2f}", f"{s['p90_ms']:.2f}", f"{s['p99_ms']:.2f}", f"{s['max_ms']:.2f}",
+        ))
+    return "\n".join(r[0] + "".join(c.rjust(10) for c in r[1:]) for r in rows)
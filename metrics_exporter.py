@@ -0,0 +1,120 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from metrics import REGISTRY, LabelKey, Registry
+
+# =========================================================
+# metrics のレジストリを Prometheus のテキスト形式（0.0.4）で公開する（標準ライブラリのみ・任意）
+# - CLI: python beauty_agent.py --metrics-port 9108 / Streamlit: 環境変数 BEAUTY_AGENT_METRICS_PORT=9108
+# - GET /metrics だけに応答する。既定は 127.0.0.1 のみで待ち受け（BEAUTY_AGENT_METRICS_HOST で変更）
+# - 計測側はロック無しで加算し、ここでは取得時に値を読むだけなので、リクエスト処理の速度には影響しない
+# =========================================================
+
+PREFIX = "beauty_agent_"
+PORT_ENV = "BEAUTY_AGENT_METRICS_PORT"
+HOST_ENV = "BEAUTY_AGENT_METRICS_HOST"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+QUANTILES = (0.5, 0.9, 0.99)
+
+_servers: Dict[Tuple[str, int], ThreadingHTTPServer] = {}
+_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels) + "}"
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+def render(registry: Registry = REGISTRY) -> str:
+    lines: List[str] = []
+
+    # カウンタ（名前ごとにまとめる）
+    by_name: Dict[str, List[Tuple[LabelKey, int]]] = {}
+    for (name, labels), value in sorted(registry.counters().items()):
+        by_name.setdefault(name, []).append((labels, value))
+    for name, series in by_name.items():
+        metric = f"{PREFIX}{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for labels, value in series:
+            lines.append(f"{metric}{_labels(labels)} {value}")
+
+    # キャッシュのヒット率（cache_requests の hit / miss から）
+    ratios: Dict[str, List[int]] = {}
+    for labels, value in by_name.get("cache_requests", []):
+        d = dict(labels)
+        pair = ratios.setdefault(d.get("cache", ""), [0, 0])
+        pair[0 if d.get("result") == "hit" else 1] += value
+    if ratios:
+        metric = f"{PREFIX}cache_hit_ratio"
+        lines.append(f"# HELP {metric} Cache hits / lookups since start.")
+        lines.append(f"# TYPE {metric} gauge")
+        for cache, (hit, miss) in sorted(ratios.items()):
+            lines.append(f"{metric}{_labels((('cache', cache),))} {_num(hit / (hit + miss)) if hit + miss else 0}")
+
+    # 関数ごとの処理時間（summary: 分位点 + 件数 + 合計秒）
+    hists = registry.histograms()
+    if hists:
+        metric = f"{PREFIX}function_duration_seconds"
+        lines.append(f"# HELP {metric} Engine / I/O function latency.")
+        lines.append(f"# TYPE {metric} summary")
+        for h in sorted(hists, key=lambda h: h.name):
+            fn = (("function", h.name),)
+            for q in QUANTILES:
+                lines.append(f"{metric}{_labels(fn + (('quantile', str(q)),))} {_num(h.percentile(q * 100) / 1e6)}")
+            lines.append(f"{metric}_sum{_labels(fn)} {_num(h.total_us / 1e6)}")
+            lines.append(f"{metric}_count{_labels(fn)} {h.count}")
+
+    # ゲージ（日記の件数・カタログの商品数など。取得時に計算）
+    for name, (help_text, values) in sorted(registry.gauges().items()):
+        metric = f"{PREFIX}{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for labels, value in values.items():
+            lines.append(f"{metric}{_labels(labels)} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # スクレイプごとのアクセスログは出さない（CLI の入出力を汚さない）
+        return
+
+
+def start_exporter(port: int, host: Optional[str] = None) -> ThreadingHTTPServer:
+    """デーモンスレッドで待ち受けを開始する。同じ host:port なら既存のサーバーを返す（Streamlit の rerun 対策）。"""
+    host = host or os.environ.get(HOST_ENV, "127.0.0.1")
+    with _lock:
+        server = _servers.get((host, port))
+        if server is None:
+            server = ThreadingHTTPServer((host, port), _Handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name=f"metrics-exporter-{port}", daemon=True).start()
+            _servers[(host, port)] = server
+    return server
+
+
+def port_from_env() -> Optional[int]:
+    value = os.environ.get(PORT_ENV, "").strip()
+    return int(value) if value.isdigit() else None
@@ -0,0 +1,141 @@
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Optional
+
+from catalog import STORE, Catalog, catalog_from_products
+from catalog_snapshot import DECODE_ERRORS, encode_snapshot, open_snapshot_file
+from metrics import incr
+
+# =========================================================
+# ワーカープロセス間で共有する商品カタログ（mmap したスナップショット + 世代カウンタ）
+# - 親（プールを持つ front end）が publish_catalog() で products_local.g<世代>.snap を書き終えてから、
+#   products_local.gen の世代（8バイト）を1つ進める。途中まで書かれたカタログを読むことはない
+# - ワーカーは attach() すると、load_catalog(products_local.json) のたびに世代だけを読み（mmap 上の8バイト。
+#   JSON の stat / パースはしない）、変わっていればその世代のスナップショットを開き直して参照ごと差し替える
+# - 共有されるのはスナップショットのファイル（読み取り専用の mmap。OS のページキャッシュ）と世代の切り替えだけ。
+#   エンジンは Product 単位で読むので、各ワーカーは attach 時に全 Product・文字列・成分プロファイルを自分の
+#   メモリに組み立てる（ゼロコピーではない。商品 10万件でワーカーあたり約 95MB、JSON から読むと約 310MB。
+#   benchmarks/bench_shared_catalog.py）。省けるのは JSON のパースとその一時メモリ、各ワーカーでの再読み込みの判定
+# - 書き込むのは1プロセス（親）だけの前提。古い世代のファイルは2世代前から消す
+# =========================================================
+
+GEN_MAGIC = b"BACGEN01"
+_GEN = struct.Struct("<8sQ")    # magic, generation
+KEEP_GENERATIONS = 2
+
+
+def generation_path(json_path: Path) -> Path:
+    return Path(json_path).with_suffix(".gen")
+
+
+def generation_snapshot_path(json_path: Path, generation: int) -> Path:
+    p = Path(json_path)
+    return p.with_name(f"{p.stem}.g{generation}.snap")
+
+
+def _map_generation(json_path: Path, writable: bool = False) -> Optional[mmap.mmap]:
+    path = generation_path(json_path)
+    try:
+        if writable and not path.exists():
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(_GEN.pack(GEN_MAGIC, 0))
+            os.replace(tmp, path)
+        with open(path, "r+b" if writable else "rb") as f:
+            buf = mmap.mmap(f.fileno(), _GEN.size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if _GEN.unpack_from(buf, 0)[0] != GEN_MAGIC:
+        buf.close()
+        return None
+    return buf
+
+
+def _generation(buf: mmap.mmap) -> int:
+    return _GEN.unpack_from(buf, 0)[1]
+
+
+def publish_catalog(json_path: Path, catalog: Catalog) -> int:
+    """catalog を次の世代として書き出して世代を進める。戻り値は新しい世代（書けなければ 0）。"""
+    buf = _map_generation(json_path, writable=True)
+    if buf is None:
+        return 0
+    try:
+        generation = _generation(buf) + 1
+        path = generation_snapshot_path(json_path, generation)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            tmp.write_bytes(encode_snapshot(catalog.products, catalog.version or (0, 0)))
+            os.replace(tmp, path)
+        except (OSError, OverflowError, ValueError):
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return 0
+        # 8バイト境界への1回の書き込みなので、読む側が途中の値を見ることはない
+        struct.pack_into("<Q", buf, 8, generation)
+        buf.flush()
+        try:
+            generation_snapshot_path(json_path, generation - KEEP_GENERATIONS).unlink()
+        except OSError:
+            pass
+        incr("shared_catalog_publishes")
+        return generation
+    finally:
+        buf.close()
+
+
+class SharedCatalog:
+    """ワーカー側。get() は最新の世代のカタログ（親がまだ publish していなければ None）。"""
+
+    def __init__(self, json_path: Path) -> None:
+        self.json_path = Path(json_path)
+        self.generation = 0
+        self._buf: Optional[mmap.mmap] = None
+        self._catalog: Optional[Catalog] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[Catalog]:
+        if self._buf is None:
+            self._buf = _map_generation(self.json_path)
+            if self._buf is None:
+                return None
+        generation = _generation(self._buf)
+        if generation != self.generation:
+            with self._lock:
+                if generation != self.generation:
+                    self._load(generation)
+        return self._catalog
+
+    def _load(self, generation: int) -> None:
+        opened = open_snapshot_file(generation_snapshot_path(self.json_path, generation))
+        if opened is None:
+            return   # 消された / 壊れた世代: 今のカタログのまま、次の呼び出しで読み直す
+        reader, version = opened
+        try:
+            products = reader.products()
+        except DECODE_ERRORS:
+            return   # 同上
+        self._catalog = catalog_from_products(
+            products, source=self.json_path, version=None if version == (0, 0) else version,
+        )
+        self.generation = generation
+        incr("shared_catalog_reloads")
+
+
+def attach(json_path: Path) -> SharedCatalog:
+    """このプロセスの load_catalog(json_path) を共有の世代から取るようにする。"""
+    shared = SharedCatalog(json_path)
+    STORE.attach(json_path, shared.get)
+    return shared
+
+
+def attach_worker(json_path: Path) -> None:
+    """WorkerPool の warm 用（functools.partial(attach_worker, path)）。成分辞書なども読み込んでおく。"""
+    from worker_pool import warm_engine
+
+    warm_engine()
+    attach(json_path).get()
@@ -0,0 +1,228 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+# =========================================================
+# 遅いリクエストの cProfile / tracemalloc を自動で保存する（CLI / Streamlit / サーバー共通）
+# - 通常のリクエストは時間を測るだけ。threshold_ms を超えたリクエストを名前（意図 / セクション）ごとに数え、
+#   sample 件に1件の割合で「同じ名前の次のリクエスト」を cProfile + tracemalloc 付きで実行する
+#   （遅かったリクエスト自体は終わっているので、次の同じ処理で傾向を取る。他の速いリクエストは計測しない）
+# - 計測付きの実行は同時に1件だけ。実行後も閾値を超えていたときだけ保存する
+# - 保存先: <dir>/<日時>_<名前>_<ms>ms.prof（pstats）と .mem.json（リクエスト中に増えたメモリの上位）
+# - 集計: python slow_profile.py [dir]（CLI では「プロファイル集計」）
+# =========================================================
+
+THRESHOLD_ENV = "BEAUTY_AGENT_PROFILE_SLOW_MS"
+SAMPLE_ENV = "BEAUTY_AGENT_PROFILE_SAMPLE"
+DEFAULT_SAMPLE = 10
+TOP_ALLOCATIONS = 30
+_UNSAFE = re.compile(r"[^0-9A-Za-z_.-]+")
+# 計測そのもの（このモジュール / contextlib / tracemalloc）の確保は集計に入れない
+_OWN_FRAMES = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, contextlib.__file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+)
+
+
+class _Request:
+    __slots__ = ("_name", "_on_rename")
+
+    def __init__(self, name: str, on_rename: Optional[Callable[["_Request"], None]] = None) -> None:
+        self._name = name
+        self._on_rename = on_rename
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        self._name = value
+        if self._on_rename is not None:
+            self._on_rename(self)
+
+
+class SlowRequestProfiler:
+    def __init__(self, directory: Path, threshold_ms: Optional[float], sample: int = DEFAULT_SAMPLE) -> None:
+        self.directory = Path(directory)
+        self.threshold_ms = threshold_ms
+        self.sample = max(1, sample)
+        self.slow = 0            # 閾値を超えたリクエスト数（計測付きの分は除く）
+        self.captured = 0
+        self._slow_by_name: Dict[str, int] = {}
+        self._armed: Set[str] = set()   # 次の1件を計測付きで実行する name
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms is not None
+
+    @contextlib.contextmanager
+    def request(self, name: str) -> Iterator[_Request]:
+        """1リクエスト分。yield した値の name を書き換えると保存名が変わる（意図の判定後など）。
+
+        閾値超えは name ごとに数え、sample 件ごとに同じ name の次のリクエストを計測付きで実行する
+        （CLI のように途中で name が決まるときは、書き換えた時点から計測する）。
+        """
+        if not self.enabled:
+            yield _Request(name)
+            return
+        with contextlib.ExitStack() as stack:
+            capturing = False
+
+            def maybe_capture(req: _Request) -> None:
+                nonlocal capturing
+                if capturing or req.name not in self._armed or not self._busy.acquire(blocking=False):
+                    return
+                self._armed.discard(req.name)
+                capturing = True
+                stack.callback(self._busy.release)
+                stack.enter_context(self._capture(req))
+
+            req = _Request(name, maybe_capture)
+            maybe_capture(req)
+            t0 = time.perf_counter()
+            yield req
+            if capturing:
+                return
+            if (time.perf_counter() - t0) * 1000 >= self.threshold_ms:
+                self.slow += 1
+                count = self._slow_by_name[req.name] = self._slow_by_name.get(req.name, 0) + 1
+                if count % self.sample == 0:
+                    self._armed.add(req.name)
+
+    @contextlib.contextmanager
+    def _capture(self, req: _Request) -> Iterator[None]:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # 他のプロファイラ（--profile-startup やデバッガ）が動いているときは取らない
+            if started_tracing:
+                tracemalloc.stop()
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            prof.disable()
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            if elapsed_ms >= self.threshold_ms:
+                diff = after.filter_traces(_OWN_FRAMES).compare_to(before.filter_traces(_OWN_FRAMES), "lineno")
+                self._save(req.name, elapsed_ms, prof, diff)
+
+    def _save(self, name: str, elapsed_ms: float, prof: cProfile.Profile, diff: List[tracemalloc.StatisticDiff]) -> None:
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            stem = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{_UNSAFE.sub('_', name)[:40]}_{elapsed_ms:.0f}ms"
+            prof.dump_stats(str(self.directory / f"{stem}.prof"))
+            allocations = [
+                {"site": f"{d.traceback[0].filename}:{d.traceback[0].lineno}", "size_kb": round(d.size_diff / 1024, 1), "count": d.count_diff}
+                for d in diff[:TOP_ALLOCATIONS] if d.size_diff > 0
+            ]
+            meta = {"name": name, "elapsed_ms": round(elapsed_ms, 1), "threshold_ms": self.threshold_ms, "allocations": allocations}
+            (self.directory / f"{stem}.mem.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+            self.captured += 1
+        except OSError:
+            pass
+
+
+def profiler_from_env(directory: Path) -> SlowRequestProfiler:
+    """BEAUTY_AGENT_PROFILE_SLOW_MS（未設定なら無効）と BEAUTY_AGENT_PROFILE_SAMPLE から作る。"""
+    threshold = os.environ.get(THRESHOLD_ENV, "").strip()
+    sample = os.environ.get(SAMPLE_ENV, "").strip()
+    try:
+        threshold_ms: Optional[float] = float(threshold) if threshold else None
+    except ValueError:
+        threshold_ms = None
+    return SlowRequestProfiler(directory, threshold_ms, int(sample) if sample.isdigit() else DEFAULT_SAMPLE)
+
+
+# ---------------------------------------------------------
+# 集計（保存済みプロファイル全体の上位）
+# ---------------------------------------------------------
+def summarize_profiles(directory: Path, top: int = 15) -> Dict[str, Any]:
+    directory = Path(directory)
+    profs = sorted(directory.glob("*.prof")) if directory.exists() else []
+    metas = []
+    for p in sorted(directory.glob("*.mem.json")) if directory.exists() else []:
+        try:
+            metas.append(json.loads(p.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+
+    functions: List[Tuple[str, int, float, float]] = []
+    if profs:
+        stats = pstats.Stats(*(str(p) for p in profs), stream=io.StringIO())
+        for (filename, lineno, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():  # type: ignore[attr-defined]
+            functions.append((f"{Path(filename).name}:{lineno}({func})", ncalls, tottime, cumtime))
+    by_cum = sorted(functions, key=lambda f: -f[3])[:top]
+    by_self = sorted(functions, key=lambda f: -f[2])[:top]
+
+    sites: Dict[str, List[float]] = {}
+    for m in metas:
+        for a in m.get("allocations", []):
+            s = sites.setdefault(a["site"], [0.0, 0])
+            s[0] += a["size_kb"]
+            s[1] += 1
+    requests: Dict[str, List[float]] = {}
+    for m in metas:
+        requests.setdefault(m.get("name", "?"), []).append(m.get("elapsed_ms", 0.0))
+
+    return {
+        "profiles": len(profs),
+        "requests": {name: {"count": len(v), "max_ms": max(v), "mean_ms": round(sum(v) / len(v), 1)} for name, v in sorted(requests.items(), key=lambda kv: -max(kv[1]))},
+        "cumulative": [{"function": f, "calls": n, "self_s": round(t, 4), "cum_s": round(c, 4)} for f, n, t, c in by_cum],
+        "self": [{"function": f, "calls": n, "self_s": round(t, 4), "cum_s": round(c, 4)} for f, n, t, c in by_self],
+        "allocations": [{"site": k, "size_kb": round(v[0], 1), "profiles": v[1]} for k, v in sorted(sites.items(), key=lambda kv: -kv[1][0])[:top]],
+    }
+
+
+def format_profile_summary(summary: Dict[str, Any]) -> str:
+    if not summary["profiles"]:
+        return "保存されたプロファイルはありません（BEAUTY_AGENT_PROFILE_SLOW_MS で閾値を設定すると遅いリクエストを記録します）。"
+    lines = [f"保存されたプロファイル: {summary['profiles']}件"]
+    lines.append("【リクエスト】")
+    for name, r in summary["requests"].items():
+        lines.append(f"- {name}: {r['count']}件 / 最大 {r['max_ms']}ms / 平均 {r['mean_ms']}ms")
+    lines.append("【累積時間の上位（全プロファイル合計）】")
+    for f in summary["cumulative"]:
+        lines.append(f"- {f['cum_s']:.3f}s（自身 {f['self_s']:.3f}s / {f['calls']}回）{f['function']}")
+    lines.append("【自身の時間の上位】")
+    for f in summary["self"]:
+        lines.append(f"- {f['self_s']:.3f}s（{f['calls']}回）{f['function']}")
+    if summary["allocations"]:
+        lines.append("【リクエスト中に増えたメモリの上位】")
+        for a in summary["allocations"]:
+            lines.append(f"- {a['size_kb']:.1f} KB（{a['profiles']}件）{a['site']}")
+    return "\n".join(lines)
+
+
+def main(argv: List[str]) -> int:
+    directory = Path(argv[0]) if argv else Path("beauty_agent_data") / "profiles"
+    print(format_profile_summary(summarize_profiles(directory)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,91 @@
+# startup_profile.py
+# Startup / rerun phase timer for app.py (--profile-startup)
+#
+#   python -m streamlit run app.py -- --profile-startup
+#   python app.py --profile-startup        # bare mode (no browser), one pass
+#
+# The report goes to stderr: time per phase (imports, ensure_data_files, inject_css,
+# data loading, each tab) plus the import tree from `python -X importtime`.
+
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+_NULL = nullcontext()
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+class StartupProfiler:
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.phases: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float) -> None:
+        if self.enabled:
+            self.phases.append((name, seconds * 1000.0))
+
+    def phase(self, name: str):
+        """Context manager timing one phase. Shared no-op when disabled."""
+        if not self.enabled:
+            return _NULL
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - t0) * 1000.0))
+
+    def reset(self) -> None:
+        self.phases = []
+
+    def report(self, out: Optional[TextIO] = None, module: str = "app", min_ms: float = 2.0) -> None:
+        if not self.enabled:
+            return
+        out = out or sys.stderr
+        total = sum(ms for _, ms in self.phases)
+        print("== startup profile: phases ==", file=out)
+        for name, ms in self.phases:
+            print(f"{ms:9.1f} ms  {name}", file=out)
+        print(f"{total:9.1f} ms  total", file=out)
+        print(f"== import tree: {module} (cumulative >= {min_ms} ms) ==", file=out)
+        for depth, self_ms, cum_ms, name in import_tree(module, str(Path(__file__).resolve().parent)):
+            if cum_ms >= min_ms:
+                print(f"{cum_ms:9.1f} ms  {'  ' * depth}{name}  (self {self_ms:.1f} ms)", file=out)
+
+
+@lru_cache(maxsize=None)
+def import_tree(module: str, cwd: str) -> Tuple[Tuple[int, float, float, str], ...]:
+    """Run `python -X importtime -c 'import <module>'` once and parse its tree (depth, self, cumulative, name)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    # importtime prints children before their parent: collect each level's finished
+    # subtrees until the parent line arrives, then flatten in reading order
+    pending: List[List[Tuple[Tuple[int, float, float, str], list]]] = [[]]
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if not m:
+            continue
+        depth = max(0, (len(m.group(3)) - 1) // 2)
+        while len(pending) <= depth + 1:
+            pending.append([])
+        node = ((depth, int(m.group(1)) / 1000.0, int(m.group(2)) / 1000.0, m.group(4)), pending[depth + 1])
+        pending[depth + 1] = []
+        pending[depth].append(node)
+
+    rows: List[Tuple[int, float, float, str]] = []
+    stack = list(reversed(pending[0]))
+    while stack:
+        row, children = stack.pop()
+        rows.append(row)
+        stack.extend(reversed(children))
+    return tuple(rows)
@@ -0,0 +1,142 @@
+# static_assets.py
+# Beauty Agent Local - build the app stylesheet into a hashed, minified static asset
+#
+#   python static_assets.py          # build static/app.<hash>.css from assets/app.css
+#
+# Fonts: url("fonts/<file>") sources in @font-face rules point at assets/fonts/<file>.
+# Files that exist are copied to static/fonts/<stem>.<hash>.<ext> and the url is rewritten;
+# missing ones are dropped from the src list, so the page never requests a file that isn't there.
+#
+# Streamlit serves ./static at app/static/ when server.enableStaticServing is on
+# (.streamlit/config.toml). The app also builds on first use if the output is missing,
+# so a manual build is only needed for read-only deployments.
+
+import hashlib
+import os
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+from catalog import file_version
+
+BASE_DIR = Path(__file__).resolve().parent
+CSS_SOURCE = BASE_DIR / "assets" / "app.css"
+FONT_SOURCE_DIR = BASE_DIR / "assets" / "fonts"
+STATIC_DIR = BASE_DIR / "static"
+STATIC_URL = "app/static"
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_SPACE_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"\s*([{};,>])\s*")
+_COLON_RE = re.compile(r":\s+")
+_SRC_RE = re.compile(r"(\bsrc\s*:)([^;}]*)")
+_FONT_URL_RE = re.compile(r"""url\(\s*["']?fonts/([^"')\s]+)["']?\s*\)""")
+
+
+def minify_css(css: str) -> str:
+    css = _COMMENT_RE.sub("", css)
+    css = _SPACE_RE.sub(" ", css)
+    css = _PUNCT_RE.sub(r"\1", css)
+    # only the space after ":" is safe to drop ("a :hover" and "a:hover" differ)
+    css = _COLON_RE.sub(":", css)
+    return css.replace(";}", "}").strip()
+
+
+def css_filename(minified: str) -> str:
+    return f"app.{hashlib.sha256(minified.encode('utf-8')).hexdigest()[:12]}.css"
+
+
+def _write_once(target: Path, data: bytes) -> None:
+    if target.exists():
+        return
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+
+
+def _publish_font(name: str, out_dir: Path) -> Optional[str]:
+    try:
+        data = (FONT_SOURCE_DIR / name).read_bytes()
+    except OSError:
+        return None
+    stem, _, ext = name.rpartition(".")
+    hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}.{ext}"
+    _write_once(out_dir / "fonts" / hashed, data)
+    return hashed
+
+
+def resolve_font_urls(css: str, out_dir: Optional[Path]) -> Tuple[str, Set[str]]:
+    """Rewrite url("fonts/...") font sources to hashed static files. Returns (css, published names).
+
+    With out_dir None (inline stylesheet) every bundled source is dropped and local() remains."""
+    published: Set[str] = set()
+
+    def src(m: "re.Match[str]") -> str:
+        keep = []
+        for part in m.group(2).split(","):
+            url = _FONT_URL_RE.search(part)
+            if url is None:
+                keep.append(part)
+                continue
+            hashed = _publish_font(url.group(1), out_dir) if out_dir is not None else None
+            if hashed is not None:
+                published.add(hashed)
+                keep.append(f'{part[:url.start()]}url("{STATIC_URL}/fonts/{hashed}"){part[url.end():]}')
+        return m.group(1) + ",".join(keep)
+
+    return _SRC_RE.sub(src, css), published
+
+
+def _drop_stale(directory: Path, pattern: str, keep: Set[str]) -> None:
+    for old in directory.glob(pattern):
+        if old.name not in keep:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+def build_css(source: Path = CSS_SOURCE, out_dir: Path = STATIC_DIR) -> Tuple[str, str]:
+    """Minify `source` into out_dir/app.<hash>.css, publish its fonts and drop stale builds.
+    Returns (filename, css)."""
+    css, fonts = resolve_font_urls(source.read_text(encoding="utf-8"), out_dir)
+    minified = minify_css(css)
+    name = css_filename(minified)
+    _write_once(out_dir / name, minified.encode("utf-8"))
+    _drop_stale(out_dir, "app.*.css", {name})
+    _drop_stale(out_dir / "fonts", "*.*.*", fonts)
+    return name, minified
+
+
+@lru_cache(maxsize=4)
+def _stylesheet(version: Optional[Tuple[int, int]]) -> Tuple[Optional[str], str]:
+    try:
+        name, minified = build_css()
+    except OSError:
+        # read-only tree: serve inline instead of as a static file
+        try:
+            return None, minify_css(resolve_font_urls(CSS_SOURCE.read_text(encoding="utf-8"), None)[0])
+        except OSError:
+            return None, ""
+    return f"{STATIC_URL}/{name}", minified
+
+
+def stylesheet() -> Tuple[Optional[str], str]:
+    """(href or None, minified css). Rebuilt only when assets/app.css changes."""
+    return _stylesheet(file_version(CSS_SOURCE))
+
+
+def main(argv: List[str]) -> int:
+    name, minified = build_css()
+    src = CSS_SOURCE.stat().st_size
+    print(f"built: {STATIC_DIR / name} ({src} -> {len(minified.encode('utf-8'))} bytes)")
+    for font in sorted(STATIC_DIR.glob("fonts/*")):
+        print(f"font: {font}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,96 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from metrics import incr
+
+# =========================================================
+# ユーザーごとのデータ置き場とキャッシュ（1台で複数ユーザーを受ける Streamlit 版向け。CLI は --user）
+# - 既定ユーザー（""）は従来どおり beauty_agent_data/ 直下、それ以外は beauty_agent_data/users/<id>/
+# - キャッシュはユーザーごとの名前付きスロット（{"version": ..., "index": ...} のような dict）に持つ
+# - スロットの重さ（元ファイルのバイト数で見積もる。日記の各インデックスは実測で元ファイルと同程度）を
+#   全ユーザー合計で管理し、上限を超えたら最後に使われたのが古いユーザーからキャッシュを丸ごと捨てる
+#   （今使っているユーザーは捨てない。捨てられたユーザーは次のアクセスで作り直すだけ）
+# - 商品カタログはユーザー共通（catalog.load_catalog のストアで1回だけ読む）
+# =========================================================
+
+DEFAULT_USER = ""
+USER_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+BUDGET_ENV = "BEAUTY_AGENT_TENANT_CACHE_MB"
+DEFAULT_BUDGET_MB = 256
+
+
+def valid_user_id(user_id: str) -> bool:
+    return user_id == DEFAULT_USER or USER_ID.fullmatch(user_id) is not None
+
+
+def user_dir(base: Path, user_id: str) -> Path:
+    """ユーザーのデータディレクトリ。ID はパスに使うので英数字と _ . - だけ（先頭は英数字）。"""
+    if not valid_user_id(user_id):
+        raise ValueError(f"invalid user id: {user_id!r}")
+    return base if user_id == DEFAULT_USER else base / "users" / user_id
+
+
+class _Tenant:
+    __slots__ = ("slots", "weights")
+
+    def __init__(self) -> None:
+        self.slots: Dict[str, Dict[str, Any]] = {}
+        self.weights: Dict[str, int] = {}
+
+
+class TenantCaches:
+    def __init__(self, budget_bytes: int) -> None:
+        self.budget_bytes = budget_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._tenants: "OrderedDict[str, _Tenant]" = OrderedDict()
+
+    def slot(self, user_id: str, name: str, factory: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """user_id の name スロット（無ければ factory() で作る）。ユーザーを最近使った側へ移す。"""
+        with self._lock:
+            tenant = self._tenants.get(user_id)
+            if tenant is None:
+                tenant = self._tenants[user_id] = _Tenant()
+            else:
+                self._tenants.move_to_end(user_id)
+            state = tenant.slots.get(name)
+            if state is None:
+                state = tenant.slots[name] = factory()
+            return state
+
+    def account(self, user_id: str, name: str, weight: int) -> None:
+        """スロットの中身を作り直したときに重さを更新し、上限を超えていれば古いユーザーから捨てる。"""
+        with self._lock:
+            tenant = self._tenants.get(user_id)
+            if tenant is None:   # 作り直している間に捨てられた（次のアクセスで作り直す）
+                return
+            self.total_bytes += weight - tenant.weights.get(name, 0)
+            tenant.weights[name] = weight
+            evicted = 0
+            while self.total_bytes > self.budget_bytes:
+                victim = next((u for u in self._tenants if u != user_id), None)
+                if victim is None:
+                    break
+                self.total_bytes -= sum(self._tenants.pop(victim).weights.values())
+                evicted += 1
+            self.evictions += evicted
+        if evicted:
+            incr("tenant_cache_evictions", evicted)
+
+    def users(self) -> int:
+        return len(self._tenants)
+
+
+def budget_from_env() -> int:
+    """BEAUTY_AGENT_TENANT_CACHE_MB（既定 256）をバイトで。"""
+    value = os.environ.get(BUDGET_ENV, "").strip()
+    try:
+        mb = float(value) if value else DEFAULT_BUDGET_MB
+    except ValueError:
+        mb = DEFAULT_BUDGET_MB
+    return int(max(mb, 0) * 1024 * 1024)
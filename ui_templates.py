@@ -0,0 +1,96 @@
+# ui_templates.py
+# Beauty Agent Local - HTML templates for product / step cards (no Streamlit import)
+#
+# A whole grid (all recommendation picks, or all AM/PM steps) is rendered into one HTML
+# string so app.py sends it as a single st.markdown delta instead of one per card.
+# Templates are str.format strings built once at import; product cards are memoized
+# per (product id, lang).
+
+from html import escape
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app_core import fragrance_label, product_type_label, t
+from catalog import Product
+
+# Whitespace between tags is dropped from the templates: it is payload, not layout.
+PRODUCT_CARD = (
+    '<div class="ec-card">'
+    '<div class="ec-top"><div class="ec-emoji">{emoji}</div>'
+    '<div><div class="ec-name">{name}</div><div class="ec-meta">{p_type} ・ {frag}</div></div></div>'
+    '<div class="ec-desc">{desc}</div>'
+    '<div class="ec-tags">{tags}</div>'
+    '<div class="ec-price">{price_label}: {price}</div>'
+    '<div class="ec-footer"><span class="ec-badge">{note}</span><span class="ec-btn">{cta}</span></div>'
+    '</div>'
+)
+PRODUCT_TAG = '<span class="ec-tag">{tag}</span>'
+PRODUCT_GRID = '<div class="ec-grid">{cards}</div>'
+
+STEP_CARD = (
+    '<div class="step-card">'
+    '<div class="step-head"><div class="step-title">{title}</div><div class="step-min">{minutes}</div></div>'
+    '<div class="step-desc">{desc}</div>'
+    '</div>'
+)
+STEP_LIST = '<div class="step-list">{cards}<div class="small-note">{total}</div></div>'
+
+STEP_TITLES: Dict[str, Dict[str, str]] = {
+    "cleanse": {"ja": "洗う/落とす", "en": "Cleanse", "ko": "세안/클렌징", "zh": "清洁"},
+    "tone": {"ja": "化粧水", "en": "Toner", "ko": "토너", "zh": "化妆水"},
+    "serum": {"ja": "美容液", "en": "Serum", "ko": "세럼", "zh": "精华"},
+    "moisturize": {"ja": "保湿", "en": "Moisturize", "ko": "보습", "zh": "保湿"},
+    "sunscreen": {"ja": "日焼け止め", "en": "Sunscreen", "ko": "선케어", "zh": "防晒"},
+    "spot": {"ja": "部分ケア", "en": "Spot Care", "ko": "스팟 케어", "zh": "局部护理"},
+}
+
+# (product id, lang) -> (product, card html). The product object is kept so a reloaded
+# catalog entry with the same id is re-rendered instead of served stale.
+_card_cache: Dict[Tuple[str, str], Tuple[Product, str]] = {}
+_CARD_CACHE_MAX = 4096
+
+
+def product_card_html(prod: Product, lang: str) -> str:
+    key = (prod.id, lang)
+    hit = _card_cache.get(key)
+    if hit is not None and hit[0] is prod:
+        return hit[1]
+    html = PRODUCT_CARD.format(
+        emoji=escape(prod.emoji),
+        name=escape(prod.display_name(lang)),
+        p_type=escape(product_type_label(prod.type, lang)),
+        frag=escape(fragrance_label(prod.fragrance, lang)),
+        desc=escape(prod.display_desc(lang)),
+        tags="".join(PRODUCT_TAG.format(tag=escape(str(tag))) for tag in prod.tags[:4]),
+        price_label=escape(t("price", lang)),
+        price=escape(f"¥{prod.price_jpy:,}"),
+        note=escape(t("product_card_note", lang)),
+        cta=escape(t("cta_try", lang)),
+    )
+    if len(_card_cache) >= _CARD_CACHE_MAX:
+        _card_cache.clear()
+    _card_cache[key] = (prod, html)
+    return html
+
+
+def product_grid_html(picks: Sequence[Product], lang: str) -> str:
+    return PRODUCT_GRID.format(cards="".join(product_card_html(p, lang) for p in picks))
+
+
+def step_list_html(steps: List[Dict[str, Any]], lang: str) -> str:
+    cards = []
+    total_m = 0
+    for idx, s in enumerate(steps, start=1):
+        total_m += int(s.get("minutes", 0))
+        localized_title = STEP_TITLES.get(s["title"], {}).get(lang, s["title"])
+        cards.append(STEP_CARD.format(
+            title=escape(f"{idx}. {localized_title}"),
+            minutes=escape(f"{int(s.get('minutes', 1))}{t('minutes', lang)}"),
+            desc=escape(str(s.get("desc", ""))),
+        ))
+    total_label = {
+        "ja": f"合計目安: {total_m}分",
+        "en": f"Estimated total: {total_m} min",
+        "ko": f"예상 총 시간: {total_m}분",
+        "zh": f"预计总时长：{total_m}分钟",
+    }.get(lang, f"{total_m} min")
+    return STEP_LIST.format(cards="".join(cards), total=escape(total_label))
@@ -0,0 +1,226 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from catalog import CATEGORY_TO_TYPE, Catalog
+from journal import JournalEntry
+from journal_analytics import JsonlTail, day_number, path_lock
+
+# =========================================================
+# 使用アイテムと症状の関係（products_used / used_items）
+# - アイテム（書かれた名前）とカテゴリ（洗顔 / 化粧水 …）ごとに「使った日」の転置インデックスを持つ
+# - 日の集合は int のビット列（bit i = base_day + i 日目）。追加は O(1)、集計は & と bit_count だけ
+# - 使った日 / 使わなかった日（記録のある日）それぞれの症状出現率を、直近 N 日の窓で比べる
+# =========================================================
+
+ITEM = "item"
+CATEGORY = "category"
+_MIN_USED_DAYS = 3
+
+
+def category_names(catalog: Optional[Catalog] = None) -> Dict[str, str]:
+    """アイテム名（小文字）-> カテゴリ。カテゴリ名そのものと、カタログの商品名（全言語）を登録する。"""
+    names = {c.lower(): c for c in CATEGORY_TO_TYPE}
+    if catalog is not None:
+        for p in catalog.products:
+            for name in p.name:
+                if name:
+                    names.setdefault(name.lower(), p.category)
+    return names
+
+
+@dataclass(frozen=True, slots=True)
+class ItemImpact:
+    key: str
+    kind: str                 # ITEM / CATEGORY
+    used_days: int
+    rate_with: float          # 使った日の症状出現率
+    rate_without: float       # 使わなかった日の症状出現率
+    next_rate_with: float     # 使った翌日の症状出現率
+    next_rate_without: float
+
+    @property
+    def diff(self) -> float:
+        return self.rate_with - self.rate_without
+
+
+class UsageIndex:
+    """アイテム / カテゴリ -> 使用日ビット列。save のたびに add() で1件ずつ足していける。"""
+
+    def __init__(self, categories: Optional[Dict[str, str]] = None) -> None:
+        self.categories = categories if categories is not None else category_names()
+        self.base: Optional[int] = None
+        self.last: Optional[int] = None
+        self.logged = 0                                   # 記録のある日
+        self.flare = 0                                    # 何らかの症状が出た日
+        self.symptom_days: Dict[str, int] = {}
+        self.index: Dict[Tuple[str, str], int] = {}       # (kind, key) -> 使用日
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _bit(self, d: int) -> int:
+        if self.base is None:
+            self.base = self.last = d
+        elif d < self.base:
+            # より古い日付が来たら全ビット列をずらす（まれ）
+            shift = self.base - d
+            self.logged <<= shift
+            self.flare <<= shift
+            self.symptom_days = {k: v << shift for k, v in self.symptom_days.items()}
+            self.index = {k: v << shift for k, v in self.index.items()}
+            self.base = d
+        if d > self.last:
+            self.last = d
+        return 1 << (d - self.base)
+
+    def _keys(self, item: str) -> Tuple[Tuple[str, str], ...]:
+        category = self.categories.get(item.lower())
+        if category is None:
+            return ((ITEM, item),)
+        if category == item:
+            return ((CATEGORY, category),)   # 「化粧水」のようにカテゴリ名そのものを書いた場合
+        return ((ITEM, item), (CATEGORY, category))
+
+    def add(self, entry: JournalEntry) -> None:
+        d = day_number(entry.date)
+        if d is None:
+            return
+        bit = self._bit(d)
+        self.logged |= bit
+        if entry.symptoms:
+            self.flare |= bit
+        for s in entry.symptoms:
+            self.symptom_days[s] = self.symptom_days.get(s, 0) | bit
+        for item in entry.products_used:
+            for key in self._keys(item):
+                self.index[key] = self.index.get(key, 0) | bit
+
+    def extend(self, entries: Iterable[JournalEntry]) -> None:
+        """まとめて追加。ビット位置をキーごとに集めてから1回で int にする（add の繰り返しより速い）。"""
+        rows = [(d, e) for d, e in ((day_number(e.date), e) for e in entries) if d is not None]
+        if not rows:
+            return
+        self._bit(min(d for d, _ in rows))
+        self._bit(max(d for d, _ in rows))
+        base = self.base
+        logged: List[int] = []
+        flare: List[int] = []
+        symptoms: Dict[str, List[int]] = {}
+        items: Dict[Tuple[str, str], List[int]] = {}
+        for d, e in rows:
+            i = d - base
+            logged.append(i)
+            if e.symptoms:
+                flare.append(i)
+            for s in e.symptoms:
+                symptoms.setdefault(s, []).append(i)
+            for item in e.products_used:
+                for key in self._keys(item):
+                    items.setdefault(key, []).append(i)
+
+        size = self.last - base + 1
+        self.logged |= _bitset(logged, size)
+        self.flare |= _bitset(flare, size)
+        for s, positions in symptoms.items():
+            self.symptom_days[s] = self.symptom_days.get(s, 0) | _bitset(positions, size)
+        for key, positions in items.items():
+            self.index[key] = self.index.get(key, 0) | _bitset(positions, size)
+
+    def impacts(
+        self,
+        window_days: Optional[int] = None,
+        symptom: Optional[str] = None,
+        min_used_days: int = _MIN_USED_DAYS,
+    ) -> List[ItemImpact]:
+        """症状との関連が強い順（使った日の出現率 - 使わなかった日の出現率）。
+
+        window_days: 直近 N 日だけを見る（None = 全期間）
+        symptom: 特定の症状だけを見る（None = 何らかの症状）
+        """
+        if self.base is None:
+            return []
+        span = self.last - self.base + 1
+        window = (1 << span) - 1
+        if window_days is not None and window_days < span:
+            window ^= (1 << (span - window_days)) - 1
+        logged = self.logged & window
+        flare = self.symptom_days.get(symptom, 0) if symptom else self.flare
+        # 翌日: bit i に「i+1 日目に症状が出て、かつ記録がある」を立てる
+        next_logged = self.logged >> 1
+        next_flare = flare >> 1
+
+        out = []
+        for (kind, key), used_all in self.index.items():
+            used = used_all & logged
+            n_used = used.bit_count()
+            if n_used < min_used_days:
+                continue
+            unused = logged & ~used
+            n_unused = unused.bit_count()
+            used_next = used & next_logged
+            unused_next = unused & next_logged
+            out.append(ItemImpact(
+                key=key,
+                kind=kind,
+                used_days=n_used,
+                rate_with=(used & flare).bit_count() / n_used,
+                rate_without=(unused & flare).bit_count() / n_unused if n_unused else 0.0,
+                next_rate_with=_ratio(used_next & next_flare, used_next),
+                next_rate_without=_ratio(unused_next & next_flare, unused_next),
+            ))
+        out.sort(key=lambda x: (x.diff, x.used_days), reverse=True)
+        return out
+
+
+def _bitset(positions: List[int], size: int) -> int:
+    buf = bytearray((size + 7) >> 3)
+    for i in positions:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _ratio(hits: int, days: int) -> float:
+    n = days.bit_count()
+    return hits.bit_count() / n if n else 0.0
+
+
+_jsonl: Dict[str, Tuple[JsonlTail, UsageIndex, Optional[Tuple[int, int]]]] = {}
+
+
+def usage_for_jsonl(path: Path, catalog: Optional[Catalog] = None) -> UsageIndex:
+    """journal.jsonl 用。前回から追記された行だけインデックスに足す。
+
+    商品名 -> カテゴリの対応はカタログの version ごとに作る（ホットリロードでカタログが変われば全行から作り直す）。
+    """
+    key = os.path.abspath(path)
+    catalog_version = catalog.version if catalog is not None else None
+    with path_lock(key):
+        state = _jsonl.get(key)
+        if state is None or state[2] != catalog_version:
+            state = _jsonl[key] = (JsonlTail(Path(path)), UsageIndex(category_names(catalog)), catalog_version)
+        tail, index, _ = state
+        if tail.changed():
+            reset, entries = tail.read_new()
+            if reset:
+                index = UsageIndex(index.categories)
+                _jsonl[key] = (tail, index, catalog_version)
+            index.extend(entries)
+        return index
+
+
+def format_impacts(impacts: List[ItemImpact], window_days: Optional[int] = None, limit: int = 5) -> str:
+    """CLI 表示用（日本語）。"""
+    period = f"直近{window_days}日" if window_days else "全期間"
+    if not impacts:
+        return f"使用アイテムの分析（{period}）: まだデータが足りません（{_MIN_USED_DAYS}日以上使ったアイテムが必要です）。"
+    lines = [f"使用アイテムと症状の関係（{period} / 使った日 vs 使わなかった日）:"]
+    for x in impacts[:limit]:
+        label = f"[{x.key}]" if x.kind == CATEGORY else x.key
+        lines.append(
+            f"- {label}: 症状 {x.rate_with * 100:.0f}% vs {x.rate_without * 100:.0f}%"
+            f"（翌日 {x.next_rate_with * 100:.0f}% vs {x.next_rate_without * 100:.0f}% / {x.used_days}日）"
+        )
+    lines.append("※ 同時に起きやすいだけで、原因とは限りません。")
+    return "\n".join(lines)
@@ -0,0 +1,241 @@
+import multiprocessing as mp
+import queue
+import signal
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from metrics import incr, timer
+
+# =========================================================
+# CPU の重い処理（成分表示の一括チェック・大きなカタログのおすすめ）をプロセスに分けて流すワーカープール
+# - 起動時に workers 個のプロセスを作り、各プロセスで warm() を1回だけ呼ぶ
+#   （既定の warm_engine: 成分辞書のトライ / 近似一致の索引・併用ルールのグラフ。カタログは front end 側の warm で）
+# - 投入は上限付きのキュー（queue_size）。満杯なら submit は空くまで待つ（block=False なら PoolBusy）
+# - リクエストごとのタイムアウト: 時間内に返らなければそのワーカーを止めて作り直し、Future は TimeoutError
+# - 関数と引数は pickle できること（モジュールの最上位で定義した関数）。起動方式は forkserver（無ければ spawn）
+#   なので、スレッドを持つ親プロセス（メトリクスの exporter など）から fork しない
+# - 使い方:
+#     with WorkerPool(workers=4) as pool:
+#         for result in pool.map(analyze_ingredients_rule_based, labels, chunksize=50):
+#             ...
+# =========================================================
+
+DEFAULT_TIMEOUT = 30.0
+
+
+class PoolBusy(RuntimeError):
+    """キューが満杯（block=False のとき）。"""
+
+
+class WorkerCrashed(RuntimeError):
+    """処理中にワーカープロセスが終了した。"""
+
+
+def warm_engine() -> None:
+    """既定の初期化: 成分辞書（トライと近似一致の索引）と併用ルールのグラフを読み込んでおく。"""
+    from ingredient_dict import load_dictionary
+    from ingredient_rules import load_conflict_graph
+
+    load_dictionary().fuzzy_index()
+    load_conflict_graph()
+
+
+def _apply_chunk(fn: Callable[[Any], Any], items: Sequence[Any]) -> List[Tuple[bool, Any]]:
+    out: List[Tuple[bool, Any]] = []
+    for item in items:
+        try:
+            out.append((True, fn(item)))
+        except Exception as e:
+            out.append((False, e))
+    return out
+
+
+def _worker_main(conn: Any, warm: Optional[Callable[[], None]]) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl-C は親が受けてプールを閉じる
+    if warm is not None:
+        warm()
+    conn.send(None)   # 準備完了
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        fn, args, kwargs = task
+        try:
+            result: Tuple[bool, Any] = (True, fn(*args, **kwargs))
+        except Exception as e:
+            result = (False, e)
+        try:
+            conn.send(result)
+        except Exception as e:   # 結果や例外が pickle できない
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+class _Worker:
+    __slots__ = ("conn", "process", "ready")
+
+    def __init__(self, ctx: Any, warm: Optional[Callable[[], None]]) -> None:
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child, warm), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+
+    def stop(self, kill: bool = False) -> None:
+        try:
+            if kill:
+                self.process.terminate()
+            else:
+                self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1.0 if kill else 5.0)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        warm: Optional[Callable[[], None]] = warm_engine,
+        start_method: Optional[str] = None,
+    ) -> None:
+        self.workers = max(1, workers or mp.cpu_count())
+        self.timeout = timeout
+        self._warm = warm
+        methods = mp.get_all_start_methods()
+        self._ctx = mp.get_context(start_method or ("forkserver" if "forkserver" in methods else "spawn"))
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size or self.workers * 2)
+        self._slots = [_Worker(self._ctx, warm) for _ in range(self.workers)]
+        self._threads = [
+            threading.Thread(target=self._serve, args=(i,), name=f"worker-pool-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        self._closed = False
+        for t in self._threads:
+            t.start()
+
+    # ---------------------------------------------------------
+    # 投入
+    # ---------------------------------------------------------
+    def submit(self, fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None, block: bool = True, **kwargs: Any) -> "Future[Any]":
+        """fn(*args, **kwargs) をワーカーで実行する。timeout を省略するとプールの既定値。"""
+        if self._closed:
+            raise RuntimeError("pool is closed")
+        future: "Future[Any]" = Future()
+        try:
+            self._queue.put((future, fn, args, kwargs, self.timeout if timeout is None else timeout), block=block)
+        except queue.Full:
+            incr("pool_requests", result="busy")
+            raise PoolBusy(f"queue is full ({self._queue.maxsize})") from None
+        return future
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any], chunksize: int = 1, return_exceptions: bool = False) -> Iterator[Any]:
+        """items の順に fn(item) の結果を返す。投入済みで未回収の分はキューの長さ程度に抑える（入力が巨大でも一定のメモリ）。
+
+        return_exceptions=True なら失敗した item の位置に例外オブジェクトを返す（止めない）。
+        タイムアウト / ワーカーの異常終了はチャンク内の全 item の失敗として扱う。
+        """
+        pending: Deque[Tuple["Future[Any]", int]] = deque()
+        window = self._queue.maxsize + self.workers
+
+        def drain() -> Iterator[Any]:
+            future, size = pending.popleft()
+            try:
+                results = future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results = [(False, e)] * size
+            for ok, value in results:
+                if not ok and not return_exceptions:
+                    raise value
+                yield value
+
+        chunk: List[Any] = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= chunksize:
+                pending.append((self.submit(_apply_chunk, fn, chunk), len(chunk)))
+                chunk = []
+                if len(pending) >= window:
+                    yield from drain()
+        if chunk:
+            pending.append((self.submit(_apply_chunk, fn, chunk), len(chunk)))
+        while pending:
+            yield from drain()
+
+    # ---------------------------------------------------------
+    # ワーカーごとの送受信（スレッド1本 = ワーカー1プロセス）
+    # ---------------------------------------------------------
+    def _serve(self, slot: int) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs, timeout = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            with timer(f"pool:{getattr(fn, '__name__', 'task')}"):
+                outcome, value = self._run(slot, fn, args, kwargs, timeout)
+            incr("pool_requests", result=outcome)
+            if outcome == "ok":
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def _run(self, slot: int, fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: Any, timeout: Optional[float]) -> Tuple[str, Any]:
+        worker = self._slots[slot]
+        try:
+            if not worker.ready:
+                worker.conn.recv()   # warm() の完了を待つ（タイムアウトには含めない）
+                worker.ready = True
+            worker.conn.send((fn, args, kwargs))
+        except (EOFError, OSError):
+            self._respawn(slot)
+            return "crashed", WorkerCrashed("worker exited before the request started")
+        except Exception as e:   # fn / 引数が pickle できない（パイプには何も書かれていない）
+            return "error", e
+        if not worker.conn.poll(timeout):
+            self._respawn(slot)
+            return "timeout", TimeoutError(f"request did not finish within {timeout}s")
+        try:
+            ok, value = worker.conn.recv()
+        except (EOFError, OSError):
+            self._respawn(slot)
+            return "crashed", WorkerCrashed(f"worker exited (code {worker.process.exitcode})")
+        return ("ok", value) if ok else ("error", value)
+
+    def _respawn(self, slot: int) -> None:
+        self._slots[slot].stop(kill=True)
+        self._slots[slot] = _Worker(self._ctx, self._warm)
+
+    # ---------------------------------------------------------
+    # 終了
+    # ---------------------------------------------------------
+    def close(self) -> None:
+        """投入済みの分を処理し終えてから、スレッドとワーカーを止める。"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        for w in self._slots:
+            w.stop()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()